@@ -0,0 +1,318 @@
+"""
+Асинхронные версии эндпоинтов раскладов и webhook для запуска под ASGI
+
+Пока запрос ждет ответа YandexGPT или готовности фоновой интерпретации,
+воркер не блокируется и обслуживает другие запросы. Подключаются вместо
+действий InterpretationViewSet и TelegramBotViewSet при TAROT_ASYNC_VIEWS=True.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .serializers import InterpretationSerializer
+from .throttling import ReadingThrottled, check_reading_limit, continues_reading
+from .views import InterpretationViewSet
+from users.models import UserProfile
+from tarot.models import TarotSpread, Interpretation
+from tarot.deck_index import deck_index
+from tarot.drafts import reading_drafts
+from tarot.readings import orient_cards, create_paid_interpretation, get_interpretation_cards
+from tarot.renditions import absolute_media_url, media_base_url
+from tarot.services import yandex_gpt_service
+from telegram_bot.handlers import TelegramBotManager
+from telegram_bot.ingestion import get_update_ingestor
+
+logger = logging.getLogger(__name__)
+
+# Потоковый и фоновый режимы не ждут модель в запросе, их обслуживает синхронное действие
+# (поток под ASGI оно отдает асинхронным итератором)
+_sync_create_interpretation = InterpretationViewSet.as_view({'post': 'create_interpretation'})
+
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+    return request.POST
+
+
+def _json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _error(message, status):
+    return _json_response({'error': message}, status=status)
+
+
+def _is_enabled(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+async def _throttled(user_id, spread_id):
+    """Ответ 429, если лимит раскладов исчерпан (400 при некорректном пользователе), иначе None"""
+    try:
+        retry_after = await sync_to_async(check_reading_limit)(user_id, spread_id)
+    except ValueError:
+        return _json_response({'user': ['Некорректный id пользователя']}, status=400)
+    if retry_after is None:
+        return None
+    error = ReadingThrottled(retry_after)
+    response = _json_response({'detail': error.detail}, status=error.status_code)
+    response['Retry-After'] = str(error.wait)
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def get_cards(request):
+    """Получение карт для расклада без создания интерпретации"""
+    data = _request_data(request)
+    if data is None:
+        return _error('Некорректный JSON', 400)
+
+    user_id = data.get('user')
+    spread_id = data.get('spread')
+    user_context = data.get('user_context', '')
+
+    if not user_id or not spread_id:
+        return _error('Необходимы поля user и spread', 400)
+
+    throttled = await _throttled(user_id, spread_id)
+    if throttled is not None:
+        return throttled
+
+    try:
+        user = await UserProfile.objects.aget(id=user_id)
+        spread = await TarotSpread.objects.aget(id=spread_id)
+
+        if user.balance <= 0:
+            return _error('Недостаточно раскладов. Пополните баланс.', 400)
+
+        cards = await sync_to_async(deck_index.draw)(spread.project_id, spread.num_cards)
+        if len(cards) < spread.num_cards:
+            return _error(f'Недостаточно карт для расклада. Нужно {spread.num_cards}, доступно {len(cards)}', 400)
+
+        cards_data = orient_cards(cards)
+        media_base = media_base_url(request)
+        response_data = {
+            'success': True,
+            'spread_name': spread.name,
+            'cards_names': [card.name for card in cards],
+            'cards_images': [absolute_media_url(card.image_url, media_base) for card in cards],
+            'cards_used': [{'name': card['name'], 'is_reversed': card['is_reversed']} for card in cards_data],
+        }
+
+        if _is_enabled(data.get('draft', settings.TAROT_DRAFT_READINGS)):
+            # Карты живут в черновике, расклад спишется при создании интерпретации
+            draft = await sync_to_async(reading_drafts.create)(user.id, spread, cards, cards_data, user_context)
+            response_data.update({
+                'interpretation_id': None,
+                'draft_token': draft.token,
+                'draft_expires_in': reading_drafts.ttl,
+                # Расклад еще не списан: текущий баланс и цена, которую спишет create_interpretation
+                'new_balance': user.balance,
+                'cost': 1,
+            })
+            return _json_response(response_data)
+
+        created = await sync_to_async(create_paid_interpretation)(
+            user, spread, cards, user_context, status='pending', cards_data=cards_data
+        )
+        if created is None:
+            return _error('Недостаточно раскладов. Пополните баланс.', 400)
+        interpretation, new_balance = created
+        response_data.update({'interpretation_id': interpretation.id, 'new_balance': new_balance})
+
+        return _json_response(response_data)
+    except UserProfile.DoesNotExist:
+        return _error('Пользователь не найден', 404)
+    except TarotSpread.DoesNotExist:
+        return _error('Расклад не найден', 404)
+    except Exception as e:
+        logger.error(f"Ошибка получения карт: {e}")
+        return _error(f'Ошибка получения карт: {str(e)}', 500)
+
+
+@csrf_exempt
+@require_POST
+async def create_interpretation(request):
+    """Создание новой интерпретации с AI-ответом"""
+    data = _request_data(request)
+    if data is None:
+        return _error('Некорректный JSON', 400)
+
+    if _is_enabled(data.get('stream', False)) or _is_enabled(
+            data.get('async', settings.TAROT_ASYNC_INTERPRETATIONS)):
+        return await sync_to_async(_sync_create_interpretation)(request)
+
+    user_id = data.get('user')
+    spread_id = data.get('spread')
+    interpretation_id = data.get('interpretation_id')
+    draft_token = data.get('draft_token')
+    user_context = data.get('user_context', '')
+
+    if not user_id or not spread_id:
+        return _error('Необходимы поля user и spread', 400)
+
+    # Продолжение расклада из get_cards лимит уже оплатило
+    throttled = None if continues_reading(data) else await _throttled(user_id, spread_id)
+    if throttled is not None:
+        return throttled
+
+    try:
+        user = await UserProfile.objects.aget(id=user_id)
+        spread = await TarotSpread.objects.aget(id=spread_id)
+
+        draft = None
+        interpretation = None
+
+        if draft_token:
+            draft = await sync_to_async(reading_drafts.claim)(draft_token, user.id, spread.id)
+            if draft is None:
+                return _error('Расклад не найден или устарел. Вытяните карты заново.', 404)
+            loaded = await sync_to_async(reading_drafts.load_cards)(draft)
+            if loaded is None:
+                return _error('Карты расклада больше недоступны. Вытяните карты заново.', 409)
+            cards, cards_data = loaded
+            user_context = user_context or draft.user_context
+            # Не тратим запрос к модели, если расклад все равно не удастся списать
+            if user.balance <= 0:
+                await sync_to_async(reading_drafts.restore)(draft)
+                return _error('Недостаточно раскладов. Пополните баланс.', 400)
+        elif interpretation_id:
+            try:
+                interpretation = await Interpretation.objects.aget(id=interpretation_id, user=user, spread=spread)
+            except Interpretation.DoesNotExist:
+                return _error('Интерпретация не найдена', 404)
+            cards, reversed_flags = await sync_to_async(get_interpretation_cards)(interpretation, spread.project_id)
+            cards_data = orient_cards(cards, reversed_flags)
+        else:
+            if user.balance <= 0:
+                return _error('Недостаточно раскладов. Пополните баланс.', 400)
+
+            cards = await sync_to_async(deck_index.draw)(spread.project_id, spread.num_cards)
+            if len(cards) < spread.num_cards:
+                return _error(
+                    f'Недостаточно карт для расклада. Нужно {spread.num_cards}, доступно {len(cards)}', 400
+                )
+
+            cards_data = orient_cards(cards)
+            created = await sync_to_async(create_paid_interpretation)(
+                user, spread, cards, user_context, cards_data=cards_data
+            )
+            if created is None:
+                return _error('Недостаточно раскладов. Пополните баланс.', 400)
+            interpretation, user.balance = created
+
+        # Ожидание модели не занимает поток воркера
+        try:
+            ai_response = await yandex_gpt_service.agenerate_interpretation(
+                spread_name=spread.name,
+                cards=cards_data,
+                user_context=user_context,
+                project_id=spread.project_id
+            )
+        except Exception:
+            if draft is not None:
+                await sync_to_async(reading_drafts.restore)(draft)
+            raise
+
+        if draft is not None:
+            # Списываем расклад и сохраняем готовую интерпретацию в одной транзакции
+            created = await sync_to_async(create_paid_interpretation)(
+                user, spread, cards, user_context, cards_data=cards_data, ai_response=ai_response
+            )
+            if created is None:
+                await sync_to_async(reading_drafts.restore)(draft)
+                return _error('Недостаточно раскладов. Пополните баланс.', 400)
+            interpretation, user.balance = created
+        else:
+            interpretation.ai_response = ai_response
+            interpretation.status = 'completed'
+            await interpretation.asave()
+
+        response_data = await sync_to_async(
+            lambda: dict(InterpretationSerializer(interpretation, context={'request': request}).data)
+        )()
+        response_data['success'] = True
+        response_data['cards_used'] = [
+            {'name': card['name'], 'is_reversed': card['is_reversed']} for card in cards_data
+        ]
+        response_data['ai_service_status'] = 'active' if yandex_gpt_service.is_available() else 'fallback'
+
+        return _json_response(response_data, status=201)
+    except UserProfile.DoesNotExist:
+        return _error('Пользователь не найден', 404)
+    except TarotSpread.DoesNotExist:
+        return _error('Расклад не найден', 404)
+    except Exception as e:
+        logger.error(f"Ошибка создания интерпретации: {e}")
+        return _error(f'Ошибка создания интерпретации: {str(e)}', 500)
+
+
+@require_GET
+async def interpretation_result(request, pk):
+    """
+    Статус и результат генерации интерпретации
+
+    Long-poll (?wait=N) ждет через asyncio.sleep и не держит поток
+    из пула sync_to_async, пока интерпретация генерируется.
+    """
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        wait = 0
+    wait = min(max(wait, 0), settings.TAROT_RESULT_LONG_POLL_TIMEOUT)
+    deadline = time.monotonic() + wait
+
+    while True:
+        data = await Interpretation.objects.filter(id=pk).values('id', 'status', 'ai_response').afirst()
+        if data is None:
+            return _error('Интерпретация не найдена', 404)
+        if data['status'] != 'pending' or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(InterpretationViewSet.RESULT_POLL_INTERVAL)
+
+    return _json_response({
+        'id': data['id'],
+        'status': data['status'],
+        'ready': data['status'] != 'pending',
+        'ai_response': data['ai_response'] if data['status'] == 'completed' else None,
+    })
+
+
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request):
+    """Имитация webhook от Telegram"""
+    data = _request_data(request)
+    if data is None:
+        return _error('Некорректный JSON', 400)
+
+    project_id = data.get('project_id')
+    message_data = data.get('message', {})
+    token = data.get('token')
+
+    try:
+        if settings.TELEGRAM_UPDATE_QUEUE == 'sync':
+            response = await sync_to_async(TelegramBotManager.handle_webhook)(project_id, message_data, token)
+            return _json_response(response)
+
+        handler = await sync_to_async(TelegramBotManager.get_bot_handler)(project_id, token)
+        if not isinstance(message_data, dict):
+            return _error('Некорректное сообщение', 400)
+        accepted = await sync_to_async(get_update_ingestor().submit)(
+            handler.project.id, message_data, data.get('update_id')
+        )
+        return _json_response({'ok': True, 'queued': accepted})
+    except ValueError as e:
+        return _error(str(e), 400)
@@ -0,0 +1,82 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.utils.cache import quote_etag
+from rest_framework.response import Response
+
+from projects.catalog import CatalogSnapshot, project_catalog
+from .conditional import ETAG_FORMAT_VERSION, respond_conditionally
+
+
+def parse_project_id(value) -> Optional[int]:
+    try:
+        project_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return project_id if project_id > 0 else None
+
+
+def snapshot_validators(request, snapshot: CatalogSnapshot) -> Tuple[str, float]:
+    """ETag и Last-Modified по версии снимка, без запросов к БД"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = ':'.join(str(part) for part in (
+        ETAG_FORMAT_VERSION, request.get_full_path(), getattr(renderer, 'format', ''),
+        snapshot.project_id, snapshot.version,
+    ))
+    return quote_etag(hashlib.md5(key.encode()).hexdigest()), snapshot.built_at
+
+
+def snapshot_response(request, snapshot: CatalogSnapshot, render):
+    """Условный ответ по валидаторам снимка"""
+    etag, last_modified = snapshot_validators(request, snapshot)
+    return respond_conditionally(request, etag, last_modified, render)
+
+
+class CatalogSnapshotListMixin:
+    """
+    Списки справочников проекта из снимка project_catalog
+
+    Запрос вида ?project=<id> без других фильтров, поиска и сортировки
+    обслуживается из снимка без обращения к БД, если список помещается
+    на одну страницу. Остальные запросы идут обычным путем.
+    """
+
+    # Поле снимка со списком объектов
+    catalog_field: str = ''
+    # Параметры запроса, при которых список можно отдать из снимка
+    catalog_query_params = frozenset({'project', 'format'})
+
+    def get_catalog_snapshot(self, request) -> Optional[CatalogSnapshot]:
+        params = request.query_params
+        if 'project' not in params or not set(params).issubset(self.catalog_query_params):
+            return None
+        project_id = parse_project_id(params.get('project'))
+        if project_id is None:
+            return None
+        return project_catalog.get(project_id)
+
+    def list(self, request, *args, **kwargs):
+        snapshot = self.get_catalog_snapshot(request)
+        if snapshot is None:
+            return super().list(request, *args, **kwargs)
+
+        items = getattr(snapshot, self.catalog_field)
+        paginator = self.paginator
+        page_size = getattr(paginator, 'page_size', None)
+        if page_size and len(items) > page_size:
+            return super().list(request, *args, **kwargs)
+
+        def render():
+            data = self.get_serializer(items, many=True).data
+            if paginator is None:
+                return Response(data)
+            # Тот же формат, что у PageNumberPagination для единственной страницы
+            return Response(OrderedDict([
+                ('count', len(items)),
+                ('next', None),
+                ('previous', None),
+                ('results', data),
+            ]))
+
+        return snapshot_response(request, snapshot, render)
@@ -0,0 +1,133 @@
+import functools
+import hashlib
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+
+# Версия справочников (проекты, колоды, карты, расклады, пакеты) и время ее смены.
+# Хранятся в общем кэше: у карт нет updated_at, и их правки видны другим
+# воркерам только через эту версию.
+CATALOG_VERSION_KEY = 'api:catalog:version'
+CATALOG_CHANGED_KEY = 'api:catalog:changed_at'
+
+# Меняется вместе с форматом ответов справочников, чтобы сбросить закэшированные клиентами ответы
+ETAG_FORMAT_VERSION = 1
+
+
+def get_catalog_version() -> Tuple[int, Optional[float]]:
+    """Версия справочников и время ее смены одним обращением к кэшу"""
+    values = cache.get_many([CATALOG_VERSION_KEY, CATALOG_CHANGED_KEY])
+    return values.get(CATALOG_VERSION_KEY, 0), values.get(CATALOG_CHANGED_KEY)
+
+
+def touch_catalog() -> None:
+    """
+    Отмечает изменение справочников для всех процессов
+
+    Вызывается сигналами моделей после коммита. Версия увеличивается
+    атомарно (INCR в Redis), поэтому одновременные правки из разных
+    воркеров не сливаются в одну.
+    """
+    cache.add(CATALOG_VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Версию вытеснили между add и incr; время смены ниже все равно изменит ETag
+        cache.set(CATALOG_VERSION_KEY, 1, timeout=None)
+    cache.set(CATALOG_CHANGED_KEY, time.time(), timeout=None)
+
+
+def compute_validators(request, queryset, last_modified_field: Optional[str] = 'updated_at') -> Tuple[str, Optional[float]]:
+    """
+    Считает ETag и Last-Modified для выборки без сериализации ответа
+
+    Нужен один агрегирующий запрос: число строк и максимум updated_at
+    (или id, если у модели нет updated_at). Версия справочников из общего
+    кэша учитывает удаления, правки моделей без updated_at и связанных
+    моделей, чьи имена попадают в ответ.
+    """
+    aggregates = {'count': Count('pk'), 'max_pk': Max('pk')}
+    if last_modified_field:
+        aggregates['last_modified'] = Max(last_modified_field)
+    values = queryset.order_by().aggregate(**aggregates)
+
+    version, changed_at = get_catalog_version()
+    timestamps = [changed_at] if changed_at else []
+    if values.get('last_modified'):
+        timestamps.append(values['last_modified'].timestamp())
+    last_modified = max(timestamps) if timestamps else None
+
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = ':'.join(str(part) for part in (
+        ETAG_FORMAT_VERSION, request.get_full_path(), getattr(renderer, 'format', ''),
+        values['count'], values['max_pk'], values.get('last_modified'), version, changed_at,
+    ))
+    return quote_etag(hashlib.md5(key.encode()).hexdigest()), last_modified
+
+
+def conditional_response(request, queryset, render: Callable, last_modified_field: Optional[str] = 'updated_at',
+                         lookup: Optional[Dict[str, Any]] = None):
+    """
+    Отдает 304 Not Modified, если у клиента актуальная версия, иначе вызывает render
+
+    lookup сужает выборку до одного объекта по параметрам из URL.
+    Успешные ответы получают ETag, Last-Modified и Cache-Control, чтобы
+    их могли кэшировать nginx и клиенты.
+    """
+    try:
+        if lookup:
+            queryset = queryset.filter(**lookup)
+        etag, last_modified = compute_validators(request, queryset, last_modified_field)
+    except (ValueError, TypeError, ValidationError):
+        # Некорректный id в URL — пусть ответ (404) сформирует само представление
+        return render()
+    return respond_conditionally(request, etag, last_modified, render)
+
+
+def respond_conditionally(request, etag: str, last_modified: Optional[float], render: Callable):
+    """Сверяет готовые валидаторы с заголовками клиента и проставляет их ответу"""
+    last_modified_ts = int(last_modified) if last_modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+    if response is None:
+        response = render()
+
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified_ts:
+            response['Last-Modified'] = http_date(last_modified_ts)
+        patch_cache_control(response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE)
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы для списков и объектов справочников
+
+    Перед сериализацией сверяет If-None-Match/If-Modified-Since клиента
+    с валидаторами выборки и при совпадении отвечает 304 без тела.
+    Для моделей без поля updated_at нужно указать last_modified_field = None.
+    """
+
+    last_modified_field: Optional[str] = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request, self.filter_queryset(self.get_queryset()),
+            functools.partial(super().list, request, *args, **kwargs), self.last_modified_field
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return conditional_response(
+            request, self.filter_queryset(self.get_queryset()),
+            functools.partial(super().retrieve, request, *args, **kwargs), self.last_modified_field,
+            lookup={self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
@@ -0,0 +1,113 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks.dataset import seed_dataset
+from benchmarks.explain import find_sequential_scans, is_supported as explain_supported
+from benchmarks.runner import BenchmarkRunner, BenchmarkError, compare_results
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет эндпоинты API на тестовой БД с заглушкой YandexGPT и сравнивает '
+            'число запросов, латентность и память с базовой линией')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, help='Количество проектов (по умолчанию из базовой линии или 2)')
+        parser.add_argument('--users', type=int, help='Пользователей в проекте (по умолчанию из базовой линии или 25)')
+        parser.add_argument('--interpretations', type=int,
+                            help='Интерпретаций на пользователя (по умолчанию из базовой линии или 2)')
+        parser.add_argument('--iterations', type=int, default=30, help='Замеров латентности на эндпоинт')
+        parser.add_argument('--llm-latency', type=float, default=0, help='Задержка заглушки YandexGPT, секунды')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Путь к файлу базовой линии')
+        parser.add_argument('--update-baseline', action='store_true', help='Записать результаты как новую базовую линию')
+        parser.add_argument('--latency-tolerance', type=float, default=1.0,
+                            help='Допустимый рост p95 в долях от базовой линии')
+        parser.add_argument('--allocation-tolerance', type=float, default=0.5,
+                            help='Допустимый рост пика памяти в долях от базовой линии')
+        parser.add_argument('--queries-only', action='store_true',
+                            help='Сравнивать только число запросов к БД (для нестабильных окружений CI)')
+        parser.add_argument('--output', help='Сохранить результаты прогона в JSON-файл')
+        parser.add_argument('--explain', action='store_true',
+                            help='Проверить планы горячих запросов на полное сканирование таблиц')
+
+    def handle(self, *args, **options):
+        check_plans = options['explain']
+        if check_plans and not explain_supported():
+            self.stderr.write(self.style.WARNING(
+                f"⚠️ Разбор планов для {connection.vendor} не поддерживается, проверка --explain пропущена"
+            ))
+            check_plans = False
+
+        baseline_path = Path(options['baseline'])
+        baseline = None
+        if baseline_path.exists() and not options['update_baseline']:
+            baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+
+        # Размер набора берем из базовой линии, чтобы замеры были сопоставимы
+        params = (baseline or {}).get('dataset', {})
+        projects = options['projects'] or params.get('projects', 2)
+        users = options['users'] or params.get('users', 25)
+        interpretations = options['interpretations'] or params.get('interpretations', 2)
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(
+                f"📦 Набор данных: {projects} проектов × {users} пользователей × {interpretations} интерпретаций"
+            )
+            dataset = seed_dataset(projects, users, interpretations)
+            results = BenchmarkRunner(options['iterations'], options['llm_latency']).run(dataset)
+            seq_scans = find_sequential_scans(dataset) if check_plans else {}
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.print_results(results, baseline)
+        if seq_scans:
+            for name, tables in seq_scans.items():
+                self.stderr.write(f"❌ {name}: полное сканирование {', '.join(tables)}")
+            raise CommandError(f"Запросов без подходящего индекса: {len(seq_scans)}")
+
+        if options['output']:
+            self.write_json(Path(options['output']), results)
+
+        if baseline is None:
+            self.write_json(baseline_path, results)
+            self.stdout.write(self.style.SUCCESS(f"Базовая линия записана в {baseline_path}"))
+            return
+
+        regressions = compare_results(
+            baseline, results,
+            latency_tolerance=None if options['queries_only'] else options['latency_tolerance'],
+            allocation_tolerance=None if options['queries_only'] else options['allocation_tolerance'],
+        )
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(f"❌ {regression}")
+            raise CommandError(f"Найдено регрессий: {len(regressions)}")
+        self.stdout.write(self.style.SUCCESS("✅ Регрессий относительно базовой линии нет"))
+
+    def print_results(self, results, baseline):
+        base_endpoints = (baseline or {}).get('endpoints', {})
+        self.stdout.write(f"{'Эндпоинт':<32} {'запросы':>8} {'p50, мс':>10} {'p95, мс':>10} {'память, КБ':>11}")
+        for name, result in results['endpoints'].items():
+            queries = str(result['queries'])
+            base = base_endpoints.get(name)
+            if base and base['queries'] != result['queries']:
+                queries = f"{base['queries']}→{result['queries']}"
+            self.stdout.write(
+                f"{name:<32} {queries:>8} {result['p50_ms']:>10} {result['p95_ms']:>10} {result['alloc_peak_kb']:>11}"
+            )
+
+    @staticmethod
+    def write_json(path, data):
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
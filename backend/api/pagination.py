@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from core.admin import estimate_count
+
+
+class HistoryCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация истории (интерпретации, платежи) от новых к старым
+
+    Страница выбирается по курсору на created_at (id упорядочивает записи
+    с одинаковым временем), поэтому любая страница стоит как первая: без
+    COUNT(*) и OFFSET. Общее число записей отдается только по запросу
+    ?with_total=1 и в PostgreSQL является оценкой.
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    total_query_param = 'with_total'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total = None
+        if str(request.query_params.get(self.total_query_param, '')).lower() in ('1', 'true', 'yes'):
+            self.total = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        fields = [
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ]
+        if self.total is not None:
+            fields += [('count', self.total[0]), ('count_is_estimate', self.total[1])]
+        return Response(OrderedDict(fields + [('results', data)]))
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        schema['properties']['count_is_estimate'] = {'type': 'boolean'}
+        return schema
@@ -1,8 +1,12 @@
 from rest_framework import serializers
 from projects.models import Project
+from projects.catalog import build_theme_settings
 from users.models import UserProfile
 from tarot.models import TarotDeck, TarotCard, TarotSpread, Interpretation
 from payments.models import Package, Payment
+from tarot.deck_index import deck_index
+from tarot.readings import MAX_DRAW_CARDS
+from tarot.renditions import absolute_media_url, media_base_url
 
 class ProjectSerializer(serializers.ModelSerializer):
     theme_settings = serializers.SerializerMethodField()
@@ -14,22 +18,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     
     def get_theme_settings(self, obj):
         """Получаем настройки темы из поля design или возвращаем дефолтные"""
-        design = obj.design or {}
-        return {
-            'primary_color': design.get('primary_color', '#6366f1'),
-            'secondary_color': design.get('secondary_color', '#8b5cf6'),
-            'accent_color': design.get('accent_color', '#f59e0b'),
-            'bg_primary': design.get('bg_primary', '#0f0f23'),
-            'bg_secondary': design.get('bg_secondary', '#1a1a2e'),
-            'bg_card': design.get('bg_card', '#1e293b'),
-            'text_primary': design.get('text_primary', '#f8fafc'),
-            'text_secondary': design.get('text_secondary', '#cbd5e1'),
-            'text_muted': design.get('text_muted', '#64748b'),
-            'border_color': design.get('border_color', '#334155'),
-            'font_family': design.get('font_family', 'Inter'),
-            'border_radius': design.get('border_radius', '12px'),
-            'is_dark_theme': design.get('is_dark_theme', True)
-        }
+        return build_theme_settings(obj.design)
 
 class ThemeSettingsSerializer(serializers.Serializer):
     """Сериализатор для настроек темы"""
@@ -85,30 +74,98 @@ class TarotSpreadSerializer(serializers.ModelSerializer):
 class InterpretationSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)
     spread_name = serializers.CharField(source='spread.name', read_only=True)
+    # Карты в порядке расклада (хранятся в card_ids)
+    cards = serializers.ListField(source='card_ids', child=serializers.IntegerField(min_value=1), required=False)
     cards_names = serializers.SerializerMethodField()
     cards_images = serializers.SerializerMethodField()
+    cards_reversed = serializers.SerializerMethodField()
     
     class Meta:
         model = Interpretation
-        fields = ['id', 'user', 'user_username', 'spread', 'spread_name', 'cards', 
-                 'cards_names', 'cards_images', 'ai_response', 'user_question', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'user', 'user_username', 'spread', 'spread_name', 'cards', 'reversed_mask',
+                 'cards_names', 'cards_images', 'cards_reversed', 'ai_response', 'user_question', 'status',
+                 'created_at']
+        read_only_fields = ['status', 'created_at']
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Загружает связанные объекты, нужные сериализатору, фиксированным числом запросов"""
+        return queryset.select_related('user', 'spread')
+    
+    def validate(self, attrs):
+        """
+        Карты должны быть из колод проекта расклада и не повторяться
+
+        reversed_mask задает ориентацию по биту на карту (бит i — i-я карта
+        перевернута) и не может содержать битов за пределами расклада.
+        """
+        card_ids = attrs.get('card_ids')
+        if 'reversed_mask' in attrs or card_ids is not None:
+            num_cards = len(card_ids if card_ids is not None else getattr(self.instance, 'card_ids', []))
+            if num_cards > MAX_DRAW_CARDS:
+                raise serializers.ValidationError({
+                    'cards': f'В раскладе не может быть больше {MAX_DRAW_CARDS} карт'
+                })
+            reversed_mask = attrs.get('reversed_mask', getattr(self.instance, 'reversed_mask', 0))
+            if reversed_mask >> num_cards:
+                raise serializers.ValidationError({
+                    'reversed_mask': f'Маска ориентации задает карты за пределами расклада из {num_cards} карт'
+                })
+        
+        spread = attrs.get('spread') or getattr(self.instance, 'spread', None)
+        if card_ids is None or spread is None:
+            return attrs
+        
+        if len(set(card_ids)) != len(card_ids):
+            raise serializers.ValidationError({'cards': 'Карты в раскладе не должны повторяться'})
+        deck_cards = self._get_deck_cards(spread.project_id)
+        unknown = [card_id for card_id in card_ids if card_id not in deck_cards]
+        if unknown:
+            raise serializers.ValidationError({
+                'cards': f"Карт нет в колодах проекта: {', '.join(map(str, unknown))}"
+            })
+        return attrs
     
     def get_cards_names(self, obj):
-        return [card.name for card in obj.cards.all()]
+        return self._get_cards_info(obj)[0]
     
     def get_cards_images(self, obj):
-        request = self.context.get('request')
+        return self._get_cards_info(obj)[1]
+    
+    def get_cards_reversed(self, obj):
+        return self._get_cards_info(obj)[2]
+    
+    def _get_cards_info(self, obj):
+        """Названия, изображения и ориентация карт из индекса колод, без запросов к БД"""
+        cards_info = getattr(obj, '_cards_info', None)
+        if cards_info is not None:
+            return cards_info
+        
+        media_base = self._get_media_base()
+        deck_cards = self._get_deck_cards(obj.spread.project_id)
+        names = []
         images = []
-        for card in obj.cards.all():
-            if card.image:
-                if request is not None:
-                    images.append(request.build_absolute_uri(card.image.url))
-                else:
-                    images.append(card.image.url)
-            else:
-                images.append('')
-        return images
+        reversed_flags = []
+        for card_id, is_reversed in zip(obj.card_ids, obj.reversed_flags):
+            deck_card = deck_cards.get(card_id)
+            # Карта удалена из колоды: оставляем пустое место, чтобы списки совпадали с cards
+            names.append(deck_card.name if deck_card is not None else None)
+            images.append(absolute_media_url(deck_card.image_url, media_base) if deck_card is not None else None)
+            reversed_flags.append(is_reversed)
+        obj._cards_info = (names, images, reversed_flags)
+        return obj._cards_info
+    
+    def _get_deck_cards(self, project_id):
+        card_maps = self.context.setdefault('deck_cards', {})
+        if project_id not in card_maps:
+            card_maps[project_id] = deck_index.get_card_map(project_id)
+        return card_maps[project_id]
+    
+    def _get_media_base(self):
+        """Хост для относительных URL изображений, один раз на ответ"""
+        if 'media_base' not in self.context:
+            self.context['media_base'] = media_base_url(self.context.get('request'))
+        return self.context['media_base']
 
 class PackageSerializer(serializers.ModelSerializer):
     project_name = serializers.CharField(source='project.name', read_only=True)
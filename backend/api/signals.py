@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from projects.models import Project
+from tarot.models import TarotDeck, TarotCard, TarotSpread, CardRendition
+from tarot.signals import catalog_bulk_changed
+from payments.models import Package
+from .conditional import touch_catalog
+
+
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=TarotDeck)
+@receiver([post_save, post_delete], sender=TarotCard)
+@receiver([post_save, post_delete], sender=CardRendition)
+@receiver([post_save, post_delete], sender=TarotSpread)
+@receiver([post_save, post_delete], sender=Package)
+@receiver(catalog_bulk_changed)
+def catalog_changed(sender, **kwargs):
+    """Меняет ETag справочников при любом изменении их моделей"""
+    # После коммита, иначе другой воркер может отдать старые данные под новой версией
+    transaction.on_commit(touch_catalog)
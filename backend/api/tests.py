@@ -1,3 +1,776 @@
-from django.test import TestCase
+import asyncio
+import json
+from pathlib import Path
+from typing import NamedTuple
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, AsyncRequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from projects.models import Project
+from users.models import UserProfile
+from telegram_bot.handlers import TelegramBotManager
+from tarot.models import TarotDeck, TarotCard, TarotSpread, Interpretation
+from tarot.drafts import ReadingDraftStore, reading_drafts
+from tarot.services import yandex_gpt_service
+from payments.models import Package, Payment
+from api import async_views
+from api.conditional import touch_catalog
+from api.views import InterpretationViewSet
+from benchmarks import explain
+from benchmarks.dataset import seed_dataset
+from benchmarks.runner import BenchmarkRunner, compare_results
+from prometheus_client import REGISTRY
+
+from core.ratelimit import parse_rate, reading_rate_limiter
+
+
+class InterpretationListQueryCountTest(TestCase):
+    """Список интерпретаций не должен делать запросов на каждую строку"""
+
+    @classmethod
+    def setUpTestData(cls):
+        project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        deck = TarotDeck.objects.create(name='Колода', project=project)
+        cls.cards = [
+            TarotCard.objects.create(deck=deck, name=f'Карта {i}', order=i, image=f'tarot/cards/Cups0{i + 1}.png')
+            for i in range(5)
+        ]
+        cls.spread = TarotSpread.objects.create(project=project, name='Расклад', num_cards=3)
+        cls.user = UserProfile.objects.create(project=project, telegram_user_id=1, username='tester')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_interpretations(self, count):
+        for _ in range(count):
+            Interpretation.objects.create(user=self.user, spread=self.spread, ai_response='Ответ',
+                                          card_ids=[card.id for card in self.cards[:3]], reversed_mask=0b010)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/tarot/interpretations/', {'user': self.user.id})
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.create_interpretations(2)
+        small_page_queries, _ = self.count_list_queries()
+
+        self.create_interpretations(10)
+        full_page_queries, data = self.count_list_queries()
+
+        self.assertEqual(len(data['results']), 12)
+        self.assertEqual(small_page_queries, full_page_queries)
+        # Проверка фильтра user и интерпретации с user/spread; карты берутся из индекса колод,
+        # курсорной пагинации COUNT не нужен
+        self.assertEqual(full_page_queries, 2)
+
+    def test_cursor_pages_cover_history_without_count(self):
+        self.create_interpretations(5)
+        url = f'/api/tarot/interpretations/?user={self.user.id}&page_size=2'
+        seen = []
+        page_queries = set()
+
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                data = self.client.get(url).json()
+            page_queries.add(len(context.captured_queries))
+            self.assertNotIn('count', data)
+            seen += [item['id'] for item in data['results']]
+            url = data['next']
+
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(len(set(seen)), 5)
+        # Последняя страница не дешевле и не дороже первой
+        self.assertEqual(len(page_queries), 1)
+
+        data = self.client.get('/api/tarot/interpretations/', {'user': self.user.id, 'with_total': 1}).json()
+        self.assertEqual(data['count'], 5)
+
+    def test_cards_names_and_images_are_serialized(self):
+        self.create_interpretations(1)
+        _, data = self.count_list_queries()
+
+        result = data['results'][0]
+        self.assertEqual(result['user_username'], 'tester')
+        self.assertEqual(result['spread_name'], 'Расклад')
+        self.assertEqual(result['cards_names'], ['Карта 0', 'Карта 1', 'Карта 2'])
+        self.assertEqual(result['cards_reversed'], [False, True, False])
+        self.assertEqual(len(result['cards_images']), 3)
+        self.assertTrue(result['cards_images'][0].endswith('/media/tarot/cards/Cups01.png'))
+
+
+class InterpretationCardsValidationTest(TestCase):
+    """Карты интерпретации проверяются по колодам проекта расклада"""
+
+    @classmethod
+    def setUpTestData(cls):
+        project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        other = Project.objects.create(name='Other Bot', telegram_token='other-token')
+        deck = TarotDeck.objects.create(name='Колода', project=project)
+        other_deck = TarotDeck.objects.create(name='Чужая колода', project=other)
+        cls.cards = [TarotCard.objects.create(deck=deck, name=f'Карта {i}', order=i) for i in range(3)]
+        cls.other_card = TarotCard.objects.create(deck=other_deck, name='Чужая карта', order=0)
+        cls.spread = TarotSpread.objects.create(project=project, name='Расклад', num_cards=3)
+        cls.user = UserProfile.objects.create(project=project, telegram_user_id=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def create(self, cards):
+        return self.client.post('/api/tarot/interpretations/', {
+            'user': self.user.id, 'spread': self.spread.id, 'cards': cards, 'ai_response': 'Текст',
+        }, format='json')
+
+    def test_cards_from_project_decks_are_accepted(self):
+        response = self.create([card.id for card in self.cards])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['cards_names'], ['Карта 0', 'Карта 1', 'Карта 2'])
+
+    def test_foreign_unknown_and_repeated_cards_are_rejected(self):
+        for cards in ([self.cards[0].id, self.other_card.id], [self.cards[0].id, 10_000],
+                      [self.cards[0].id, self.cards[0].id]):
+            with self.subTest(cards=cards):
+                response = self.create(cards)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cards', response.json())
+        self.assertFalse(Interpretation.objects.exists())
+
+    def test_orientation_is_written_within_card_count(self):
+        cards = [card.id for card in self.cards]
+        response = self.client.post('/api/tarot/interpretations/', {
+            'user': self.user.id, 'spread': self.spread.id, 'cards': cards, 'reversed_mask': 0b101,
+            'ai_response': 'Текст',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['cards_reversed'], [True, False, True])
+
+        response = self.client.post('/api/tarot/interpretations/', {
+            'user': self.user.id, 'spread': self.spread.id, 'cards': cards, 'reversed_mask': 0b1000,
+            'ai_response': 'Текст',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('reversed_mask', response.json())
+
+    def test_too_many_cards_are_rejected(self):
+        response = self.create(list(range(1, 65)))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('63', response.json()['cards'][0])
+
+    def test_deleted_card_keeps_its_position(self):
+        interpretation = Interpretation.objects.create(user=self.user, spread=self.spread, ai_response='Текст',
+                                                       card_ids=[card.id for card in self.cards], reversed_mask=0b100)
+        TarotCard.objects.filter(id=self.cards[1].id).delete()
+        self.addCleanup(cache.clear)
+
+        data = self.client.get(f'/api/tarot/interpretations/{interpretation.id}/').json()
+
+        self.assertEqual(data['cards_names'], ['Карта 0', None, 'Карта 2'])
+        self.assertEqual(data['cards_reversed'], [False, False, True])
+
+    def test_partial_update_checks_existing_spread(self):
+        interpretation = Interpretation.objects.create(user=self.user, spread=self.spread,
+                                                       card_ids=[card.id for card in self.cards])
+
+        response = self.client.patch(f'/api/tarot/interpretations/{interpretation.id}/',
+                                     {'cards': [self.other_card.id]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class BenchmarkQueryBudgetTest(TestCase):
+    """Число запросов к БД на эндпоинтах не должно превышать базовую линию бенчмарка"""
+
+    def setUp(self):
+        # Данные создаются через bulk_create без сигналов, а те же id проектов уже
+        # встречались в других тестах: сбрасываем обработчики ботов процесса
+        TelegramBotManager._handlers.clear()
+        self.enterContext(mock.patch('tarot.services.llm_usage_writer'))
+
+    def test_no_query_regressions(self):
+        baseline = json.loads((Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json').read_text(encoding='utf-8'))
+        dataset = seed_dataset(**baseline['dataset'])
+
+        results = BenchmarkRunner(iterations=1).run(dataset)
+
+        regressions = compare_results(baseline, results, latency_tolerance=None, allocation_tolerance=None)
+        self.assertEqual(regressions, [])
+
+
+class QueryPlanTest(TestCase):
+    """Горячие запросы используют индексы, а не полное сканирование таблиц"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset(projects=2, users=10, interpretations=2)
+
+    def test_hot_queries_use_indexes(self):
+        self.assertEqual(explain.find_sequential_scans(self.dataset), {})
+
+    def test_detects_sequential_scan(self):
+        unindexed = explain.HotQuery('payments_by_amount', lambda d: Payment.objects.filter(amount=100))
+        with mock.patch.object(explain, 'HOT_QUERIES', [unindexed]):
+            self.assertEqual(explain.find_sequential_scans(self.dataset), {'payments_by_amount': ['payments_payment']})
+
+    def test_unsupported_database_is_skipped(self):
+        with mock.patch.object(explain.connection, 'vendor', 'oracle'):
+            self.assertFalse(explain.is_supported())
+            with self.assertLogs('benchmarks.explain', 'WARNING'):
+                self.assertEqual(explain.find_sequential_scans(self.dataset), {})
+
+
+class AsyncReadingViewsTest(TestCase):
+    """Асинхронные представления раскладов отвечают так же, как синхронные действия"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        deck = TarotDeck.objects.create(name='Колода', project=cls.project)
+        for i in range(5):
+            TarotCard.objects.create(deck=deck, name=f'Карта {i}', order=i, meaning_upright='Прямое',
+                                     meaning_reversed='Перевернутое')
+        cls.spread = TarotSpread.objects.create(project=cls.project, name='Расклад', num_cards=3)
+        cls.user = UserProfile.objects.create(project=cls.project, telegram_user_id=1, username='tester', balance=2)
+
+    def setUp(self):
+        reading_rate_limiter.clear()
+        self.factory = AsyncRequestFactory()
+        self.enterContext(mock.patch('tarot.services.llm_usage_writer'))
+
+    def post(self, data):
+        return self.factory.post('/', data=json.dumps(data), content_type='application/json')
+
+    async def test_get_cards_then_create_interpretation(self):
+        response = await async_views.get_cards(self.post({'user': self.user.id, 'spread': self.spread.id,
+                                                          'draft': False}))
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['cards_names']), 3)
+        self.assertEqual(data['new_balance'], 1)
+
+        response = await async_views.create_interpretation(self.post({
+            'user': self.user.id, 'spread': self.spread.id, 'interpretation_id': data['interpretation_id'],
+        }))
+        self.assertEqual(response.status_code, 201)
+        result = json.loads(response.content)
+        self.assertEqual(result['status'], 'completed')
+        self.assertTrue(result['ai_response'])
+
+        interpretation = await Interpretation.objects.aget(id=data['interpretation_id'])
+        self.assertEqual(interpretation.status, 'completed')
+        self.assertEqual(len(interpretation.card_ids), 3)
+        # Ориентация, показанная в get_cards, сохраняется и не выбирается заново
+        self.assertEqual(result['cards_used'], data['cards_used'])
+        self.assertEqual(result['cards_reversed'], [card['is_reversed'] for card in data['cards_used']])
+
+    async def test_draft_reading_is_committed_with_interpretation(self):
+        response = await async_views.get_cards(self.post({'user': self.user.id, 'spread': self.spread.id,
+                                                          'draft': True}))
+        data = json.loads(response.content)
+        self.assertIsNone(data['interpretation_id'])
+        self.assertFalse(await Interpretation.objects.aexists())
+
+        response = await async_views.create_interpretation(self.post({
+            'user': self.user.id, 'spread': self.spread.id, 'draft_token': data['draft_token'],
+        }))
+        self.assertEqual(response.status_code, 201)
+        result = json.loads(response.content)
+        self.assertEqual(result['cards_used'], data['cards_used'])
+        self.assertEqual((await UserProfile.objects.aget(id=self.user.id)).balance, 1)
+
+    async def test_create_interpretation_without_balance(self):
+        await UserProfile.objects.filter(id=self.user.id).aupdate(balance=0)
+
+        response = await async_views.create_interpretation(self.post({'user': self.user.id, 'spread': self.spread.id}))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(await Interpretation.objects.aexists())
+
+    async def test_webhook(self):
+        response = await async_views.telegram_webhook(self.post({
+            'project_id': self.project.id, 'token': 'test-token',
+            'message': {'type': 'command', 'command': '/help', 'user_id': 1},
+        }))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Помощь', json.loads(response.content)['text'])
+
+
+class ConditionalGetTest(TestCase):
+    """Справочники отвечают 304, пока данные не изменились"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        cls.deck = TarotDeck.objects.create(name='Колода', project=cls.project)
+        cls.card = TarotCard.objects.create(deck=cls.deck, name='Шут', order=0)
+        cls.spread = TarotSpread.objects.create(project=cls.project, name='Расклад', num_cards=3)
+        Package.objects.create(project=cls.project, name='5 раскладов', price=199, num_readings=5)
+
+    def setUp(self):
+        cache.clear()
+        reading_rate_limiter.clear()
+        self.client = APIClient()
+
+    def revalidate(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age', response['Cache-Control'])
+        return response['ETag'], self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_catalog_returns_not_modified(self):
+        for url in ['/api/tarot/spreads/', f'/api/tarot/spreads/{self.spread.id}/', '/api/tarot/decks/',
+                    '/api/tarot/cards/', '/api/packages/', f'/api/projects/{self.project.id}/theme_settings/']:
+            with self.subTest(url=url):
+                etag, response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+
+    def test_changes_and_deletions_invalidate_etag(self):
+        etag, _ = self.revalidate('/api/tarot/cards/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.card.meaning_upright = 'Начало пути'
+            self.card.save()
+            # У карт нет updated_at: до коммита версия справочников не меняется
+            self.assertEqual(self.client.get('/api/tarot/cards/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.get('/api/tarot/cards/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.card.delete()
+        response = self.client.get('/api/tarot/cards/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_version_bump_from_another_worker_invalidates_etag(self):
+        etag, _ = self.revalidate('/api/tarot/cards/')
+
+        # Другой воркер поменял карту: в этом процессе сигналов не было, только общая версия
+        TarotCard.objects.filter(id=self.card.id).update(meaning_upright='Начало пути')
+        touch_catalog()
+
+        self.assertEqual(self.client.get('/api/tarot/cards/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_related_project_rename_invalidates_spreads(self):
+        etag, _ = self.revalidate('/api/tarot/spreads/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.name = 'Новое имя'
+            self.project.save()
+
+        response = self.client.get('/api/tarot/spreads/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['project_name'], 'Новое имя')
+
+
+class ReadingDraftTest(TestCase):
+    """Черновик расклада попадает в БД только вместе с интерпретацией"""
+
+    @classmethod
+    def setUpTestData(cls):
+        project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        deck = TarotDeck.objects.create(name='Колода', project=project)
+        for i in range(5):
+            TarotCard.objects.create(deck=deck, name=f'Карта {i}', order=i)
+        cls.spread = TarotSpread.objects.create(project=project, name='Расклад', num_cards=3)
+        cls.user = UserProfile.objects.create(project=project, telegram_user_id=1, username='tester', balance=2)
+
+    def setUp(self):
+        cache.clear()
+        reading_rate_limiter.clear()
+        self.client = APIClient()
+        self.enterContext(mock.patch('tarot.services.llm_usage_writer'))
+        self.reading = {'user': self.user.id, 'spread': self.spread.id, 'draft': True}
+
+    def get_cards(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/tarot/interpretations/get_cards/', self.reading, format='json')
+        self.assertEqual(response.status_code, 200)
+        writes = [q['sql'] for q in context.captured_queries if not q['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+        return response.json()
+
+    def create_interpretation(self, draft_token):
+        return self.client.post('/api/tarot/interpretations/create_interpretation/',
+                                {**self.reading, 'draft_token': draft_token}, format='json')
+
+    def test_draft_is_committed_once(self):
+        data = self.get_cards()
+
+        response = self.create_interpretation(data['draft_token'])
+        self.assertEqual(response.status_code, 201)
+        interpretation = Interpretation.objects.get()
+        self.assertEqual(interpretation.status, 'completed')
+        self.assertEqual(response.json()['cards_used'], data['cards_used'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, 1)
+
+        # Повторный запрос с тем же токеном не спишет расклад второй раз
+        self.assertEqual(self.create_interpretation(data['draft_token']).status_code, 404)
+        self.assertEqual(Interpretation.objects.count(), 1)
+
+    def test_draft_reports_current_balance_and_cost(self):
+        data = self.get_cards()
+
+        # Пока черновик не подтвержден, списания нет
+        self.assertEqual((data['new_balance'], data['cost']), (2, 1))
+        self.assertEqual(UserProfile.objects.get(id=self.user.id).balance, 2)
+        self.create_interpretation(data['draft_token'])
+        self.assertEqual(UserProfile.objects.get(id=self.user.id).balance, data['new_balance'] - data['cost'])
+
+    def test_draft_mode_is_opt_in(self):
+        response = self.client.post('/api/tarot/interpretations/get_cards/',
+                                    {'user': self.user.id, 'spread': self.spread.id}, format='json')
+
+        self.assertIsNotNone(response.json()['interpretation_id'])
+        self.assertNotIn('draft_token', response.json())
+
+    def test_draft_is_claimed_by_another_worker(self):
+        data = self.get_cards()
+
+        # Другой воркер со своим хранилищем видит черновик через общий кэш
+        other_worker = ReadingDraftStore(ttl=reading_drafts.ttl)
+        draft = other_worker.claim(data['draft_token'], self.user.id, self.spread.id)
+        self.assertIsNotNone(draft)
+        self.assertEqual([card['is_reversed'] for card in data['cards_used']], list(draft.reversed_flags))
+        self.assertIsNone(reading_drafts.get(data['draft_token']))
+
+    def test_expired_draft_leaves_nothing_behind(self):
+        data = self.get_cards()
+        cache.clear()
+
+        self.assertEqual(self.create_interpretation(data['draft_token']).status_code, 404)
+        self.assertFalse(Interpretation.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, 2)
+
+
+class ReadingRateLimitTest(TestCase):
+    """Лимит раскладов отвечает 429 без запросов к БД"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        deck = TarotDeck.objects.create(name='Колода', project=cls.project)
+        for i in range(3):
+            TarotCard.objects.create(deck=deck, name=f'Карта {i}', order=i)
+        cls.spread = TarotSpread.objects.create(project=cls.project, name='Расклад', num_cards=3)
+        cls.users = [UserProfile.objects.create(project=cls.project, telegram_user_id=i, balance=10)
+                     for i in range(2)]
+
+    def setUp(self):
+        cache.clear()
+        reading_rate_limiter.clear()
+        self.client = APIClient()
+        self.enterContext(mock.patch('tarot.services.llm_usage_writer'))
+
+    def get_cards(self, user):
+        return self.client.post('/api/tarot/interpretations/get_cards/',
+                                {'user': user.id, 'spread': self.spread.id}, format='json')
+
+    def test_user_limit_rejects_without_queries(self):
+        with override_settings(RATE_LIMIT_ENABLED=True), \
+                mock.patch.dict(reading_rate_limiter.rates, {'user': parse_rate('2/min')}):
+            self.assertEqual(self.get_cards(self.users[0]).status_code, 200)
+            self.assertEqual(self.get_cards(self.users[0]).status_code, 200)
+            with CaptureQueriesContext(connection) as context:
+                response = self.get_cards(self.users[0])
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(len(context.captured_queries), 0)
+            self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+            # Корзина другого пользователя не тронута
+            self.assertEqual(self.get_cards(self.users[1]).status_code, 200)
+
+    def test_project_override_and_bot(self):
+        overrides = {self.project.id: {'project': parse_rate('1/hour')}}
+        with override_settings(RATE_LIMIT_ENABLED=True), \
+                mock.patch.dict(reading_rate_limiter.overrides, overrides):
+            self.assertEqual(self.get_cards(self.users[0]).status_code, 200)
+            self.assertEqual(self.get_cards(self.users[1]).status_code, 429)
+
+            response = self.client.post('/api/telegram/webhook/', {
+                'project_id': self.project.id, 'token': self.project.telegram_token,
+                'message': {'type': 'command', 'command': '/tarot', 'user_id': 5},
+            }, format='json')
+            self.assertIn('Слишком много раскладов', json.dumps(response.json(), ensure_ascii=False))
+        self.assertFalse(UserProfile.objects.filter(telegram_user_id=5).exists())
+
+    def test_reading_costs_one_token(self):
+        with override_settings(RATE_LIMIT_ENABLED=True), \
+                mock.patch.dict(reading_rate_limiter.rates, {'user': parse_rate('1/hour')}):
+            response = self.get_cards(self.users[0])
+            self.assertEqual(response.status_code, 200)
+            response = self.client.post('/api/tarot/interpretations/create_interpretation/', {
+                'user': self.users[0].id, 'spread': self.spread.id,
+                'interpretation_id': response.json()['interpretation_id'],
+            }, format='json')
+            self.assertNotEqual(response.status_code, 429)
+
+            # Новые карты без get_cards — новый расклад
+            response = self.client.post('/api/tarot/interpretations/create_interpretation/', {
+                'user': self.users[0].id, 'spread': self.spread.id,
+            }, format='json')
+            self.assertEqual(response.status_code, 429)
+
+    def test_user_id_spellings_share_bucket(self):
+        with override_settings(RATE_LIMIT_ENABLED=True), \
+                mock.patch.dict(reading_rate_limiter.rates, {'user': parse_rate('1/hour')}):
+            user_id = self.users[0].id
+            self.assertEqual(self.client.post('/api/tarot/interpretations/get_cards/', {
+                'user': str(user_id), 'spread': self.spread.id}, format='json').status_code, 200)
+            for spelling in (f'0{user_id}', f' {user_id}'):
+                with self.subTest(user=spelling):
+                    self.assertEqual(self.client.post('/api/tarot/interpretations/get_cards/', {
+                        'user': spelling, 'spread': self.spread.id}, format='json').status_code, 429)
+            response = self.client.post('/api/tarot/interpretations/get_cards/', {
+                'user': 'abc', 'spread': self.spread.id}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('user', response.json())
+
+    def test_project_denial_keeps_user_token(self):
+        overrides = {self.project.id: {'user': parse_rate('1/hour'), 'project': parse_rate('1/hour')}}
+        with override_settings(RATE_LIMIT_ENABLED=True), \
+                mock.patch.dict(reading_rate_limiter.overrides, overrides):
+            self.assertEqual(self.get_cards(self.users[0]).status_code, 200)
+            self.assertEqual(self.get_cards(self.users[1]).status_code, 429)
+
+            # Отказ по лимиту проекта не списал токен из корзины второго пользователя
+            key = reading_rate_limiter.KEY.format(scope=reading_rate_limiter.scope, level='user',
+                                                  subject=f'profile:{self.users[1].id}')
+            state, = reading_rate_limiter.store.consume([(key, parse_rate('1/hour'))])
+            self.assertTrue(state.allowed)
+
+
+class MetricsTest(TestCase):
+    """Метрики запросов, SQL и вызовов модели попадают в /metrics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        deck = TarotDeck.objects.create(name='Колода', project=cls.project)
+        for i in range(3):
+            TarotCard.objects.create(deck=deck, name=f'Карта {i}', order=i)
+        cls.spread = TarotSpread.objects.create(project=cls.project, name='Расклад', num_cards=3)
+        cls.user = UserProfile.objects.create(project=cls.project, telegram_user_id=1, balance=5)
+
+    def setUp(self):
+        reading_rate_limiter.clear()
+        self.client = APIClient()
+        self.enterContext(mock.patch('tarot.services.llm_usage_writer'))
+
+    @staticmethod
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_latency_and_queries_by_action(self):
+        labels = {'view': 'InterpretationViewSet', 'action': 'get_cards'}
+        requests_before = self.sample('http_request_duration_seconds_count', method='POST', status='200', **labels)
+        queries_before = self.sample('http_request_db_queries_sum', **labels)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/tarot/interpretations/get_cards/',
+                                        {'user': self.user.id, 'spread': self.spread.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.sample('http_request_duration_seconds_count', method='POST', status='200', **labels),
+                         requests_before + 1)
+        self.assertEqual(self.sample('http_request_db_queries_sum', **labels) - queries_before,
+                         len(context.captured_queries))
+
+    def test_fallback_is_counted_and_exposed(self):
+        fallbacks = self.sample('tarot_llm_responses_total', source='fallback')
+        draft = self.client.post('/api/tarot/interpretations/get_cards/',
+                                 {'user': self.user.id, 'spread': self.spread.id, 'draft': True}, format='json').json()
+        response = self.client.post('/api/tarot/interpretations/create_interpretation/', {
+            'user': self.user.id, 'spread': self.spread.id, 'draft_token': draft['draft_token'],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.sample('tarot_llm_responses_total', source='fallback'), fallbacks + 1)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{action="create_interpretation"', body)
+        self.assertIn('tarot_llm_responses_total{source="fallback"}', body)
+        self.assertIn('cache_requests_total', body)
+
+    @override_settings(METRICS_AUTH_TOKEN='secret')
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    @override_settings(METRICS_AUTH_TOKEN='')
+    def test_without_token_only_local_addresses_are_allowed(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+
+
+class _StreamAlternative(NamedTuple):
+    text: str
+
+
+class StreamingModel:
+    """Модель, отдающая накопленный текст по фрагментам, как run_stream SDK"""
+
+    def __init__(self, chunks, error_after=None):
+        self.chunks = chunks
+        self.error_after = error_after
+
+    def run(self, prompt):
+        return [_StreamAlternative(''.join(self.chunks))]
+
+    def run_stream(self, prompt):
+        text = ''
+        for i, chunk in enumerate(self.chunks):
+            if i == self.error_after:
+                raise ConnectionError('обрыв соединения с моделью')
+            text += chunk
+            yield [_StreamAlternative(text)]
+
+
+class AsyncStreamingModel(StreamingModel):
+    """Та же модель в асинхронном SDK"""
+
+    async def run_stream(self, prompt):
+        for result in super().run_stream(prompt):
+            await asyncio.sleep(0)
+            yield result
+
+
+class StreamingInterpretationTest(TestCase):
+    """Ответ модели потоком Server-Sent Events"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        deck = TarotDeck.objects.create(name='Колода', project=cls.project)
+        for i in range(3):
+            TarotCard.objects.create(deck=deck, name=f'Карта {i}', order=i, meaning_upright='Прямое',
+                                     meaning_reversed='Перевернутое')
+        cls.spread = TarotSpread.objects.create(project=cls.project, name='Расклад', num_cards=3)
+        cls.user = UserProfile.objects.create(project=cls.project, telegram_user_id=1, balance=2)
+
+    def setUp(self):
+        cache.clear()
+        reading_rate_limiter.clear()
+        self.client = APIClient()
+        self.writer = self.enterContext(mock.patch('tarot.services.llm_usage_writer'))
+        self.enterContext(mock.patch.object(yandex_gpt_service.response_cache, 'enabled', False))
+
+    def stream(self, model):
+        self.enterContext(mock.patch.object(yandex_gpt_service, 'model', model))
+        response = self.client.post('/api/tarot/interpretations/create_interpretation/', {
+            'user': self.user.id, 'spread': self.spread.id, 'stream': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    @staticmethod
+    def parse(raw):
+        event, data = raw.split('\n')
+        return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+    def events(self, response):
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.endswith('\n\n'))
+        return [self.parse(raw) for raw in body[:-2].split('\n\n')]
+
+    def test_events_are_framed_and_final_text_saved(self):
+        response = self.stream(StreamingModel(['Карты ', 'говорят ', 'о переменах.']))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        events = self.events(response)
+
+        self.assertEqual([event for event, _ in events], ['start', 'chunk', 'chunk', 'chunk', 'done'])
+        start, done = events[0][1], events[-1][1]
+        self.assertEqual(start['spread_name'], 'Расклад')
+        self.assertEqual(len(start['cards_used']), 3)
+        self.assertEqual([data['text'] for _, data in events[1:-1]], ['Карты ', 'говорят ', 'о переменах.'])
+        self.assertEqual(done['interpretation_id'], start['interpretation_id'])
+        self.assertEqual((done['status'], done['ai_response']), ('completed', 'Карты говорят о переменах.'))
+
+        interpretation = Interpretation.objects.get(id=start['interpretation_id'])
+        self.assertEqual((interpretation.status, interpretation.ai_response), ('completed', 'Карты говорят о переменах.'))
+        self.assertEqual(UserProfile.objects.get(id=self.user.id).balance, 1)
+
+    def test_model_error_before_first_chunk_streams_fallback(self):
+        events = self.events(self.stream(StreamingModel(['Карты'], error_after=0)))
+
+        self.assertEqual([event for event, _ in events], ['start', 'chunk', 'done'])
+        fallback = events[1][1]['text']
+        self.assertTrue(fallback)
+        self.assertEqual(events[-1][1]['ai_response'], fallback)
+        interpretation = Interpretation.objects.get(id=events[0][1]['interpretation_id'])
+        self.assertEqual((interpretation.status, interpretation.ai_response), ('completed', fallback))
+
+    async def test_asgi_stream_is_async_iterator(self):
+        chunks = ['Карты ', 'говорят ', 'о переменах.']
+        self.enterContext(mock.patch.object(yandex_gpt_service, 'model', StreamingModel(chunks)))
+        self.enterContext(mock.patch.object(yandex_gpt_service, 'async_model', AsyncStreamingModel(chunks)))
+        request = AsyncRequestFactory().post('/', data=json.dumps({
+            'user': self.user.id, 'spread': self.spread.id, 'stream': True,
+        }), content_type='application/json')
+
+        response = await async_views.create_interpretation(request)
+
+        self.assertEqual(response.status_code, 200)
+        # Асинхронный итератор Django под ASGI отдает без сборки в список
+        self.assertTrue(response.is_async)
+        body = b''.join([part async for part in response.streaming_content]).decode()
+        events = [self.parse(raw) for raw in body[:-2].split('\n\n')]
+        self.assertEqual([data['text'] for event, data in events if event == 'chunk'], chunks)
+        interpretation = await Interpretation.objects.aget(id=events[0][1]['interpretation_id'])
+        self.assertEqual((interpretation.status, interpretation.ai_response), ('completed', ''.join(chunks)))
+
+    async def test_async_result_long_poll_waits_for_completion(self):
+        interpretation = await Interpretation.objects.acreate(user=self.user, spread=self.spread, status='pending')
+
+        async def complete_later():
+            await asyncio.sleep(0.05)
+            await Interpretation.objects.filter(id=interpretation.id).aupdate(status='completed', ai_response='Готово')
+
+        self.enterContext(mock.patch.object(InterpretationViewSet, 'RESULT_POLL_INTERVAL', 0.01))
+        request = AsyncRequestFactory().get('/', {'wait': 5})
+        response, _ = await asyncio.gather(async_views.interpretation_result(request, interpretation.id),
+                                           complete_later())
+
+        self.assertEqual(json.loads(response.content),
+                         {'id': interpretation.id, 'status': 'completed', 'ready': True, 'ai_response': 'Готово'})
+
+    def test_sync_result_does_not_wait(self):
+        interpretation = Interpretation.objects.create(user=self.user, spread=self.spread, status='pending')
+
+        with mock.patch('time.sleep') as sleep:
+            response = self.client.get(f'/api/tarot/interpretations/{interpretation.id}/result/', {'wait': 25})
+
+        sleep.assert_not_called()
+        self.assertEqual(response.json()['ready'], False)
+        self.assertEqual(response['Retry-After'], str(InterpretationViewSet.RESULT_RETRY_AFTER))
+
+    def test_client_disconnect_marks_interpretation_failed(self):
+        response = self.stream(StreamingModel(['Карты ', 'говорят ', 'о переменах.']))
+        content = iter(response.streaming_content)
+        start = self.parse(next(content).decode().strip())[1]
+        self.assertEqual(self.parse(next(content).decode().strip()), ('chunk', {'text': 'Карты '}))
+
+        # Сервер закрывает ответ, когда клиент отключился
+        response.close()
+
+        interpretation = Interpretation.objects.get(id=start['interpretation_id'])
+        self.assertEqual((interpretation.status, interpretation.ai_response), ('failed', 'Карты '))
+        # Токены, полученные до отключения, учтены
+        self.writer.record.assert_called_once()
+        self.assertGreater(self.writer.record.call_args.args[3], 0)
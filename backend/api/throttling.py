@@ -0,0 +1,94 @@
+import logging
+from typing import Any, Optional
+
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled, ValidationError
+from rest_framework.throttling import BaseThrottle
+
+from core.metrics import record_cache
+from core.ratelimit import reading_rate_limiter
+from tarot.models import TarotSpread
+
+logger = logging.getLogger(__name__)
+
+SPREAD_PROJECT_KEY = 'api:spread_project:{spread_id}'
+SPREAD_PROJECT_TTL = 86400
+
+
+def spread_project_id(spread_id: Any) -> Optional[int]:
+    """
+    Проект расклада для лимита проекта
+
+    Расклад не переходит между проектами, поэтому соответствие хранится
+    в кэше и БД читается один раз на расклад.
+    """
+    try:
+        spread_id = int(spread_id)
+    except (TypeError, ValueError):
+        return None
+    key = SPREAD_PROJECT_KEY.format(spread_id=spread_id)
+    project_id = cache.get(key)
+    record_cache('spread_project', project_id is not None)
+    if project_id is None:
+        project_id = TarotSpread.objects.filter(pk=spread_id).values_list('project_id', flat=True).first()
+        if project_id is None:
+            return None
+        cache.set(key, project_id, SPREAD_PROJECT_TTL)
+    return project_id
+
+
+def continues_reading(data: Any) -> bool:
+    """
+    Продолжает ли create_interpretation расклад, начатый в get_cards
+
+    Один расклад расходует один токен лимита: его списывает get_cards,
+    а create_interpretation — только когда сам вытягивает новые карты,
+    без draft_token и interpretation_id.
+    """
+    return bool(data.get('draft_token') or data.get('interpretation_id'))
+
+
+def check_reading_limit(user_id: Any, spread_id: Any) -> Optional[float]:
+    """
+    Лимит раскладов пользователя (UserProfile.id) и проекта расклада
+
+    Id пользователя приводится к int, чтобы "1", "01" и " 1" попадали
+    в одну корзину.
+
+    Returns:
+        None, если запрос разрешен, иначе через сколько секунд повторить
+
+    Raises:
+        ValueError: id пользователя не является числом
+    """
+    if not user_id or not reading_rate_limiter.enabled:
+        # Без пользователя запрос отклонит само представление
+        return None
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        raise ValueError(f"Некорректный id пользователя: {user_id!r}")
+    return reading_rate_limiter.check(spread_project_id(spread_id), f'profile:{user_id}')
+
+
+class ReadingThrottled(Throttled):
+    default_detail = 'Слишком много раскладов подряд.'
+    extra_detail_singular = 'Попробуйте снова через {wait} секунду.'
+    extra_detail_plural = 'Попробуйте снова через {wait} секунд.'
+
+
+class ReadingRateThrottle(BaseThrottle):
+    """Ограничивает частоту раскладов по пользователю и проекту: один токен на расклад"""
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if getattr(view, 'action', None) == 'create_interpretation' and continues_reading(request.data):
+            return True
+        try:
+            self.retry_after = check_reading_limit(request.data.get('user'), request.data.get('spread'))
+        except ValueError:
+            raise ValidationError({'user': 'Некорректный id пользователя'})
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
@@ -1,10 +1,12 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ProjectViewSet, UserProfileViewSet, TarotDeckViewSet, TarotCardViewSet,
     TarotSpreadViewSet, InterpretationViewSet, PackageViewSet, PaymentViewSet,
-    TelegramBotViewSet, HealthCheckView
+    TelegramBotViewSet, HealthCheckView, LivenessView, ReadinessView
 )
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'projects', ProjectViewSet)
@@ -19,5 +21,16 @@ router.register(r'telegram', TelegramBotViewSet, basename='telegram')
 
 urlpatterns = [
     path('health/', HealthCheckView.as_view(), name='health-check'),
+    path('health/live/', LivenessView.as_view(), name='health-live'),
+    path('health/ready/', ReadinessView.as_view(), name='health-ready'),
     path('', include(router.urls)),
-] 
\ No newline at end of file
+]
+
+if settings.TAROT_ASYNC_VIEWS:
+    # Под ASGI эндпоинты раскладов и webhook обслуживаются асинхронными представлениями
+    urlpatterns[:0] = [
+        path('tarot/interpretations/get_cards/', async_views.get_cards),
+        path('tarot/interpretations/create_interpretation/', async_views.create_interpretation),
+        path('tarot/interpretations/<int:pk>/result/', async_views.interpretation_result),
+        path('telegram/webhook/', async_views.telegram_webhook),
+    ]
@@ -5,41 +5,95 @@ from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+import json
+import logging
 
+from .catalog import CatalogSnapshotListMixin, parse_project_id, snapshot_response
+from .conditional import ConditionalGetMixin, conditional_response
+from .pagination import HistoryCursorPagination
+from .throttling import ReadingRateThrottle, ReadingThrottled
 from .serializers import (
     ProjectSerializer, UserProfileSerializer, TarotDeckSerializer, TarotCardSerializer,
     TarotSpreadSerializer, InterpretationSerializer, PackageSerializer, 
     PaymentSerializer, PaymentCreateSerializer, ThemeSettingsSerializer
 )
 from projects.models import Project
+from projects.catalog import project_catalog
 from users.models import UserProfile
+from users.services import BalanceService
 from tarot.models import TarotDeck, TarotCard, TarotSpread, Interpretation
 from payments.models import Package, Payment
 from telegram_bot.handlers import TelegramBotManager
+from telegram_bot.ingestion import get_update_ingestor
 from tarot.services import yandex_gpt_service
+from tarot.health import yandex_gpt_probe
+from tarot.deck_index import deck_index
+from tarot.drafts import reading_drafts
+from tarot.readings import orient_cards, create_paid_interpretation, get_interpretation_cards
+from tarot.renditions import absolute_media_url, media_base_url
+from tarot.tasks import generate_interpretation_task
+from stats.rollups import get_dashboard
+
+logger = logging.getLogger(__name__)
 
 class HealthCheckView(APIView):
     """Простой endpoint для проверки здоровья API"""
     permission_classes = [AllowAny]
     
     def get(self, request):
-        # Проверяем статус YandexGPT сервиса
-        yandex_status = yandex_gpt_service.get_model_info()
+        # Статус YandexGPT берем из результатов фоновой проверки
+        yandex_status = yandex_gpt_probe.get_status()
         
         return Response({
             'status': 'ok',
             'message': 'API работает корректно',
             'timestamp': timezone.now().isoformat(),
-            'yandexgpt': {
-                'sdk_available': yandex_status['sdk_available'],
-                'model_initialized': yandex_status['model_initialized'],
-                'api_key_configured': yandex_status['api_key_configured'],
-                'folder_id_configured': yandex_status['folder_id_configured'],
-                'connection_test': yandex_status['connection_test']
-            }
+            'yandexgpt': yandex_status,
+            'response_cache': yandex_gpt_service.response_cache.get_stats()
+        })
+
+class LivenessView(APIView):
+    """Liveness-проба: процесс жив и отвечает на запросы"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        return Response({
+            'status': 'ok',
+            'timestamp': timezone.now().isoformat()
         })
 
+class ReadinessView(APIView):
+    """Readiness-проба: приложение готово обслуживать запросы"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        checks = {'database': True}
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception as e:
+            logger.error(f"Readiness: база данных недоступна: {e}")
+            checks['database'] = False
+        
+        # Недоступность YandexGPT не делает сервис неготовым — работают запасные интерпретации
+        yandex_status = yandex_gpt_probe.get_status()
+        ready = all(checks.values())
+        
+        return Response({
+            'status': ('ok' if yandex_status['connection_test'] else 'degraded') if ready else 'unavailable',
+            'timestamp': timezone.now().isoformat(),
+            'checks': checks,
+            'yandexgpt': yandex_status
+        }, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
 class ProjectViewSet(viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
@@ -52,12 +106,24 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def theme_settings(self, request, pk=None):
         """Получение настроек темы для проекта"""
-        project = self.get_object()
-        serializer = self.get_serializer(project)
-        return Response({
-            'success': True,
-            'theme_settings': serializer.data['theme_settings']
-        })
+        project_id = parse_project_id(pk)
+        snapshot = project_catalog.get(project_id) if project_id else None
+        if snapshot is not None:
+            # Тема берется из снимка справочников, запросов к БД нет
+            return snapshot_response(request, snapshot, lambda: Response({
+                'success': True,
+                'theme_settings': snapshot.theme_settings
+            }))
+
+        def render():
+            project = self.get_object()
+            serializer = self.get_serializer(project)
+            return Response({
+                'success': True,
+                'theme_settings': serializer.data['theme_settings']
+            })
+        
+        return conditional_response(request, self.get_queryset(), render, lookup={'pk': pk})
 
     @action(detail=True, methods=['post'])
     def update_theme_settings(self, request, pk=None):
@@ -85,6 +151,28 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 'errors': theme_serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """
+        Статистика проекта по дням из заранее агрегированных таблиц
+
+        Период задается параметрами date_from и date_to (ГГГГ-ММ-ДД)
+        или days (последние N дней, по умолчанию 30).
+        """
+        project = self.get_object()
+        today = timezone.localdate()
+        try:
+            days = int(request.query_params.get('days', 30))
+            date_to = parse_date(request.query_params.get('date_to', '')) or today
+            date_from = parse_date(request.query_params.get('date_from', '')) or date_to - timedelta(days=days - 1)
+        except ValueError:
+            return Response({'error': 'Некорректный период'}, status=status.HTTP_400_BAD_REQUEST)
+        if date_from > date_to or (date_to - date_from).days >= settings.STATS_DASHBOARD_MAX_DAYS:
+            return Response({
+                'error': f'Период должен быть не длиннее {settings.STATS_DASHBOARD_MAX_DAYS} дней'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_dashboard(project.id, date_from, date_to))
+
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
         """Имитация отправки сообщения боту"""
@@ -106,7 +194,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     search_fields = ['username', 'telegram_user_id']
     ordering_fields = ['created_at', 'username']
 
-class TarotDeckViewSet(viewsets.ModelViewSet):
+class TarotDeckViewSet(CatalogSnapshotListMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TarotDeck.objects.all()
     serializer_class = TarotDeckSerializer
     permission_classes = [AllowAny]  # Временно отключаем аутентификацию для тестирования
@@ -114,8 +202,36 @@ class TarotDeckViewSet(viewsets.ModelViewSet):
     filterset_fields = ['project']
     search_fields = ['name', 'description']
     ordering_fields = ['created_at', 'name']
+    catalog_field = 'decks'
+
+    @action(detail=True, methods=['get'])
+    def images(self, request, pk=None):
+        """Изображения карт колоды: оригиналы и готовые копии с размерами и весом"""
+        def render():
+            deck = self.get_object()
+            media_base = media_base_url(request)
+            cards = [card for card in deck_index.get_cards(deck.project_id) if card.deck_id == deck.id]
+            return Response({
+                'deck': deck.id,
+                'cards': [{
+                    'id': card.id,
+                    'name': card.name,
+                    'image': absolute_media_url(card.image_url, media_base),
+                    'original': absolute_media_url(card.original_url, media_base),
+                    'renditions': [{
+                        'size': rendition.size,
+                        'format': rendition.format,
+                        'url': absolute_media_url(rendition.url, media_base),
+                        'width': rendition.width,
+                        'height': rendition.height,
+                        'file_size': rendition.file_size,
+                    } for rendition in card.renditions],
+                } for card in cards]
+            })
 
-class TarotCardViewSet(viewsets.ModelViewSet):
+        return conditional_response(request, self.get_queryset(), render, lookup={'pk': pk})
+
+class TarotCardViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TarotCard.objects.all()
     serializer_class = TarotCardSerializer
     permission_classes = [AllowAny]  # Временно отключаем аутентификацию для тестирования
@@ -123,8 +239,10 @@ class TarotCardViewSet(viewsets.ModelViewSet):
     filterset_fields = ['deck']
     search_fields = ['name', 'meaning_upright', 'meaning_reversed']
     ordering_fields = ['order', 'name']
+    # У карт нет updated_at: изменения отслеживаются по отметке изменения справочников
+    last_modified_field = None
 
-class TarotSpreadViewSet(viewsets.ModelViewSet):
+class TarotSpreadViewSet(CatalogSnapshotListMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TarotSpread.objects.all()
     serializer_class = TarotSpreadSerializer
     permission_classes = [AllowAny]  # Временно отключаем аутентификацию для тестирования
@@ -132,6 +250,7 @@ class TarotSpreadViewSet(viewsets.ModelViewSet):
     filterset_fields = ['project', 'num_cards']
     search_fields = ['name', 'description']
     ordering_fields = ['created_at', 'name']
+    catalog_field = 'spreads'
 
 class InterpretationViewSet(viewsets.ModelViewSet):
     queryset = Interpretation.objects.all()
@@ -141,8 +260,105 @@ class InterpretationViewSet(viewsets.ModelViewSet):
     filterset_fields = ['user', 'spread']
     search_fields = ['ai_response']
     ordering_fields = ['created_at']
+    ordering = ['-created_at', '-id']
+    pagination_class = HistoryCursorPagination
 
-    @action(detail=False, methods=['post'])
+    def get_queryset(self):
+        return InterpretationSerializer.setup_eager_loading(super().get_queryset())
+
+    def throttled(self, request, wait):
+        # Проверка лимита идет до обращения к БД: отказ стоит одного запроса к хранилищу корзин
+        raise ReadingThrottled(wait)
+
+    # Интервал опроса БД при long-poll ожидании результата в асинхронном представлении (секунды)
+    RESULT_POLL_INTERVAL = 0.5
+    # Через сколько секунд клиенту повторить запрос результата, если он еще не готов
+    RESULT_RETRY_AFTER = 1
+
+    def _use_async_mode(self, request):
+        """Определяет, генерировать ли AI-ответ в фоне через Celery"""
+        value = request.data.get('async', settings.TAROT_ASYNC_INTERPRETATIONS)
+        return str(value).lower() in ('1', 'true', 'yes')
+
+    def _use_draft_mode(self, request):
+        """Определяет, хранить ли карты get_cards в черновике вместо временной интерпретации"""
+        value = request.data.get('draft', settings.TAROT_DRAFT_READINGS)
+        return str(value).lower() in ('1', 'true', 'yes')
+
+    def _use_stream_mode(self, request):
+        """Определяет, отдавать ли AI-ответ потоком Server-Sent Events"""
+        return str(request.data.get('stream', False)).lower() in ('1', 'true', 'yes')
+
+    @staticmethod
+    def _sse_event(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def _stream_interpretation(self, request, interpretation, spread, cards_data, cards_used, user_context):
+        """
+        Поток Server-Sent Events с фрагментами AI-ответа
+
+        События: start (данные расклада), chunk (новый фрагмент текста)
+        и done (итог). Итоговый текст сохраняется, когда поток закончится;
+        если клиент отключился раньше, интерпретация помечается как failed.
+
+        Под ASGI тело отдается асинхронным итератором: синхронный Django
+        сначала собрал бы весь поток в список, а ожидание фрагментов
+        занимало бы поток воркера.
+        """
+        start = self._sse_event('start', {
+            'interpretation_id': interpretation.id,
+            'spread_name': spread.name,
+            'cards_used': cards_used,
+        })
+
+        def done():
+            return self._sse_event('done', {
+                'interpretation_id': interpretation.id,
+                'status': interpretation.status,
+                'ai_response': interpretation.ai_response,
+                'ai_service_status': 'active' if yandex_gpt_service.is_available() else 'fallback',
+            })
+
+        def events():
+            yield start
+            chunks = []
+            finished = False
+            try:
+                for chunk in yandex_gpt_service.stream_interpretation(spread.name, cards_data, user_context,
+                                                                      spread.project_id):
+                    chunks.append(chunk)
+                    yield self._sse_event('chunk', {'text': chunk})
+                finished = True
+            finally:
+                interpretation.ai_response = ''.join(chunks)
+                interpretation.status = 'completed' if finished else 'failed'
+                interpretation.save(update_fields=['ai_response', 'status'])
+            yield done()
+
+        async def aevents():
+            yield start
+            chunks = []
+            finished = False
+            try:
+                async for chunk in yandex_gpt_service.astream_interpretation(spread.name, cards_data, user_context,
+                                                                             spread.project_id):
+                    chunks.append(chunk)
+                    yield self._sse_event('chunk', {'text': chunk})
+                finished = True
+            finally:
+                interpretation.ai_response = ''.join(chunks)
+                interpretation.status = 'completed' if finished else 'failed'
+                await interpretation.asave(update_fields=['ai_response', 'status'])
+            yield done()
+
+        is_asgi = isinstance(getattr(request, '_request', request), ASGIRequest)
+        response = StreamingHttpResponse(aevents() if is_asgi else events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Запрещаем nginx буферизовать поток
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=False, methods=['post'], throttle_classes=[ReadingRateThrottle])
     def create_interpretation(self, request):
         """Создание новой интерпретации с AI-ответом"""
         try:
@@ -150,6 +366,7 @@ class InterpretationViewSet(viewsets.ModelViewSet):
             user_id = request.data.get('user')
             spread_id = request.data.get('spread')
             interpretation_id = request.data.get('interpretation_id')  # ID существующей интерпретации
+            draft_token = request.data.get('draft_token')  # Токен черновика из get_cards
             user_context = request.data.get('user_context', '')  # Дополнительный контекст от пользователя
             
             if not user_id or not spread_id:
@@ -161,15 +378,34 @@ class InterpretationViewSet(viewsets.ModelViewSet):
             user = UserProfile.objects.get(id=user_id)
             spread = TarotSpread.objects.get(id=spread_id)
             
+            draft = None
+            interpretation = None
+            
+            # Если указан draft_token, берем карты из черновика; интерпретация еще не создана
+            if draft_token:
+                draft = reading_drafts.claim(draft_token, user.id, spread.id)
+                if draft is None:
+                    return Response({
+                        'error': 'Расклад не найден или устарел. Вытяните карты заново.'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                loaded = reading_drafts.load_cards(draft)
+                if loaded is None:
+                    return Response({
+                        'error': 'Карты расклада больше недоступны. Вытяните карты заново.'
+                    }, status=status.HTTP_409_CONFLICT)
+                cards, cards_data = loaded
+                user_context = user_context or draft.user_context
             # Если указан interpretation_id, используем существующую интерпретацию
-            if interpretation_id:
+            elif interpretation_id:
                 try:
                     interpretation = Interpretation.objects.get(id=interpretation_id, user=user, spread=spread)
-                    cards = list(interpretation.cards.all())
                 except Interpretation.DoesNotExist:
                     return Response({
                         'error': 'Интерпретация не найдена'
                     }, status=status.HTTP_404_NOT_FOUND)
+                # Карты и ориентация — те же, что были показаны пользователю
+                cards, reversed_flags = get_interpretation_cards(interpretation, spread.project_id)
+                cards_data = orient_cards(cards, reversed_flags)
             else:
                 # Проверяем баланс пользователя (только для новых интерпретаций)
                 if user.balance <= 0:
@@ -177,50 +413,112 @@ class InterpretationViewSet(viewsets.ModelViewSet):
                         'error': 'Недостаточно раскладов. Пополните баланс.'
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
-                # Получаем карты для расклада
-                cards = TarotCard.objects.filter(deck__project=spread.project).order_by('?')[:spread.num_cards]
+                # Получаем карты для расклада из индекса колод
+                cards = deck_index.draw(spread.project_id, spread.num_cards)
                 
                 if len(cards) < spread.num_cards:
                     return Response({
                         'error': f'Недостаточно карт для расклада. Нужно {spread.num_cards}, доступно {len(cards)}'
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
-                # Создаем новую интерпретацию
-                interpretation = Interpretation.objects.create(
-                    user=user,
-                    spread=spread,
-                    ai_response='',
-                    user_question=user_context if user_context else None
-                )
-                interpretation.cards.set(cards)
-                
-                # Уменьшаем баланс пользователя
-                user.balance -= 1
-                user.save()
-            
-            # Подготавливаем данные карт для AI
-            cards_data = []
-            for card in cards:
-                # Определяем, прямая или перевернутая карта (случайно)
-                import random
-                is_reversed = random.choice([True, False])
+                # Ориентация карт выбирается случайно и сохраняется вместе с раскладом
+                cards_data = orient_cards(cards)
                 
-                cards_data.append({
-                    'name': card.name,
-                    'meaning': card.meaning_reversed if is_reversed else card.meaning_upright,
-                    'is_reversed': is_reversed
-                })
+                # Списываем расклад и создаем интерпретацию в одной транзакции
+                created = create_paid_interpretation(user, spread, cards, user_context, cards_data=cards_data)
+                if created is None:
+                    return Response({
+                        'error': 'Недостаточно раскладов. Пополните баланс.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                interpretation, user.balance = created
             
-            # Генерируем AI-ответ через сервис YandexGPT
-            ai_response = yandex_gpt_service.generate_interpretation(
-                spread_name=spread.name,
-                cards=cards_data,
-                user_context=user_context
-            )
+            cards_used = [{'name': card.name, 'is_reversed': card_data['is_reversed']}
+                          for card, card_data in zip(cards, cards_data)]
+            
+            stream_mode = self._use_stream_mode(request)
+            async_mode = not stream_mode and self._use_async_mode(request)
+            
+            if draft is not None and (stream_mode or async_mode):
+                # Генерация идет вне запроса, поэтому интерпретация нужна сразу: списываем и создаем ее
+                created = create_paid_interpretation(user, spread, cards, user_context, status='pending',
+                                                     cards_data=cards_data)
+                if created is None:
+                    reading_drafts.restore(draft)
+                    return Response({
+                        'error': 'Недостаточно раскладов. Пополните баланс.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                interpretation, user.balance = created
             
-            # Обновляем интерпретацию с AI-ответом
-            interpretation.ai_response = ai_response
-            interpretation.save()
+            # В потоковом режиме отдаем текст модели по мере генерации
+            if stream_mode:
+                interpretation.status = 'pending'
+                interpretation.save(update_fields=['status'])
+                return self._stream_interpretation(request, interpretation, spread, cards_data, cards_used,
+                                                   user_context)
+            
+            # В асинхронном режиме ставим генерацию в очередь Celery и сразу отвечаем 202
+            if async_mode:
+                interpretation.status = 'pending'
+                interpretation.save(update_fields=['status'])
+                try:
+                    generate_interpretation_task.delay(
+                        interpretation.id, spread.name, cards_data, user_context, project_id=spread.project_id
+                    )
+                    return Response({
+                        'success': True,
+                        'id': interpretation.id,
+                        'interpretation_id': interpretation.id,
+                        'status': interpretation.status,
+                        'spread_name': spread.name,
+                        'cards_used': cards_used,
+                        'result_url': request.build_absolute_uri(
+                            reverse('interpretation-result', args=[interpretation.id])
+                        )
+                    }, status=status.HTTP_202_ACCEPTED)
+                except Exception as e:
+                    # Брокер недоступен — генерируем ответ синхронно
+                    logger.error(f"Не удалось поставить интерпретацию {interpretation.id} в очередь: {e}")
+            
+            if draft is not None:
+                # Не тратим запрос к модели, если расклад все равно не удастся списать
+                if user.balance <= 0:
+                    reading_drafts.restore(draft)
+                    return Response({
+                        'error': 'Недостаточно раскладов. Пополните баланс.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                try:
+                    ai_response = yandex_gpt_service.generate_interpretation(
+                        spread_name=spread.name,
+                        cards=cards_data,
+                        user_context=user_context,
+                        project_id=spread.project_id
+                    )
+                except Exception:
+                    reading_drafts.restore(draft)
+                    raise
+                
+                # Списываем расклад и сохраняем готовую интерпретацию в одной транзакции
+                created = create_paid_interpretation(user, spread, cards, user_context, cards_data=cards_data,
+                                                     ai_response=ai_response)
+                if created is None:
+                    reading_drafts.restore(draft)
+                    return Response({
+                        'error': 'Недостаточно раскладов. Пополните баланс.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                interpretation, user.balance = created
+            else:
+                # Генерируем AI-ответ через сервис YandexGPT
+                ai_response = yandex_gpt_service.generate_interpretation(
+                    spread_name=spread.name,
+                    cards=cards_data,
+                    user_context=user_context,
+                    project_id=spread.project_id
+                )
+                
+                # Обновляем интерпретацию с AI-ответом
+                interpretation.ai_response = ai_response
+                interpretation.status = 'completed'
+                interpretation.save()
             
             # Возвращаем результат через сериализатор для правильной структуры
             serializer = self.get_serializer(interpretation, context={'request': request})
@@ -228,9 +526,8 @@ class InterpretationViewSet(viewsets.ModelViewSet):
             
             # Добавляем дополнительную информацию
             response_data['success'] = True
-            response_data['cards_used'] = [{'name': card.name, 'is_reversed': card_data['is_reversed']} 
-                                          for card, card_data in zip(cards, cards_data)]
-            response_data['ai_service_status'] = 'active' if yandex_gpt_service.model else 'fallback'
+            response_data['cards_used'] = cards_used
+            response_data['ai_service_status'] = 'active' if yandex_gpt_service.is_available() else 'fallback'
             
             return Response(response_data, status=status.HTTP_201_CREATED)
             
@@ -247,7 +544,7 @@ class InterpretationViewSet(viewsets.ModelViewSet):
                 'error': f'Ошибка создания интерпретации: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], throttle_classes=[ReadingRateThrottle])
     def get_cards(self, request):
         """Получение карт для расклада без создания интерпретации"""
         try:
@@ -271,60 +568,57 @@ class InterpretationViewSet(viewsets.ModelViewSet):
                     'error': 'Недостаточно раскладов. Пополните баланс.'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Получаем карты для расклада
-            cards = TarotCard.objects.filter(deck__project=spread.project).order_by('?')[:spread.num_cards]
+            # Получаем карты для расклада из индекса колод
+            cards = deck_index.draw(spread.project_id, spread.num_cards)
             
             if len(cards) < spread.num_cards:
                 return Response({
                     'error': f'Недостаточно карт для расклада. Нужно {spread.num_cards}, доступно {len(cards)}'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Подготавливаем данные карт
-            cards_data = []
+            # Подготавливаем данные карт, ориентация карт выбирается случайно
+            cards_data = orient_cards(cards)
             cards_names = []
             cards_images = []
             cards_used = []
+            media_base = media_base_url(request)
             
-            for card in cards:
-                # Определяем, прямая или перевернутая карта (случайно)
-                import random
-                is_reversed = random.choice([True, False])
-                
-                cards_data.append({
-                    'name': card.name,
-                    'meaning': card.meaning_reversed if is_reversed else card.meaning_upright,
-                    'is_reversed': is_reversed
-                })
-                
+            for card, card_data in zip(cards, cards_data):
                 cards_names.append(card.name)
                 
-                # Добавляем изображение карты
-                request = self.request
-                if card.image:
-                    if request is not None:
-                        cards_images.append(request.build_absolute_uri(card.image.url))
-                    else:
-                        cards_images.append(card.image.url)
-                else:
-                    cards_images.append('')
+                # Добавляем изображение карты: URL копии заранее вычислен индексом колод
+                cards_images.append(absolute_media_url(card.image_url, media_base))
                 
                 cards_used.append({
                     'name': card.name,
-                    'is_reversed': is_reversed
+                    'is_reversed': card_data['is_reversed']
                 })
             
-            # Создаем временную интерпретацию (без AI-ответа) для связи карт
-            interpretation = Interpretation.objects.create(
-                user=user,
-                spread=spread,
-                ai_response='',  # Пустой ответ, будет заполнен позже
-                user_question=user_context if user_context else None
-            )
-            interpretation.cards.set(cards)
+            if self._use_draft_mode(request):
+                # Карты живут в черновике, расклад спишется при создании интерпретации
+                draft = reading_drafts.create(user.id, spread, cards, cards_data, user_context)
+                return Response({
+                    'success': True,
+                    'interpretation_id': None,
+                    'draft_token': draft.token,
+                    'draft_expires_in': reading_drafts.ttl,
+                    'spread_name': spread.name,
+                    'cards_names': cards_names,
+                    'cards_images': cards_images,
+                    'cards_used': cards_used,
+                    # Расклад еще не списан: текущий баланс и цена, которую спишет create_interpretation
+                    'new_balance': user.balance,
+                    'cost': 1
+                }, status=status.HTTP_200_OK)
             
-            # Уменьшаем баланс пользователя
-            user.balance -= 1
-            user.save()
+            # Списываем расклад и создаем временную интерпретацию (без AI-ответа) в одной транзакции
+            created = create_paid_interpretation(user, spread, cards, user_context, status='pending',
+                                                 cards_data=cards_data)
+            if created is None:
+                return Response({
+                    'error': 'Недостаточно раскладов. Пополните баланс.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            interpretation, user.balance = created
             
             # Возвращаем результат
             return Response({
@@ -350,7 +644,35 @@ class InterpretationViewSet(viewsets.ModelViewSet):
                 'error': f'Ошибка получения карт: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class PackageViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        """
+        Статус и результат генерации интерпретации
+
+        Синхронный воркер не ждет генерацию: ответ приходит сразу, а пока
+        интерпретация не готова, заголовок Retry-After подсказывает клиенту,
+        когда спросить снова. Long-poll (?wait=N) поддерживает только
+        асинхронное представление (TAROT_ASYNC_VIEWS), здесь параметр
+        игнорируется.
+        """
+        data = Interpretation.objects.filter(id=pk).values('id', 'status', 'ai_response').first()
+        if data is None:
+            return Response({
+                'error': 'Интерпретация не найдена'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        ready = data['status'] != 'pending'
+        response = Response({
+            'id': data['id'],
+            'status': data['status'],
+            'ready': ready,
+            'ai_response': data['ai_response'] if data['status'] == 'completed' else None
+        })
+        if not ready:
+            response['Retry-After'] = str(self.RESULT_RETRY_AFTER)
+        return response
+
+class PackageViewSet(CatalogSnapshotListMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Package.objects.filter(is_active=True)
     serializer_class = PackageSerializer
     permission_classes = [AllowAny]  # Временно отключаем аутентификацию для тестирования
@@ -358,6 +680,7 @@ class PackageViewSet(viewsets.ModelViewSet):
     filterset_fields = ['project', 'package_type', 'is_active']
     search_fields = ['name']
     ordering_fields = ['price', 'created_at', 'name']
+    catalog_field = 'packages'
 
 class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.all()
@@ -367,6 +690,12 @@ class PaymentViewSet(viewsets.ModelViewSet):
     filterset_fields = ['user', 'project', 'package', 'status']
     search_fields = ['external_id']
     ordering_fields = ['created_at', 'amount']
+    ordering = ['-created_at', '-id']
+    pagination_class = HistoryCursorPagination
+
+    def get_queryset(self):
+        # Имена пользователя, проекта и пакета в ответе без запроса на каждую строку
+        return super().get_queryset().select_related('user', 'project', 'package')
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -405,28 +734,28 @@ class PaymentViewSet(viewsets.ModelViewSet):
                     'error': 'Пакет неактивен'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Создаем платеж
-            payment = Payment.objects.create(
-                user=user,
-                project=project,
-                package=package,
-                amount=package.price,
-                status='completed',  # Сразу отмечаем как завершенный
-                external_id=f'test_payment_{timezone.now().timestamp()}',
-                payment_url='https://test-payment.example.com'
-            )
-            
-            # Обновляем баланс пользователя
-            if package.package_type == 'one_time':
-                # Разовый пакет - добавляем расклады
-                user.balance += package.num_readings
-            else:
-                # Подписка - устанавливаем даты подписки
-                from datetime import timedelta
-                user.subscription_start = timezone.now().date()
-                user.subscription_end = timezone.now().date() + timedelta(days=package.subscription_days)
-            
-            user.save()
+            with transaction.atomic():
+                # Создаем платеж
+                payment = Payment.objects.create(
+                    user=user,
+                    project=project,
+                    package=package,
+                    amount=package.price,
+                    status='completed',  # Сразу отмечаем как завершенный
+                    completed_at=timezone.now(),
+                    external_id=f'test_payment_{timezone.now().timestamp()}',
+                    payment_url='https://test-payment.example.com'
+                )
+                
+                # Обновляем баланс пользователя
+                if package.package_type == 'one_time':
+                    # Разовый пакет - добавляем расклады
+                    user.balance = BalanceService.credit(user.id, package.num_readings or 0)
+                else:
+                    # Подписка - продлеваем даты подписки
+                    user.subscription_start, user.subscription_end = BalanceService.extend_subscription(
+                        user.id, package.subscription_days or 0
+                    )
             
             # Возвращаем результат
             serializer = PaymentSerializer(payment)
@@ -488,10 +817,21 @@ class TelegramBotViewSet(viewsets.ViewSet):
         """Имитация webhook от Telegram"""
         project_id = request.data.get('project_id')
         message_data = request.data.get('message', {})
+        token = request.data.get('token')
         
         try:
-            response = TelegramBotManager.handle_webhook(project_id, message_data)
-            return Response(response)
+            if settings.TELEGRAM_UPDATE_QUEUE == 'sync':
+                response = TelegramBotManager.handle_webhook(project_id, message_data, token)
+                return Response(response)
+            
+            # Проверяем обновление, ставим его в очередь и сразу подтверждаем прием
+            handler = TelegramBotManager.get_bot_handler(project_id, token)
+            if not isinstance(message_data, dict):
+                return Response({'error': 'Некорректное сообщение'}, status=status.HTTP_400_BAD_REQUEST)
+            accepted = get_update_ingestor().submit(
+                handler.project.id, message_data, request.data.get('update_id')
+            )
+            return Response({'ok': True, 'queued': accepted})
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
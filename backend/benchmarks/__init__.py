@@ -0,0 +1,5 @@
+"""
+Бенчмарк API: наполнение БД, прогон эндпоинтов и сравнение с базовой линией
+
+Запуск: python manage.py benchmark_api
+"""
@@ -0,0 +1,110 @@
+import logging
+import random
+from decimal import Decimal
+from typing import Dict, Any
+
+from django.db import transaction
+
+from projects.models import Project
+from users.models import UserProfile
+from tarot.card_data import get_deck_cards
+from tarot.models import TarotDeck, TarotCard, TarotSpread, Interpretation
+from payments.models import Package, Payment
+
+logger = logging.getLogger(__name__)
+
+# Баланс пользователей с запасом на все запросы бенчмарка, списывающие расклады
+BENCHMARK_BALANCE = 1_000_000
+
+
+@transaction.atomic
+def seed_dataset(projects: int = 2, users: int = 25, interpretations: int = 2, seed: int = 42) -> Dict[str, Any]:
+    """
+    Наполняет БД данными для бенчмарка
+
+    Каждый проект получает полную колоду из 78 карт, два расклада,
+    два пакета, users пользователей с одним платежом и interpretations
+    интерпретаций на пользователя. Данные создаются через bulk_create,
+    поэтому сигналы моделей не срабатывают.
+
+    Returns:
+        Параметры набора и id объектов первого проекта для запросов
+    """
+    rng = random.Random(seed)
+    deck_cards = get_deck_cards()
+
+    project_objects = Project.objects.bulk_create([
+        Project(name=f'Benchmark Bot {i}', telegram_token=f'benchmark-token-{i}')
+        for i in range(projects)
+    ])
+    decks = TarotDeck.objects.bulk_create([
+        TarotDeck(name='Классическая колода Таро', project=project) for project in project_objects
+    ])
+    cards = TarotCard.objects.bulk_create([
+        TarotCard(
+            deck=deck, name=card.name, meaning_upright=card.meaning_upright,
+            meaning_reversed=card.meaning_reversed, image=f'tarot/cards/{card.image}', order=order
+        )
+        for deck in decks
+        for order, card in enumerate(deck_cards)
+    ])
+    spreads = TarotSpread.objects.bulk_create([
+        TarotSpread(project=project, name=name, num_cards=num_cards)
+        for project in project_objects
+        for name, num_cards in (('Карта дня', 1), ('Прошлое, настоящее, будущее', 3))
+    ])
+    packages = Package.objects.bulk_create([
+        Package(project=project, name=name, package_type=package_type, price=Decimal(price),
+                num_readings=num_readings, subscription_days=subscription_days)
+        for project in project_objects
+        for name, package_type, price, num_readings, subscription_days in (
+            ('5 раскладов', 'one_time', '199.00', 5, None),
+            ('Месяц', 'subscription', '499.00', None, 30),
+        )
+    ])
+    profiles = UserProfile.objects.bulk_create([
+        UserProfile(project=project, telegram_user_id=100000 + i, username=f'benchmark_{i}',
+                    balance=BENCHMARK_BALANCE)
+        for project in project_objects
+        for i in range(users)
+    ])
+    Payment.objects.bulk_create([
+        Payment(user=profile, project_id=profile.project_id, package=packages[2 * (i // users)],
+                amount=packages[2 * (i // users)].price, status='completed')
+        for i, profile in enumerate(profiles)
+    ])
+
+    cards_by_project = {
+        project.id: cards[i * len(deck_cards):(i + 1) * len(deck_cards)]
+        for i, project in enumerate(project_objects)
+    }
+    three_card_spreads = {spread.project_id: spread for spread in spreads if spread.num_cards == 3}
+    interpretation_objects = Interpretation.objects.bulk_create([
+        Interpretation(
+            user=profile, spread=three_card_spreads[profile.project_id], ai_response='Интерпретация расклада',
+            card_ids=[card.id for card in rng.sample(cards_by_project[profile.project_id], 3)],
+            reversed_mask=rng.getrandbits(3),
+        )
+        for profile in profiles
+        for _ in range(interpretations)
+    ])
+
+    logger.info(
+        f"Создан набор для бенчмарка: {projects} проектов, {len(profiles)} пользователей, "
+        f"{len(interpretation_objects)} интерпретаций"
+    )
+
+    first_user = profiles[0]
+    return {
+        'params': {'projects': projects, 'users': users, 'interpretations': interpretations},
+        'project_id': project_objects[0].id,
+        'project_token': project_objects[0].telegram_token,
+        'deck_id': decks[0].id,
+        'card_id': cards[0].id,
+        'spread_id': three_card_spreads[project_objects[0].id].id,
+        'package_id': packages[0].id,
+        'user_id': first_user.id,
+        'telegram_user_id': first_user.telegram_user_id,
+        'interpretation_id': interpretation_objects[0].id if interpretation_objects else None,
+        'payment_id': Payment.objects.filter(user=first_user).values_list('id', flat=True).first(),
+    }
@@ -0,0 +1,132 @@
+"""
+Проверка планов горячих запросов: ни один не должен читать таблицу целиком
+
+На маленьком наборе данных планировщик и так предпочитает полное
+сканирование, поэтому в PostgreSQL проверка идет с enable_seqscan = off:
+если Seq Scan остался и при этом запрете, подходящего индекса нет.
+Для SQLite разбирается EXPLAIN QUERY PLAN. Обход индекса целиком ради
+сортировки с последующей фильтрацией строк тоже считается полным
+сканированием — такой план появляется, когда индекса под фильтр нет.
+"""
+import json
+import logging
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from payments.models import Package, Payment
+from tarot.models import Interpretation, TarotCard, TarotSpread
+from users.models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+
+class HotQuery(NamedTuple):
+    name: str
+    build: Callable[[Dict[str, Any]], Any]
+
+
+def _watermark():
+    return timezone.now() - timedelta(minutes=5)
+
+
+# Фильтры и сортировки, которые используют API, бот, админка и агрегация статистики
+HOT_QUERIES = [
+    HotQuery('interpretations_by_user',
+             lambda d: Interpretation.objects.filter(user_id=d['user_id']).order_by('-created_at')[:20]),
+    HotQuery('interpretations_by_spread',
+             lambda d: Interpretation.objects.filter(spread_id=d['spread_id']).order_by('-created_at')[:20]),
+    HotQuery('interpretations_recent', lambda d: Interpretation.objects.order_by('-created_at')[:20]),
+    HotQuery('payments_by_project_status',
+             lambda d: Payment.objects.filter(project_id=d['project_id'], status='completed')[:20]),
+    HotQuery('payments_by_user', lambda d: Payment.objects.filter(user_id=d['user_id'])[:20]),
+    HotQuery('payments_by_status', lambda d: Payment.objects.filter(status='pending')[:20]),
+    HotQuery('payments_recent', lambda d: Payment.objects.all()[:20]),
+    HotQuery('payment_by_external_id', lambda d: Payment.objects.filter(external_id='benchmark-external-id')),
+    HotQuery('packages_active_by_project',
+             lambda d: Package.objects.filter(project_id=d['project_id'], is_active=True).order_by('price')),
+    HotQuery('spreads_by_project', lambda d: TarotSpread.objects.filter(project_id=d['project_id'])),
+    HotQuery('spreads_by_project_and_size',
+             lambda d: TarotSpread.objects.filter(project_id=d['project_id'], num_cards=3)),
+    HotQuery('cards_by_deck', lambda d: TarotCard.objects.filter(deck_id=d['deck_id'])),
+    HotQuery('users_by_project',
+             lambda d: UserProfile.objects.filter(project_id=d['project_id']).order_by('-created_at')[:20]),
+    # Окна отметок агрегации дневной статистики
+    HotQuery('users_since_watermark',
+             lambda d: UserProfile.objects.filter(created_at__gt=_watermark(), created_at__lte=timezone.now())),
+    HotQuery('readings_since_watermark',
+             lambda d: Interpretation.objects.filter(created_at__gt=_watermark(), created_at__lte=timezone.now())),
+    HotQuery('payments_since_watermark', lambda d: Payment.objects.filter(
+        status='completed', completed_at__gt=_watermark(), completed_at__lte=timezone.now())),
+    HotQuery('user_by_telegram_id', lambda d: UserProfile.objects.filter(
+        project_id=d['project_id'], telegram_user_id=d['telegram_user_id'])),
+]
+
+
+# СУБД, планы которых умеет разбирать проверка
+SUPPORTED_VENDORS = ('postgresql', 'sqlite')
+
+
+def is_supported() -> bool:
+    """Умеет ли проверка разбирать планы текущей БД"""
+    return connection.vendor in SUPPORTED_VENDORS
+
+
+def find_sequential_scans(dataset: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    Возвращает горячие запросы, план которых читает таблицы целиком
+
+    Для СУБД без разбора планов (см. is_supported) проверка пропускается.
+
+    Returns:
+        Словарь {имя запроса: [таблицы с полным сканированием]}, пустой если регрессий нет
+    """
+    if not is_supported():
+        logger.warning(f"Разбор планов для {connection.vendor} не поддерживается, проверка пропущена")
+        return {}
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    regressions = {}
+    for query in HOT_QUERIES:
+        queryset = query.build(dataset)
+        if connection.vendor == 'postgresql':
+            tables = _postgresql_seq_scans(queryset)
+        else:
+            tables = _sqlite_full_scans(queryset)
+        if tables:
+            logger.warning(f"{query.name}: полное сканирование {', '.join(tables)}")
+            regressions[query.name] = tables
+    return regressions
+
+
+def _postgresql_seq_scans(queryset) -> List[str]:
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = json.loads(queryset.explain(format='json'))
+    return sorted(set(_walk_postgresql_plan(plan[0]['Plan'])))
+
+
+def _walk_postgresql_plan(node: Dict[str, Any]):
+    node_type = node.get('Node Type')
+    if node_type == 'Seq Scan':
+        yield node['Relation Name']
+    elif node_type in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node and 'Filter' in node:
+        yield node['Relation Name']
+    for child in node.get('Plans', []):
+        yield from _walk_postgresql_plan(child)
+
+
+def _sqlite_full_scans(queryset) -> List[str]:
+    filtered = bool(queryset.query.where)
+    tables = set()
+    for line in queryset.explain().splitlines():
+        # Строки плана: "<id> <parent> <notused> SCAN <таблица> [USING INDEX ...]"
+        detail = line.split(' ', 3)[-1]
+        if detail.startswith('SCAN ') and (filtered or ' USING ' not in detail):
+            tables.add(detail.split()[1])
+    return sorted(tables)
@@ -0,0 +1,228 @@
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Any, List, NamedTuple, Optional
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from projects.catalog import project_catalog
+from tarot.deck_index import deck_index
+from tarot.health import percentile
+from tarot.services import yandex_gpt_service
+
+logger = logging.getLogger(__name__)
+
+
+class BenchmarkError(Exception):
+    """Эндпоинт вернул ошибку во время прогона бенчмарка"""
+
+
+class Endpoint(NamedTuple):
+    name: str
+    method: str
+    path: str
+    data: Optional[Dict[str, Any]] = None
+
+
+class _StubAlternative(NamedTuple):
+    text: str
+
+
+class StubYandexGPTModel:
+    """Заглушка модели YandexGPT с фиксированным ответом и задержкой"""
+
+    RESPONSE = 'Карты говорят о переменах. Доверьтесь интуиции и будьте открыты новому.'
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+
+    def run(self, prompt: str):
+        if self.latency:
+            time.sleep(self.latency)
+        return [_StubAlternative(self.RESPONSE)]
+
+
+@contextmanager
+def stub_yandex_gpt(latency: float = 0):
+    """Подменяет модель YandexGPT заглушкой и отключает кэш ответов"""
+    model, cache_enabled = yandex_gpt_service.model, yandex_gpt_service.response_cache.enabled
+    yandex_gpt_service.model = StubYandexGPTModel(latency)
+    yandex_gpt_service.response_cache.enabled = False
+    try:
+        yield
+    finally:
+        yandex_gpt_service.model = model
+        yandex_gpt_service.response_cache.enabled = cache_enabled
+
+
+def build_endpoints(dataset: Dict[str, Any]) -> List[Endpoint]:
+    """Список эндпоинтов API с параметрами из набора данных"""
+    project_id = dataset['project_id']
+    user_id = dataset['user_id']
+    reading = {'user': user_id, 'spread': dataset['spread_id'], 'async': False}
+    webhook = {'project_id': project_id, 'token': dataset['project_token']}
+    telegram_user = {'user_id': dataset['telegram_user_id'], 'username': 'benchmark'}
+
+    return [
+        Endpoint('health', 'get', '/api/health/'),
+        Endpoint('health_live', 'get', '/api/health/live/'),
+        Endpoint('health_ready', 'get', '/api/health/ready/'),
+        Endpoint('projects_list', 'get', '/api/projects/'),
+        Endpoint('projects_detail', 'get', f'/api/projects/{project_id}/'),
+        Endpoint('projects_theme_settings', 'get', f'/api/projects/{project_id}/theme_settings/'),
+        Endpoint('projects_stats', 'get', f'/api/projects/{project_id}/stats/'),
+        Endpoint('users_list', 'get', '/api/users/'),
+        Endpoint('users_detail', 'get', f'/api/users/{user_id}/'),
+        Endpoint('decks_list', 'get', '/api/tarot/decks/'),
+        Endpoint('decks_list_by_project', 'get', f'/api/tarot/decks/?project={project_id}'),
+        Endpoint('decks_detail', 'get', f"/api/tarot/decks/{dataset['deck_id']}/"),
+        Endpoint('cards_list', 'get', '/api/tarot/cards/'),
+        Endpoint('cards_detail', 'get', f"/api/tarot/cards/{dataset['card_id']}/"),
+        Endpoint('spreads_list', 'get', '/api/tarot/spreads/'),
+        Endpoint('spreads_list_by_project', 'get', f'/api/tarot/spreads/?project={project_id}'),
+        Endpoint('spreads_detail', 'get', f"/api/tarot/spreads/{dataset['spread_id']}/"),
+        Endpoint('interpretations_list', 'get', '/api/tarot/interpretations/'),
+        Endpoint('interpretations_list_by_user', 'get', f'/api/tarot/interpretations/?user={user_id}'),
+        Endpoint('interpretations_detail', 'get', f"/api/tarot/interpretations/{dataset['interpretation_id']}/"),
+        Endpoint('interpretations_result', 'get', f"/api/tarot/interpretations/{dataset['interpretation_id']}/result/"),
+        Endpoint('packages_list', 'get', '/api/packages/'),
+        Endpoint('packages_list_by_project', 'get', f'/api/packages/?project={project_id}'),
+        Endpoint('packages_detail', 'get', f"/api/packages/{dataset['package_id']}/"),
+        Endpoint('payments_list', 'get', '/api/payments/'),
+        Endpoint('payments_detail', 'get', f"/api/payments/{dataset['payment_id']}/"),
+        Endpoint('telegram_active_bots', 'get', '/api/telegram/active_bots/'),
+        # Базовая линия get_cards снята в режиме черновиков, он включается в запросе
+        Endpoint('get_cards', 'post', '/api/tarot/interpretations/get_cards/', {**reading, 'draft': True}),
+        Endpoint('create_interpretation', 'post', '/api/tarot/interpretations/create_interpretation/', reading),
+        Endpoint('test_payment', 'post', '/api/payments/test_payment/', {
+            'user': user_id, 'project': project_id, 'package': dataset['package_id'], 'pin_code': '8712',
+        }),
+        Endpoint('webhook_help', 'post', '/api/telegram/webhook/', {
+            **webhook, 'message': {'type': 'command', 'command': '/help', **telegram_user},
+        }),
+        Endpoint('webhook_balance', 'post', '/api/telegram/webhook/', {
+            **webhook, 'message': {'type': 'command', 'command': '/balance', **telegram_user},
+        }),
+        Endpoint('webhook_packages', 'post', '/api/telegram/webhook/', {
+            **webhook, 'message': {'type': 'command', 'command': '/packages', **telegram_user},
+        }),
+        Endpoint('webhook_tarot', 'post', '/api/telegram/webhook/', {
+            **webhook, 'message': {'type': 'command', 'command': '/tarot', **telegram_user},
+        }),
+    ]
+
+
+class BenchmarkRunner:
+    """
+    Прогон эндпоинтов API с замером запросов к БД, латентности и памяти
+
+    Каждый эндпоинт сначала вызывается для прогрева кэшей, затем
+    отдельными проходами считаются запросы к БД, латентность по
+    iterations вызовам и пик выделенной памяти, чтобы замеры не
+    искажали друг друга.
+    """
+
+    def __init__(self, iterations: int = 30, llm_latency: float = 0):
+        self.iterations = max(iterations, 1)
+        self.llm_latency = llm_latency
+        self.client = APIClient()
+
+    def run(self, dataset: Dict[str, Any]) -> Dict[str, Any]:
+        cache.clear()
+        deck_index.clear()
+        project_catalog.clear()
+
+        results = {}
+        with stub_yandex_gpt(self.llm_latency), override_settings(
+            DEBUG=False, TAROT_ASYNC_INTERPRETATIONS=False, TELEGRAM_UPDATE_QUEUE='sync',
+            RATE_LIMIT_ENABLED=False,
+        ):
+            for endpoint in build_endpoints(dataset):
+                results[endpoint.name] = self.measure(endpoint)
+                logger.info(
+                    f"{endpoint.name}: {results[endpoint.name]['queries']} запросов, "
+                    f"p95 {results[endpoint.name]['p95_ms']} мс"
+                )
+
+        return {
+            'dataset': dataset['params'],
+            'iterations': self.iterations,
+            'database': connection.vendor,
+            'endpoints': results,
+        }
+
+    def measure(self, endpoint: Endpoint) -> Dict[str, Any]:
+        response = self._send(endpoint)
+        if response.status_code >= 400:
+            raise BenchmarkError(f"{endpoint.name}: {endpoint.method.upper()} {endpoint.path} вернул {response.status_code}")
+
+        with CaptureQueriesContext(connection) as context:
+            self._send(endpoint)
+        # Журнал запросов очищается в начале каждого следующего запроса
+        queries = len(context.captured_queries)
+
+        timings = []
+        for _ in range(self.iterations):
+            started = time.perf_counter()
+            self._send(endpoint)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        try:
+            self._send(endpoint)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'method': endpoint.method.upper(),
+            'path': endpoint.path,
+            'status': response.status_code,
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'alloc_peak_kb': round(peak / 1024, 1),
+        }
+
+    def _send(self, endpoint: Endpoint):
+        return getattr(self.client, endpoint.method)(endpoint.path, endpoint.data, format='json')
+
+
+def compare_results(baseline: Dict[str, Any], results: Dict[str, Any], latency_tolerance: Optional[float] = 1.0,
+                    allocation_tolerance: Optional[float] = 0.5, min_latency_delta_ms: float = 5.0) -> List[str]:
+    """
+    Сравнивает прогон с базовой линией
+
+    Рост числа запросов к БД — всегда регрессия. Латентность и память
+    сравниваются с допуском в долях от базовой линии; None отключает
+    соответствующую проверку.
+
+    Returns:
+        Список описаний регрессий, пустой если их нет
+    """
+    regressions = []
+    for name, base in baseline['endpoints'].items():
+        current = results['endpoints'].get(name)
+        if current is None:
+            regressions.append(f"{name}: эндпоинт отсутствует в прогоне")
+            continue
+
+        if current['queries'] > base['queries']:
+            regressions.append(f"{name}: запросов к БД {current['queries']}, в базовой линии {base['queries']}")
+
+        if latency_tolerance is not None:
+            limit = base['p95_ms'] * (1 + latency_tolerance)
+            if current['p95_ms'] > limit and current['p95_ms'] - base['p95_ms'] >= min_latency_delta_ms:
+                regressions.append(f"{name}: p95 {current['p95_ms']} мс, в базовой линии {base['p95_ms']} мс")
+
+        if allocation_tolerance is not None:
+            limit = base['alloc_peak_kb'] * (1 + allocation_tolerance)
+            if current['alloc_peak_kb'] > limit:
+                regressions.append(
+                    f"{name}: пик памяти {current['alloc_peak_kb']} КБ, в базовой линии {base['alloc_peak_kb']} КБ"
+                )
+    return regressions
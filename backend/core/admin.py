@@ -0,0 +1,167 @@
+"""
+Основа админки для больших таблиц (интерпретации, платежи, пользователи)
+
+Страница списка не должна зависеть от объема таблицы: число строк
+берется из статистики PostgreSQL вместо COUNT(*), фильтры по связям
+с большим числом значений выбирают значение поиском (автодополнение
+админки) вместо списка всех объектов, а связанные объекты, которые
+нужны для __str__ в колонках, загружаются одним запросом через
+list_select_related.
+"""
+import json
+import logging
+from typing import Optional, Tuple
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+
+def table_row_estimate(model, using: str = 'default') -> Optional[int]:
+    """
+    Оценка числа строк таблицы модели по pg_class.reltuples
+
+    Значение обновляют VACUUM и ANALYZE (в том числе autovacuum), чтение
+    стоит одного запроса к системному каталогу независимо от размера
+    таблицы.
+
+    Returns:
+        Число строк или None, если СУБД не PostgreSQL или таблица еще
+        не анализировалась
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(model._meta.db_table)])
+            row = cursor.fetchone()
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать оценку числа строк {model._meta.db_table}: {e}")
+        return None
+    # До первого ANALYZE PostgreSQL 14+ хранит -1
+    return row[0] if row and row[0] >= 0 else None
+
+
+def estimate_count(queryset) -> Tuple[int, bool]:
+    """
+    Примерное число строк выборки без COUNT(*)
+
+    В PostgreSQL берется оценка планировщика из EXPLAIN, в остальных
+    СУБД — точный COUNT.
+
+    Returns:
+        Кортеж (число строк, оценка ли это)
+    """
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor == 'postgresql':
+        try:
+            plan = json.loads(queryset.explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows']), True
+        except Exception as e:
+            logger.warning(f"Не удалось оценить число строк по плану запроса: {e}")
+    return queryset.count(), False
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки с оценкой числа строк вместо COUNT(*)
+
+    Пока в таблице меньше ADMIN_COUNT_ESTIMATE_THRESHOLD строк, считается
+    точно. Для больших таблиц число строк без фильтров берется из
+    pg_class.reltuples, с фильтрами или поиском — из оценки планировщика
+    (EXPLAIN), если выборка больше порога. Номер последней страницы при
+    этом приблизительный.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+        threshold = getattr(settings, 'ADMIN_COUNT_ESTIMATE_THRESHOLD', 10000)
+        estimate = table_row_estimate(queryset.model, queryset.db)
+        if estimate is None or estimate < threshold:
+            return super().count
+        if not queryset.query.where:
+            return estimate
+        # Небольшие выборки считаются точно, но не дальше threshold строк: заниженная
+        # оценка планировщика отключила бы постраничный вывод и загрузила всю выборку
+        bounded = queryset.order_by()[:threshold].count()
+        if bounded < threshold:
+            return bounded
+        return max(estimate_count(queryset)[0], threshold)
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Фильтр по внешнему ключу с выбором значения через автодополнение
+
+    В отличие от обычного фильтра не загружает все связанные объекты:
+    запрашивается только выбранный, остальные ищутся по search_fields
+    админки связанной модели. Подключается как ('user', AutocompleteFilter)
+    в list_filter админки, унаследованной от LargeTableAdmin.
+    """
+
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.model_admin = model_admin
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin):
+        if not self.lookup_val:
+            return []
+        try:
+            selected = list(field.remote_field.model._default_manager.filter(pk__in=self.lookup_val))
+        except (ValueError, ValidationError):
+            # Некорректное значение в адресе: ошибку покажет сама страница списка
+            return []
+        return [(obj.pk, str(obj)) for obj in selected]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        remote_model = self.field.remote_field.model
+        choice_field = forms.ModelChoiceField(
+            queryset=remote_model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(self.field, self.model_admin.admin_site, attrs={'class': 'autocomplete-filter'}),
+        )
+        value = self.lookup_val[-1] if self.lookup_val else None
+        yield {
+            'widget': choice_field.widget.render(self.lookup_kwarg, value),
+            'lookup': self.lookup_kwarg,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg, self.lookup_kwarg_isnull]),
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Админка таблицы, страница списка которой не должна замедляться с ростом числа строк"""
+
+    paginator = EstimatedCountPaginator
+    # Без второго COUNT(*) по всей таблице ради «N из M» при фильтрах
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Ответы автодополнения тоже подписывают строки через __str__ связанных объектов
+        queryset = super().get_queryset(request)
+        if isinstance(self.list_select_related, (list, tuple)) and self.list_select_related:
+            queryset = queryset.select_related(*self.list_select_related)
+        return queryset
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(item, tuple) and issubclass(item[1], AutocompleteFilter) for item in self.list_filter):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
@@ -0,0 +1,51 @@
+"""
+Общая основа массовых management-команд
+
+Команды меняют данные множествами строк (UPDATE по диапазону id,
+bulk_create, bulk_update) пакетами по --batch-size, умеют --dry-run
+и сообщают скорость в строках в секунду.
+"""
+import time
+from typing import Iterator, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+
+def iter_id_ranges(queryset, batch_size: int) -> Iterator[Tuple[int, int]]:
+    """
+    Диапазоны первичных ключей [начало, конец) по batch_size id
+
+    Границы берутся одним агрегирующим запросом, дальше каждый пакет
+    обрабатывается запросом по индексу первичного ключа без OFFSET.
+    При разреженных id пакет может содержать меньше строк.
+    """
+    bounds = queryset.order_by().aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return
+    for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+        yield start, start + batch_size
+
+
+class BulkCommand(BaseCommand):
+    """Команда с пакетной обработкой, пробным запуском и отчетом о скорости"""
+
+    default_batch_size = 10000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=self.default_batch_size,
+                            help=f'Строк в одном запросе (по умолчанию {self.default_batch_size})')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать изменения, ничего не записывая')
+
+    def execute(self, *args, **options):
+        if options.get('batch_size', 1) < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        self.dry_run = options.get('dry_run', False)
+        self.started = time.perf_counter()
+        return super().execute(*args, **options)
+
+    def report(self, label: str, rows: int) -> None:
+        """Выводит число обработанных строк и скорость с начала команды"""
+        elapsed = max(time.perf_counter() - self.started, 1e-6)
+        prefix = '[пробный запуск] ' if self.dry_run else ''
+        self.stdout.write(f"{prefix}{label}: {rows} за {elapsed:.2f} с ({rows / elapsed:.0f} строк/с)")
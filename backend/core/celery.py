@@ -14,6 +14,9 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Загружаем задачи из всех зарегистрированных приложений Django
 app.autodiscover_tasks()
 
+# Длительность задач для /metrics: обработчики сигналов подключаются при импорте
+import core.metrics  # noqa: E402,F401
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}') 
\ No newline at end of file
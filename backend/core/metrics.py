@@ -0,0 +1,295 @@
+"""
+Метрики приложения в формате Prometheus
+
+Отдаются представлением /metrics: время ответа по представлениям и
+действиям DRF, число и время SQL-запросов на запрос, вызовы YandexGPT
+(время, ошибки, доля запасных ответов), длительность задач и длина
+очередей Celery, попадания в кэши.
+
+Под gunicorn с несколькими воркерами у каждого процесса свои счетчики,
+поэтому при заданной переменной окружения PROMETHEUS_MULTIPROC_DIR
+значения пишутся в mmap-файлы этого каталога и при сборе суммируются
+по всем процессам. Воркеры Celery пишут в свой каталог на общем томе
+(METRICS_EXTRA_MULTIPROC_DIRS), чтобы их задачи тоже попадали в
+/metrics веб-сервиса. Длина очередей читается из брокера в момент
+сбора и не хранится в файлах, а в файлах только счетчики и
+гистограммы: значения перезапущенных воркеров остаются в суммах,
+и mark_process_dead при выходе воркера не нужен.
+"""
+import glob
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ['view', 'action', 'method', 'status'],
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Число SQL-запросов на HTTP-запрос',
+    ['view', 'action'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Суммарное время SQL-запросов на HTTP-запрос',
+    ['view', 'action'], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LLM_REQUEST_DURATION = Histogram(
+    'tarot_llm_request_duration_seconds', 'Время ожидания ответа YandexGPT (outcome — success или причина ошибки)',
+    ['outcome'], buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0),
+)
+LLM_RESPONSES = Counter(
+    'tarot_llm_responses_total', 'Интерпретации от модели (model), из кэша ответов (cache) и запасные (fallback)',
+    ['source'],
+)
+LLM_ERRORS = Counter(
+    'tarot_llm_errors_total', 'Неудачные вызовы YandexGPT по причинам',
+    ['reason'],
+)
+CELERY_TASK_DURATION = Histogram(
+    'celery_task_duration_seconds', 'Время выполнения задачи Celery',
+    ['task', 'state'], buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Обращения к кэшам приложения',
+    ['cache', 'result'],
+)
+
+UNMATCHED_VIEW = '<unmatched>'
+
+# Счетчики SQL-запросов текущего HTTP-запроса: [число, секунды]. Переменная
+# контекста копируется в потоки sync_to_async, поэтому запросы синхронного
+# кода асинхронных представлений тоже попадают в счетчик своего запроса.
+_request_queries: ContextVar[Optional[List[float]]] = ContextVar('metrics_request_queries', default=None)
+
+
+def record_cache(name: str, hit: bool) -> None:
+    """Учитывает попадание или промах кэша name"""
+    CACHE_REQUESTS.labels(cache=name, result='hit' if hit else 'miss').inc()
+
+
+def record_llm_call(fallback: bool, duration: Optional[float] = None, error: str = '', cached: bool = False) -> None:
+    """
+    Учитывает интерпретацию, полученную от модели или запасную
+
+    Args:
+        fallback: Вместо ответа модели отдан запасной текст
+        duration: Время ожидания модели в секундах, None — модель не вызывалась
+        error: Причина ошибки вызова (error, empty, circuit_open)
+        cached: Отдан ответ из кэша ответов модели
+    """
+    LLM_RESPONSES.labels(source='fallback' if fallback else 'cache' if cached else 'model').inc()
+    if error:
+        LLM_ERRORS.labels(reason=error).inc()
+    if duration is not None:
+        LLM_REQUEST_DURATION.labels(outcome=error or 'success').observe(duration)
+
+
+def _observe_query(execute, sql, params, many, context):
+    counters = _request_queries.get()
+    if counters is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counters[0] += 1
+        counters[1] += time.perf_counter() - started
+
+
+def _install_query_observer(connection, **kwargs) -> None:
+    # Сигнал приходит и при переподключении той же обертки, поэтому проверяем повтор
+    if _observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_observe_query)
+
+
+connection_created.connect(_install_query_observer, weak=False)
+for _connection in connections.all(initialized_only=True):
+    _install_query_observer(_connection)
+
+
+def _view_labels(view_func, method: str) -> tuple:
+    """Имя представления и действие DRF (list, retrieve, get_cards...) для меток"""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}', ''
+    actions = getattr(view_func, 'actions', None) or {}
+    return view_class.__name__, actions.get(method.lower(), '')
+
+
+class MetricsMiddleware:
+    """
+    Время ответа и SQL-запросы каждого HTTP-запроса
+
+    Стоит первым в MIDDLEWARE, чтобы учитывать время остальных
+    middleware. Для потоковых ответов учитывается время до начала
+    отправки тела.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, counters, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._finish(request, response, started, counters)
+        return response
+
+    async def __acall__(self, request):
+        started, counters, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._finish(request, response, started, counters)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = _view_labels(view_func, request.method)
+        return None
+
+    @staticmethod
+    def _start(request):
+        counters = [0, 0.0]
+        return time.perf_counter(), counters, _request_queries.set(counters)
+
+    @staticmethod
+    def _finish(request, response, started: float, counters: List[float]) -> None:
+        view, action = getattr(request, '_metrics_view', (UNMATCHED_VIEW, ''))
+        HTTP_REQUEST_DURATION.labels(view=view, action=action, method=request.method,
+                                     status=str(response.status_code)).observe(time.perf_counter() - started)
+        HTTP_REQUEST_DB_QUERIES.labels(view=view, action=action).observe(counters[0])
+        HTTP_REQUEST_DB_DURATION.labels(view=view, action=action).observe(counters[1])
+
+
+_task_started: Dict[str, float] = {}
+
+
+@task_prerun.connect(weak=False)
+def _task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect(weak=False)
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is None:
+        return
+    CELERY_TASK_DURATION.labels(task=getattr(task, 'name', 'unknown'),
+                                state=state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+class CeleryQueueCollector:
+    """Длина очередей Celery в брокере Redis на момент сбора метрик"""
+
+    def __init__(self, broker_url: str = '', queues: Optional[List[str]] = None):
+        self.broker_url = broker_url
+        self.queues = queues or ['celery']
+        self._redis = None
+
+    def collect(self):
+        family = GaugeMetricFamily('celery_queue_length', 'Задач в очереди Celery', labels=['queue'])
+        if self.broker_url.startswith(('redis://', 'rediss://', 'unix://')):
+            try:
+                client = self._client()
+                pipe = client.pipeline(transaction=False)
+                for queue in self.queues:
+                    pipe.llen(queue)
+                for queue, length in zip(self.queues, pipe.execute()):
+                    family.add_metric([queue], length)
+            except Exception as e:
+                logger.warning(f"Не удалось получить длину очередей Celery: {e}")
+        yield family
+
+    def _client(self):
+        if self._redis is None:
+            import redis
+
+            self._redis = redis.Redis.from_url(self.broker_url, socket_timeout=1, socket_connect_timeout=1)
+        return self._redis
+
+
+class MultiDirCollector:
+    """Суммирует mmap-файлы метрик из нескольких каталогов (веб-воркеры и воркеры Celery)"""
+
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+
+    def collect(self):
+        files = [path for directory in self.paths for path in glob.glob(os.path.join(directory, '*.db'))]
+        return MultiProcessCollector.merge(files, accumulate=True)
+
+
+def _create_celery_queue_collector() -> CeleryQueueCollector:
+    return CeleryQueueCollector(
+        broker_url=getattr(settings, 'CELERY_BROKER_URL', '') or '',
+        queues=getattr(settings, 'METRICS_CELERY_QUEUES', ['celery']),
+    )
+
+
+# Создаем глобальный сборщик длины очередей
+celery_queue_collector = _create_celery_queue_collector()
+
+
+def _multiprocess_dirs() -> List[str]:
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not directory:
+        return []
+    return [directory] + list(getattr(settings, 'METRICS_EXTRA_MULTIPROC_DIRS', []))
+
+
+def get_registry():
+    """Реестр для выдачи: сумма по процессам в многопроцессном режиме, иначе метрики процесса"""
+    directories = _multiprocess_dirs()
+    if not directories:
+        return REGISTRY
+    registry = CollectorRegistry()
+    registry.register(MultiDirCollector(directories))
+    registry.register(celery_queue_collector)
+    return registry
+
+
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    REGISTRY.register(celery_queue_collector)
+
+
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus
+
+    При заданном METRICS_AUTH_TOKEN нужен Bearer-токен. Без токена
+    метрики отдаются только адресам из METRICS_ALLOWED_IPS (по умолчанию
+    локальным), остальным — 403: порт backend опубликован наружу, а
+    метрики раскрывают данные проектов и очередей.
+    """
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    elif request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1']):
+        return HttpResponse(status=403)
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
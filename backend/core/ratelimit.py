@@ -0,0 +1,255 @@
+"""
+Ограничение частоты запросов по алгоритму token bucket
+
+У каждого субъекта (пользователь, проект) есть корзина на capacity
+токенов, которая пополняется с постоянной скоростью. Запрос забирает
+токен из всех своих корзин сразу или ни из одной: если в какой-то
+корзине токенов нет, он отклоняется с временем до появления следующего.
+Корзины хранятся в Redis (общие для всех процессов, проверка и
+списание атомарны в одном Lua-скрипте) или в памяти процесса для
+разработки и тестов. Проверка не обращается к БД.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {
+    's': 1, 'sec': 1, 'second': 1,
+    'm': 60, 'min': 60, 'minute': 60,
+    'h': 3600, 'hour': 3600,
+    'd': 86400, 'day': 86400,
+}
+
+
+class Rate(NamedTuple):
+    capacity: int
+    # Токенов в секунду
+    refill: float
+
+    @property
+    def ttl(self) -> float:
+        """Через сколько секунд пустая корзина наполнится полностью"""
+        return self.capacity / self.refill
+
+
+def parse_rate(value: str) -> Rate:
+    """
+    Разбирает лимит вида "10/min" (также s, h, day)
+
+    Raises:
+        ValueError: если строка не в этом формате
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*([a-z]+)\s*', str(value).lower())
+    if not match or match.group(2) not in _PERIODS or int(match.group(1)) < 1:
+        raise ValueError(f"Некорректный лимит {value!r}, ожидается вид '10/min'")
+    capacity = int(match.group(1))
+    return Rate(capacity=capacity, refill=capacity / _PERIODS[match.group(2)])
+
+
+class BucketState(NamedTuple):
+    # Хватило ли токенов в этой корзине
+    allowed: bool
+    # Токенов в корзине после запроса (при отказе ничего не списано)
+    tokens: float
+
+
+class InMemoryTokenBucketStore:
+    """Корзины в памяти процесса: для разработки и тестов"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._buckets: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, buckets: Sequence[Tuple[str, Rate]], cost: int = 1) -> List[BucketState]:
+        """Списывает cost из всех корзин, если токенов хватает в каждой, иначе ни из одной"""
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for key, rate in buckets:
+                tokens, updated, _ = self._buckets.get(key, (rate.capacity, now, None))
+                levels.append(min(rate.capacity, tokens + (now - updated) * rate.refill))
+            allowed = all(tokens >= cost for tokens in levels)
+            states = []
+            for (key, rate), tokens in zip(buckets, levels):
+                states.append(BucketState(tokens >= cost, tokens - cost if allowed else tokens))
+                if len(self._buckets) >= self.max_entries and key not in self._buckets:
+                    self._evict(now)
+                self._buckets[key] = (states[-1].tokens, now, now + rate.ttl)
+        return states
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def _evict(self, now: float) -> None:
+        # Наполнившаяся корзина ничем не отличается от новой
+        for key in [key for key, (_, _, expires) in self._buckets.items() if expires <= now]:
+            del self._buckets[key]
+
+
+class RedisTokenBucketStore:
+    """
+    Корзины в хэшах Redis, общие для всех процессов
+
+    Скрипту нужен собственный клиент redis-py: API кэша Django не дает
+    выполнять Lua, а клиент RedisCache — его внутренняя деталь. Кроме
+    того, корзины не должны пропадать при cache.clear().
+    """
+
+    # Все корзины запроса сначала пополняются и проверяются, и только если
+    # токенов хватает в каждой, из всех списывается cost. Время берется у Redis,
+    # поэтому расхождение часов серверов приложения не влияет на лимит.
+    # ARGV: cost, затем по тройке (capacity, refill, ttl в мс) на каждый ключ
+    SCRIPT = """
+local cost = tonumber(ARGV[1])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local refill = tonumber(ARGV[i * 3])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+    levels[i] = tokens
+    if tokens < cost then
+        allowed = 0
+    end
+end
+local result = {}
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    result[i * 2 - 1] = tokens >= cost and 1 or 0
+    if allowed == 1 then
+        tokens = tokens - cost
+    end
+    result[i * 2] = tostring(tokens)
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, ARGV[i * 3 + 1])
+end
+return result
+"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    def consume(self, buckets: Sequence[Tuple[str, Rate]], cost: int = 1) -> List[BucketState]:
+        """Списывает cost из всех корзин, если токенов хватает в каждой, иначе ни из одной"""
+        args = [cost]
+        for _, rate in buckets:
+            args.extend([rate.capacity, rate.refill, math.ceil(rate.ttl * 1000) + 1000])
+        result = self._script(keys=[key for key, _ in buckets], args=args)
+        return [BucketState(bool(result[i]), float(result[i + 1])) for i in range(0, len(result), 2)]
+
+    def clear(self) -> None:
+        for key in self._redis.scan_iter(match=RateLimiter.KEY.format(scope='*', level='*', subject='*')):
+            self._redis.delete(key)
+
+
+class RateLimiter:
+    """
+    Лимиты одного вида запросов на пользователя и на проект
+
+    Запрос проходит, только если токены есть и в корзине пользователя,
+    и в корзине проекта; списание из обеих атомарно, поэтому отказ по
+    лимиту проекта не тратит токен пользователя, и наоборот. Лимиты
+    проекта задаются переопределениями {id проекта: {'user': Rate,
+    'project': Rate}}. При недоступности хранилища запросы пропускаются.
+    """
+
+    KEY = 'ratelimit:{scope}:{level}:{subject}'
+    LEVELS = ('user', 'project')
+
+    def __init__(self, scope: str, store, rates: Dict[str, Optional[Rate]],
+                 overrides: Optional[Dict[int, Dict[str, Optional[Rate]]]] = None):
+        self.scope = scope
+        self.store = store
+        self.rates = rates
+        self.overrides = overrides or {}
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'RATE_LIMIT_ENABLED', True)
+
+    def rate_for(self, level: str, project_id: Optional[int]) -> Optional[Rate]:
+        override = self.overrides.get(project_id, {}) if project_id is not None else {}
+        return override.get(level, self.rates.get(level))
+
+    def check(self, project_id: Optional[int], user_key: Any, cost: int = 1) -> Optional[float]:
+        """
+        Забирает токены из корзин пользователя и проекта
+
+        Args:
+            project_id: ID проекта или None, если проект неизвестен
+            user_key: Ключ пользователя, уникальный в пределах scope
+            cost: Сколько токенов стоит запрос
+
+        Returns:
+            None, если запрос разрешен, иначе через сколько секунд повторить
+        """
+        if not self.enabled:
+            return None
+        buckets = []
+        for level, subject in (('user', user_key), ('project', project_id)):
+            rate = self.rate_for(level, project_id)
+            if rate is not None and subject is not None:
+                buckets.append((level, subject, rate))
+        if not buckets:
+            return None
+
+        try:
+            states = self.store.consume(
+                [(self.KEY.format(scope=self.scope, level=level, subject=subject), rate)
+                 for level, subject, rate in buckets], cost
+            )
+        except Exception as e:
+            logger.warning(f"Лимитер {self.scope} недоступен, запрос пропущен: {e}")
+            return None
+
+        retry_after = None
+        for (level, subject, rate), state in zip(buckets, states):
+            if not state.allowed:
+                wait = (cost - state.tokens) / rate.refill
+                logger.info(f"Лимит {self.scope} ({level} {subject}) исчерпан, повтор через {wait:.1f} с")
+                retry_after = max(retry_after or 0, wait)
+        return retry_after
+
+    def clear(self) -> None:
+        self.store.clear()
+
+
+def _parse_optional_rate(value) -> Optional[Rate]:
+    return parse_rate(value) if value else None
+
+
+def _create_reading_rate_limiter() -> RateLimiter:
+    if getattr(settings, 'RATE_LIMIT_BACKEND', 'memory') == 'redis':
+        store = RedisTokenBucketStore(getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0'))
+    else:
+        store = InMemoryTokenBucketStore()
+    overrides = {
+        int(project_id): {level: _parse_optional_rate(value) for level, value in levels.items()
+                          if level in RateLimiter.LEVELS}
+        for project_id, levels in getattr(settings, 'RATE_LIMIT_PROJECT_OVERRIDES', {}).items()
+    }
+    return RateLimiter('readings', store, rates={
+        'user': _parse_optional_rate(getattr(settings, 'RATE_LIMIT_READINGS_USER', '10/min')),
+        'project': _parse_optional_rate(getattr(settings, 'RATE_LIMIT_READINGS_PROJECT', '600/min')),
+    }, overrides=overrides)
+
+
+# Создаем глобальный лимитер раскладов: get_cards, create_interpretation и /tarot в боте
+reading_rate_limiter = _create_reading_rate_limiter()
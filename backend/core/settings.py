@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from decouple import config
 
@@ -48,10 +49,13 @@ INSTALLED_APPS = [
     "users",
     "tarot",
     "payments",
+    "telegram_bot",
+    "stats",
     "api",
 ]
 
 MIDDLEWARE = [
+    "core.metrics.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -101,7 +105,7 @@ ROOT_URLCONF = "core.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [],
+        "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -127,6 +131,15 @@ DATABASES = {
     }
 }
 
+# Кэш в памяти процесса для разработки и тестов. Версии и снимки справочников,
+# черновики раскладов, счетчики бюджета и отсев повторных обновлений должны быть
+# общими для всех воркеров, поэтому в продакшене здесь Redis (settings_production)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -169,7 +182,8 @@ STATICFILES_DIRS = [
 ]
 
 # Media files (Uploaded files)
-MEDIA_URL = "media/"
+# Абсолютный адрес (например, CDN) избавляет ответы API от сборки URL изображений по запросу
+MEDIA_URL = config('MEDIA_URL', default="media/")
 MEDIA_ROOT = BASE_DIR / "media"
 
 # Default primary key field type
@@ -179,4 +193,99 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # YandexGPT Settings
 YANDEX_API_KEY = config('YANDEX_API_KEY', default=None)
-YANDEX_FOLDER_ID = config('YANDEX_FOLDER_ID', default='b1g55hsv1qome2f35fid') 
\ No newline at end of file
+YANDEX_FOLDER_ID = config('YANDEX_FOLDER_ID', default='b1g55hsv1qome2f35fid')
+# Через сколько секунд результат фоновой проверки YandexGPT считается устаревшим
+YANDEX_GPT_PROBE_TTL = config('YANDEX_GPT_PROBE_TTL', default=120, cast=int)
+# Ограничения вызовов YandexGPT: параллелизм, дедлайн, повторы и предохранитель
+YANDEX_GPT_MAX_CONCURRENCY = config('YANDEX_GPT_MAX_CONCURRENCY', default=4, cast=int)
+# Лимит одновременных вызовов через асинхронный SDK (ожидание ответа не занимает поток)
+YANDEX_GPT_ASYNC_MAX_CONCURRENCY = config('YANDEX_GPT_ASYNC_MAX_CONCURRENCY', default=100, cast=int)
+YANDEX_GPT_TIMEOUT = config('YANDEX_GPT_TIMEOUT', default=30, cast=float)
+YANDEX_GPT_MAX_RETRIES = config('YANDEX_GPT_MAX_RETRIES', default=2, cast=int)
+YANDEX_GPT_QUEUE_TIMEOUT = config('YANDEX_GPT_QUEUE_TIMEOUT', default=10, cast=float)
+YANDEX_GPT_BREAKER_THRESHOLD = config('YANDEX_GPT_BREAKER_THRESHOLD', default=5, cast=int)
+YANDEX_GPT_BREAKER_RESET_TIMEOUT = config('YANDEX_GPT_BREAKER_RESET_TIMEOUT', default=30, cast=float)
+# Кэш ответов YandexGPT по промпту (только расклады без вопроса пользователя): время жизни и число вариантов ответа на один промпт
+YANDEX_GPT_RESPONSE_CACHE_ENABLED = config('YANDEX_GPT_RESPONSE_CACHE_ENABLED', default=False, cast=bool)
+YANDEX_GPT_RESPONSE_CACHE_TTL = config('YANDEX_GPT_RESPONSE_CACHE_TTL', default=86400, cast=int)
+YANDEX_GPT_RESPONSE_CACHE_VARIANTS = config('YANDEX_GPT_RESPONSE_CACHE_VARIANTS', default=5, cast=int)
+# Учет вызовов модели: записи копятся в памяти процесса и пишутся в БД пакетами
+# по LLM_USAGE_BATCH_SIZE или раз в LLM_USAGE_FLUSH_INTERVAL секунд
+LLM_USAGE_BATCH_SIZE = config('LLM_USAGE_BATCH_SIZE', default=100, cast=int)
+LLM_USAGE_FLUSH_INTERVAL = config('LLM_USAGE_FLUSH_INTERVAL', default=10, cast=float)
+# Дневной бюджет токенов проекта по умолчанию (0 — без ограничения), переопределяется в проекте;
+# сверх бюджета проект получает запасные интерпретации
+LLM_DAILY_TOKEN_BUDGET = config('LLM_DAILY_TOKEN_BUDGET', default=0, cast=int)
+# Счетчик расхода: cache — через кэш Django, redis — INCRBY в REDIS_URL, общий для всех процессов
+LLM_BUDGET_BACKEND = config('LLM_BUDGET_BACKEND', default='cache')
+
+# Асинхронная генерация интерпретаций через Celery
+TAROT_ASYNC_INTERPRETATIONS = config('TAROT_ASYNC_INTERPRETATIONS', default=False, cast=bool)
+# Максимальное время ожидания результата в long-poll запросе асинхронного представления (секунды);
+# синхронный эндпоинт результата отвечает сразу
+TAROT_RESULT_LONG_POLL_TIMEOUT = config('TAROT_RESULT_LONG_POLL_TIMEOUT', default=25, cast=int)
+# Дублировать карты расклада в связь Interpretation.cards для старых отчетов и выгрузок
+TAROT_WRITE_CARDS_M2M = config('TAROT_WRITE_CARDS_M2M', default=False, cast=bool)
+# Черновики раскладов: get_cards хранит карты в кэше, а интерпретация и списание
+# появляются в БД только в create_interpretation; время жизни черновика (секунды).
+# Режим включается явно (или полем draft в запросе get_cards): в нем get_cards отдает
+# draft_token вместо interpretation_id. С несколькими воркерами нужен общий кэш (CACHES)
+TAROT_DRAFT_READINGS = config('TAROT_DRAFT_READINGS', default=False, cast=bool)
+TAROT_DRAFT_TTL = config('TAROT_DRAFT_TTL', default=1800, cast=int)
+# Сколько секунд клиенты и nginx могут использовать ответы справочников без перепроверки
+CATALOG_CACHE_MAX_AGE = config('CATALOG_CACHE_MAX_AGE', default=60, cast=int)
+# Снимки справочников проектов: число снимков в памяти процесса и время жизни в общем кэше (секунды)
+CATALOG_SNAPSHOT_LRU_SIZE = config('CATALOG_SNAPSHOT_LRU_SIZE', default=256, cast=int)
+CATALOG_SNAPSHOT_TTL = config('CATALOG_SNAPSHOT_TTL', default=86400, cast=int)
+# Копии изображений карт: ширина по имени размера, форматы (webp, avif), качество сжатия
+TAROT_RENDITION_SIZES = {'thumb': 240, 'card': 600}
+TAROT_RENDITION_FORMATS = config('TAROT_RENDITION_FORMATS', default='webp',
+                                 cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+TAROT_RENDITION_QUALITY = config('TAROT_RENDITION_QUALITY', default=80, cast=int)
+# Размер копии, который отдается в ответах раскладов вместо оригинала
+TAROT_RENDITION_DEFAULT_SIZE = config('TAROT_RENDITION_DEFAULT_SIZE', default='card')
+# Число процессов для генерации копий (0 — по числу ядер)
+TAROT_RENDITION_WORKERS = config('TAROT_RENDITION_WORKERS', default=0, cast=int)
+# Генерировать копии фоновой задачей Celery при загрузке изображения карты
+TAROT_RENDITIONS_ON_UPLOAD = config('TAROT_RENDITIONS_ON_UPLOAD', default=False, cast=bool)
+# Дневная статистика: период фоновой агрегации и задержка, за которую успевают
+# закоммититься строки с меткой времени внутри окна (секунды)
+STATS_ROLLUP_INTERVAL = config('STATS_ROLLUP_INTERVAL', default=300, cast=int)
+STATS_ROLLUP_LAG = config('STATS_ROLLUP_LAG', default=120, cast=int)
+# Максимальная длина периода в API статистики (дни)
+STATS_DASHBOARD_MAX_DAYS = config('STATS_DASHBOARD_MAX_DAYS', default=366, cast=int)
+# Размер таблицы, начиная с которого админка показывает оценку числа строк вместо COUNT(*)
+ADMIN_COUNT_ESTIMATE_THRESHOLD = config('ADMIN_COUNT_ESTIMATE_THRESHOLD', default=10000, cast=int)
+# Ограничение частоты раскладов (get_cards, create_interpretation, /tarot в боте) по алгоритму
+# token bucket: лимиты вида "10/min" на пользователя и на проект (пустая строка — без лимита).
+# Расклад расходует один токен: get_cards или create_interpretation без draft_token/interpretation_id
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMIT_READINGS_USER = config('RATE_LIMIT_READINGS_USER', default='10/min')
+RATE_LIMIT_READINGS_PROJECT = config('RATE_LIMIT_READINGS_PROJECT', default='600/min')
+# Лимиты отдельных проектов в JSON: {"<id проекта>": {"user": "20/min", "project": "2000/min"}}
+RATE_LIMIT_PROJECT_OVERRIDES = config('RATE_LIMIT_PROJECT_OVERRIDES', default='{}', cast=json.loads)
+# Хранилище корзин: memory — в памяти процесса, redis — общее для всех процессов (REDIS_URL)
+RATE_LIMIT_BACKEND = config('RATE_LIMIT_BACKEND', default='memory')
+# Асинхронные представления для get_cards, create_interpretation и webhook (при запуске под ASGI)
+TAROT_ASYNC_VIEWS = config('TAROT_ASYNC_VIEWS', default=False, cast=bool)
+
+# Прием обновлений Telegram: sync — обработка прямо в запросе,
+# memory — очередь в памяти процесса (только для разработки с одним процессом),
+# redis — общая очередь в Redis с доставкой не более одного раза
+TELEGRAM_UPDATE_QUEUE = config('TELEGRAM_UPDATE_QUEUE', default='sync')
+# Количество шардов очереди (и воркеров, по одному на шард)
+TELEGRAM_UPDATE_WORKERS = config('TELEGRAM_UPDATE_WORKERS', default=4, cast=int)
+# Bot API, через который воркеры очереди отправляют ответы бота (sendMessage)
+TELEGRAM_API_URL = config('TELEGRAM_API_URL', default='https://api.telegram.org')
+
+# Метрики Prometheus (/metrics): Bearer-токен для сбора. Без токена метрики отдаются
+# только адресам из METRICS_ALLOWED_IPS (по умолчанию локальным)
+METRICS_AUTH_TOKEN = config('METRICS_AUTH_TOKEN', default='')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1',
+                             cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+# Очереди Celery, длина которых отдается в метриках
+METRICS_CELERY_QUEUES = config('METRICS_CELERY_QUEUES', default='celery',
+                               cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+# Каталоги метрик других процессов (воркеров Celery), которые суммируются с PROMETHEUS_MULTIPROC_DIR
+METRICS_EXTRA_MULTIPROC_DIRS = config('METRICS_EXTRA_MULTIPROC_DIRS', default='',
+                                      cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
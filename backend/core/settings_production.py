@@ -32,6 +32,18 @@ DATABASES = {
 
 # Redis для Celery
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+# Общий кэш всех воркеров gunicorn и Celery: версии индекса колод и снимков справочников,
+# черновики раскладов, состояние проверки YandexGPT. Отдельная база Redis, чтобы
+# cache.clear() не затрагивал очереди Celery.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/1'),
+        'KEY_PREFIX': 'mystic_tarot',
+    }
+}
+# Лимиты частоты должны быть общими для всех воркеров
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'redis')
 
 # Celery Configuration
 CELERY_BROKER_URL = REDIS_URL
@@ -40,6 +52,16 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    'probe-yandexgpt': {
+        'task': 'tarot.tasks.probe_yandex_gpt_task',
+        'schedule': 60.0,
+    },
+    'update-stats-rollups': {
+        'task': 'stats.tasks.update_stats_rollups_task',
+        'schedule': float(STATS_ROLLUP_INTERVAL),
+    },
+}
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000').split(',')
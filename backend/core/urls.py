@@ -22,6 +22,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from core.metrics import metrics_view
+
 schema_view = get_schema_view(
    openapi.Info(
       title="Mystic Tarot Bot API",
@@ -40,6 +42,7 @@ urlpatterns = [
     path('api/', include('api.urls')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Добавляем URL для медиа файлов в режиме разработки
@@ -1,35 +1,43 @@
 from django.contrib import admin
+from django.utils import timezone
+
+from core.admin import AutocompleteFilter, LargeTableAdmin
 from .models import Package, Payment
 
 @admin.register(Package)
-class PackageAdmin(admin.ModelAdmin):
+class PackageAdmin(LargeTableAdmin):
     list_display = ('id', 'name', 'project', 'package_type', 'price', 'num_readings', 'subscription_days', 'is_active', 'created_at')
     search_fields = ('name',)
     list_filter = ('project', 'package_type', 'is_active')
+    list_select_related = ('project',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'project', 'package', 'amount', 'status', 'created_at', 'completed_at')
     search_fields = ('user__username', 'external_id')
-    list_filter = ('project', 'status', 'package')
+    list_filter = ('project', 'status', ('package', AutocompleteFilter), ('user', AutocompleteFilter))
+    list_select_related = ('user__project', 'project', 'package__project')
+    autocomplete_fields = ('user', 'package')
     readonly_fields = ('created_at', 'updated_at', 'completed_at')
     actions = ['mark_as_completed', 'mark_as_failed', 'mark_as_cancelled']
 
+    # Действия меняют статус одним UPDATE по выбранным строкам вместо save() каждого платежа;
+    # платежи, уже находящиеся в нужном статусе, не трогаются
+
     def mark_as_completed(self, request, queryset):
-        for payment in queryset:
-            payment.mark_as_completed()
-        self.message_user(request, f"{queryset.count()} платежей отмечено как завершенные")
+        now = timezone.now()
+        # completed_at оплаченных платежей не переписывается: статистика учитывает платеж по этой метке
+        updated = queryset.exclude(status='completed').update(status='completed', completed_at=now, updated_at=now)
+        self.message_user(request, f"{updated} платежей отмечено как завершенные")
     mark_as_completed.short_description = "Отметить как завершенные"
 
     def mark_as_failed(self, request, queryset):
-        for payment in queryset:
-            payment.mark_as_failed()
-        self.message_user(request, f"{queryset.count()} платежей отмечено как неудачные")
+        updated = queryset.exclude(status='failed').update(status='failed', updated_at=timezone.now())
+        self.message_user(request, f"{updated} платежей отмечено как неудачные")
     mark_as_failed.short_description = "Отметить как неудачные"
 
     def mark_as_cancelled(self, request, queryset):
-        for payment in queryset:
-            payment.mark_as_cancelled()
-        self.message_user(request, f"{queryset.count()} платежей отмечено как отмененные")
+        updated = queryset.exclude(status='cancelled').update(status='cancelled', updated_at=timezone.now())
+        self.message_user(request, f"{updated} платежей отмечено как отмененные")
     mark_as_cancelled.short_description = "Отметить как отмененные"
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'completed')), fields=['completed_at'], name='payments_completed_at_idx'),
+        ),
+    ]
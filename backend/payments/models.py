@@ -22,6 +22,11 @@ class Package(models.Model):
         verbose_name = 'Пакет'
         verbose_name_plural = 'Пакеты'
         unique_together = ('project', 'name')
+        indexes = [
+            # API и бот показывают только активные пакеты проекта
+            models.Index(fields=['project', 'price'], name='payments_pkg_active_idx',
+                         condition=models.Q(is_active=True)),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.project.name}) - {self.price}₽"
@@ -50,6 +55,18 @@ class Payment(models.Model):
         verbose_name = 'Платеж'
         verbose_name_plural = 'Платежи'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['project', 'status', '-created_at'], name='payments_project_status_idx'),
+            models.Index(fields=['user', '-created_at'], name='payments_user_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='payments_status_created_idx'),
+            models.Index(fields=['-created_at'], name='payments_created_idx'),
+            # Поиск платежа по ID платежной системы; у большинства тестовых платежей его нет
+            models.Index(fields=['external_id'], name='payments_external_id_idx',
+                         condition=models.Q(external_id__isnull=False)),
+            # Оплаченные платежи после отметки агрегации статистики
+            models.Index(fields=['completed_at'], name='payments_completed_at_idx',
+                         condition=models.Q(status='completed')),
+        ]
 
     def __str__(self):
         return f"Платеж {self.id} - {self.user} ({self.amount}₽) - {self.get_status_display()}"
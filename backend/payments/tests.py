@@ -1,3 +1,73 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from projects.models import Project
+from users.models import UserProfile
+from .models import Package, Payment
+
+
+class PaymentAdminTest(TestCase):
+    """Страница платежей в админке не зависит от объема таблицы"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        cls.package = Package.objects.create(project=cls.project, name='5 раскладов', price=199, num_readings=5)
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_payments(self, count, **fields):
+        users = UserProfile.objects.bulk_create(
+            [UserProfile(project=self.project, telegram_user_id=UserProfile.objects.count() + i) for i in range(count)]
+        )
+        return Payment.objects.bulk_create(
+            [Payment(user=user, project=self.project, package=self.package, amount=199, **fields) for user in users]
+        )
+
+    def changelist_queries(self, query=''):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:payments_payment_changelist') + query)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_payments(3)
+        _, few = self.changelist_queries()
+        self.add_payments(30)
+        _, many = self.changelist_queries()
+        self.assertEqual(few, many)
+
+    def test_autocomplete_filter_loads_only_selected_user(self):
+        payment = self.add_payments(5)[0]
+        response, _ = self.changelist_queries(f'?user__id__exact={payment.user_id}')
+
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, f'<option value="{payment.user_id}" selected>')
+        self.assertNotContains(response, f'<option value="{payment.user_id + 1}"')
+
+    def test_mark_as_completed_is_single_update(self):
+        completed_at = timezone.now() - timedelta(days=1)
+        done = self.add_payments(1, status='completed', completed_at=completed_at)[0]
+        pending = self.add_payments(3)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('admin:payments_payment_changelist'), {
+                'action': 'mark_as_completed',
+                '_selected_action': [payment.id for payment in pending] + [done.id],
+            })
+        self.assertEqual(response.status_code, 302)
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
 
-# Create your tests here.
+        self.assertEqual(Payment.objects.filter(status='completed', completed_at__isnull=False).count(), 4)
+        done.refresh_from_db()
+        self.assertEqual(done.completed_at, completed_at)
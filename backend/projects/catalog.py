@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from django.core.cache import cache
+
+from core.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Настройки темы по умолчанию; значения из Project.design их переопределяют
+THEME_DEFAULTS = {
+    'primary_color': '#6366f1',
+    'secondary_color': '#8b5cf6',
+    'accent_color': '#f59e0b',
+    'bg_primary': '#0f0f23',
+    'bg_secondary': '#1a1a2e',
+    'bg_card': '#1e293b',
+    'text_primary': '#f8fafc',
+    'text_secondary': '#cbd5e1',
+    'text_muted': '#64748b',
+    'border_color': '#334155',
+    'font_family': 'Inter',
+    'border_radius': '12px',
+    'is_dark_theme': True,
+}
+
+
+def build_theme_settings(design: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Настройки темы проекта: значения по умолчанию, дополненные полем design"""
+    design = design or {}
+    return {key: design.get(key, default) for key, default in THEME_DEFAULTS.items()}
+
+
+class CatalogSnapshot(NamedTuple):
+    """
+    Неизменяемый снимок справочников проекта
+
+    Объекты моделей внутри снимка общие для всех запросов процесса
+    и не должны изменяться; у каждого уже подставлен project, поэтому
+    сериализация не делает запросов к БД.
+    """
+    project_id: int
+    version: int
+    built_at: float
+    project: Any
+    theme_settings: Dict[str, Any]
+    packages: Tuple[Any, ...]
+    spreads: Tuple[Any, ...]
+    decks: Tuple[Any, ...]
+
+
+class ProjectCatalog:
+    """
+    Двухуровневый кэш снимков справочников по проектам
+
+    Снимок ищется в LRU процесса, затем в кэше Django, и только при
+    промахе собирается из БД. Ключом служит версия проекта в кэше Django,
+    которую сигналы увеличивают после коммита при любом изменении проекта,
+    его пакетов, раскладов и колод, поэтому в установившемся режиме
+    чтение справочников стоит одного обращения к этому кэшу.
+
+    Общим для всех воркеров второй уровень и версии становятся только
+    с общим бэкендом кэша: в продакшене это Redis (CACHES в
+    settings_production). С LocMemCache по умолчанию оба уровня живут
+    в памяти процесса, и изменения, сделанные другим процессом, он не видит.
+    """
+
+    VERSION_KEY = 'projects:catalog:version:{project_id}'
+    SNAPSHOT_KEY = 'projects:catalog:snapshot:{format}:{project_id}:{version}'
+    # Увеличивается при изменении состава снимка или моделей, чтобы не читать старые снимки из общего кэша
+    SNAPSHOT_FORMAT = 1
+
+    def __init__(self, max_entries: int = 256, ttl: int = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[int, CatalogSnapshot]' = OrderedDict()
+
+    def get(self, project_id: int) -> Optional[CatalogSnapshot]:
+        """Возвращает актуальный снимок проекта или None, если проекта нет"""
+        version = self._get_version(project_id)
+
+        with self._lock:
+            snapshot = self._entries.get(project_id)
+            if snapshot is not None and snapshot.version == version:
+                self._entries.move_to_end(project_id)
+                record_cache('catalog_local', True)
+                return snapshot
+        record_cache('catalog_local', False)
+
+        key = self.SNAPSHOT_KEY.format(format=self.SNAPSHOT_FORMAT, project_id=project_id, version=version)
+        snapshot = cache.get(key)
+        record_cache('catalog_shared', snapshot is not None)
+        if snapshot is None:
+            snapshot = self._build(project_id, version)
+            if snapshot is None:
+                return None
+            cache.set(key, snapshot, timeout=self.ttl)
+
+        self._remember(snapshot)
+        return snapshot
+
+    def invalidate(self, project_id: int) -> None:
+        """Увеличивает версию проекта, делая старые снимки неактуальными во всех процессах"""
+        key = self.VERSION_KEY.format(project_id=project_id)
+        self._get_version(project_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Ключ успел истечь между add и incr
+            cache.set(key, self._initial_version(), timeout=None)
+
+    def clear(self) -> None:
+        """Очищает LRU текущего процесса"""
+        with self._lock:
+            self._entries.clear()
+
+    def _get_version(self, project_id: int) -> int:
+        key = self.VERSION_KEY.format(project_id=project_id)
+        version = cache.get(key)
+        if version is None:
+            # После вытеснения ключа версия начинается с нового значения,
+            # а не с нуля, чтобы не совпасть со старыми снимками
+            cache.add(key, self._initial_version(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    @staticmethod
+    def _initial_version() -> int:
+        return int(time.time() * 1000)
+
+    def _remember(self, snapshot: CatalogSnapshot) -> None:
+        with self._lock:
+            self._entries[snapshot.project_id] = snapshot
+            self._entries.move_to_end(snapshot.project_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _build(self, project_id: int, version: int) -> Optional[CatalogSnapshot]:
+        from payments.models import Package
+        from tarot.models import TarotDeck, TarotSpread
+        from .models import Project
+
+        project = Project.objects.filter(pk=project_id).first()
+        if project is None:
+            return None
+
+        packages = tuple(Package.objects.filter(project_id=project_id, is_active=True).order_by('id'))
+        spreads = tuple(TarotSpread.objects.filter(project_id=project_id).order_by('id'))
+        decks = tuple(TarotDeck.objects.filter(project_id=project_id).order_by('id'))
+        for obj in packages + spreads + decks:
+            obj.project = project
+
+        logger.debug(f"Собран снимок справочников проекта {project_id} версии {version}")
+        return CatalogSnapshot(
+            project_id=project_id,
+            version=version,
+            built_at=time.time(),
+            project=project,
+            theme_settings=build_theme_settings(project.design),
+            packages=packages,
+            spreads=spreads,
+            decks=decks,
+        )
+
+
+def _create_project_catalog() -> ProjectCatalog:
+    from django.conf import settings
+
+    return ProjectCatalog(
+        max_entries=getattr(settings, 'CATALOG_SNAPSHOT_LRU_SIZE', 256),
+        ttl=getattr(settings, 'CATALOG_SNAPSHOT_TTL', 86400),
+    )
+
+
+# Создаем глобальный экземпляр кэша справочников
+project_catalog = _create_project_catalog()
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='llm_daily_token_budget',
+            field=models.PositiveIntegerField(blank=True, help_text='Пусто — значение LLM_DAILY_TOKEN_BUDGET, 0 — без ограничения. Сверх бюджета бот отвечает запасными текстами.', null=True, verbose_name='Дневной бюджет токенов LLM'),
+        ),
+    ]
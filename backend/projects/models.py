@@ -11,12 +11,20 @@ class Project(models.Model):
     telegram_token = models.CharField('Telegram Bot Token', max_length=255, unique=True)
     design = models.JSONField('Дизайн-настройки', default=dict, blank=True)
     status = models.CharField('Статус', max_length=10, choices=STATUS_CHOICES, default='active')
+    llm_daily_token_budget = models.PositiveIntegerField(
+        'Дневной бюджет токенов LLM', null=True, blank=True,
+        help_text='Пусто — значение LLM_DAILY_TOKEN_BUDGET, 0 — без ограничения. '
+                  'Сверх бюджета бот отвечает запасными текстами.'
+    )
     created_at = models.DateTimeField('Создан', auto_now_add=True)
     updated_at = models.DateTimeField('Обновлен', auto_now=True)
 
     class Meta:
         verbose_name = 'Проект'
         verbose_name_plural = 'Проекты'
+        indexes = [
+            models.Index(fields=['status'], name='projects_status_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from payments.models import Package
+from tarot.models import TarotDeck, TarotSpread
+from tarot.signals import catalog_bulk_changed
+from .catalog import project_catalog
+from .models import Project
+
+
+def _invalidate_after_commit(project_id):
+    # Сбрасываем после коммита, иначе другой процесс может собрать снимок из старых данных под новой версией
+    transaction.on_commit(lambda: project_catalog.invalidate(project_id))
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_catalog_for_project(sender, instance, **kwargs):
+    """Сбрасываем снимок справочников при изменении проекта"""
+    _invalidate_after_commit(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Package)
+@receiver([post_save, post_delete], sender=TarotSpread)
+@receiver([post_save, post_delete], sender=TarotDeck)
+def invalidate_catalog_for_related(sender, instance, **kwargs):
+    """Сбрасываем снимок справочников проекта при изменении его пакетов, раскладов и колод"""
+    _invalidate_after_commit(instance.project_id)
+
+
+@receiver(catalog_bulk_changed)
+def invalidate_catalog_for_bulk_change(sender, project_ids, **kwargs):
+    """Сбрасываем снимки справочников проектов после массового изменения"""
+    for project_id in project_ids:
+        _invalidate_after_commit(project_id)
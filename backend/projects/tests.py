@@ -1,3 +1,73 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from payments.models import Package
+from tarot.models import TarotSpread
+from .catalog import project_catalog
+from .models import Project
+
+
+class ProjectCatalogTest(TestCase):
+    """Снимок справочников отдается без запросов к БД и сбрасывается при изменениях"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token',
+                                             design={'primary_color': '#000000'})
+        cls.spread = TarotSpread.objects.create(project=cls.project, name='Расклад', num_cards=3)
+        cls.package = Package.objects.create(project=cls.project, name='5 раскладов', price=199, num_readings=5)
+        Package.objects.create(project=cls.project, name='Архив', price=99, num_readings=1, is_active=False)
+
+    def setUp(self):
+        cache.clear()
+        project_catalog.clear()
+        self.client = APIClient()
+
+    def test_snapshot_contents(self):
+        snapshot = project_catalog.get(self.project.id)
+
+        self.assertEqual([package.id for package in snapshot.packages], [self.package.id])
+        self.assertEqual([spread.id for spread in snapshot.spreads], [self.spread.id])
+        self.assertEqual(snapshot.theme_settings['primary_color'], '#000000')
+        self.assertEqual(snapshot.theme_settings['font_family'], 'Inter')
+        self.assertIsNone(project_catalog.get(self.project.id + 1000))
+
+    def test_reads_hit_process_and_shared_cache(self):
+        snapshot = project_catalog.get(self.project.id)
+
+        with self.assertNumQueries(0):
+            self.assertIs(project_catalog.get(self.project.id), snapshot)
+            # Другой процесс с пустым LRU берет снимок из общего кэша
+            project_catalog.clear()
+            self.assertEqual(project_catalog.get(self.project.id).version, snapshot.version)
+
+    def test_changes_invalidate_snapshot(self):
+        project_catalog.get(self.project.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TarotSpread.objects.create(project=self.project, name='Три карты', num_cards=3)
+
+        snapshot = project_catalog.get(self.project.id)
+        self.assertEqual([spread.name for spread in snapshot.spreads], ['Расклад', 'Три карты'])
+
+    def test_catalog_endpoints_served_from_snapshot(self):
+        urls = [
+            f'/api/packages/?project={self.project.id}',
+            f'/api/tarot/spreads/?project={self.project.id}',
+            f'/api/projects/{self.project.id}/theme_settings/',
+        ]
+        for url in urls:
+            self.client.get(url)
+
+        for url in urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(context.captured_queries), 0)
+
+        data = self.client.get(f'/api/packages/?project={self.project.id}').json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['project_name'], 'Test Bot')
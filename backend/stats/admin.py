@@ -0,0 +1,40 @@
+from django.contrib import admin
+
+from .models import DailyPackageStats, DailyProjectStats, DailySpreadStats, RollupWatermark
+
+
+class ReadOnlyStatsAdmin(admin.ModelAdmin):
+    """Дневная статистика заполняется фоновой задачей и не редактируется вручную"""
+
+    date_hierarchy = 'date'
+    list_filter = ('project',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyProjectStats)
+class DailyProjectStatsAdmin(ReadOnlyStatsAdmin):
+    list_display = ('date', 'project', 'new_users', 'readings', 'payments', 'revenue')
+    list_select_related = ('project',)
+
+
+@admin.register(DailySpreadStats)
+class DailySpreadStatsAdmin(ReadOnlyStatsAdmin):
+    list_display = ('date', 'project', 'spread', 'readings')
+    list_select_related = ('project', 'spread')
+
+
+@admin.register(DailyPackageStats)
+class DailyPackageStatsAdmin(ReadOnlyStatsAdmin):
+    list_display = ('date', 'project', 'package', 'payments', 'revenue')
+    list_select_related = ('project', 'package')
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('source', 'position', 'updated_at')
+    readonly_fields = ('source', 'position', 'updated_at')
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from stats.rollups import rebuild_rollups, update_rollups
+
+
+class Command(BaseCommand):
+    help = 'Дописывает новые строки в дневную статистику проектов (или пересчитывает ее с нуля)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Удалить дневную статистику и пересчитать ее по всей истории')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        processed = rebuild_rollups() if options['rebuild'] else update_rollups()
+        elapsed = time.perf_counter() - started
+
+        for source, count in processed.items():
+            self.stdout.write(f"{source}: учтено {count}")
+        self.stdout.write(self.style.SUCCESS(f'Готово за {elapsed:.2f} с'))
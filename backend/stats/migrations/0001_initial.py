@@ -0,0 +1,82 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('payments', '0003_stats_rollup_index'),
+        ('projects', '0002_hot_query_indexes'),
+        ('tarot', '0006_interpretation_card_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True, verbose_name='Источник')),
+                ('position', models.DateTimeField(verbose_name='Учтено до')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+            ],
+            options={
+                'verbose_name': 'Отметка агрегации',
+                'verbose_name_plural': 'Отметки агрегации',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPackageStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('payments', models.PositiveIntegerField(default=0, verbose_name='Оплаченных платежей')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='payments.package', verbose_name='Пакет')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_package_stats', to='projects.project', verbose_name='Проект')),
+            ],
+            options={
+                'verbose_name': 'Статистика пакета за день',
+                'verbose_name_plural': 'Статистика пакетов по дням',
+                'ordering': ['-date'],
+                'unique_together': {('project', 'date', 'package')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('new_users', models.PositiveIntegerField(default=0, verbose_name='Новых пользователей')),
+                ('readings', models.PositiveIntegerField(default=0, verbose_name='Раскладов')),
+                ('payments', models.PositiveIntegerField(default=0, verbose_name='Оплаченных платежей')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='projects.project', verbose_name='Проект')),
+            ],
+            options={
+                'verbose_name': 'Статистика проекта за день',
+                'verbose_name_plural': 'Статистика проектов по дням',
+                'ordering': ['-date'],
+                'unique_together': {('project', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySpreadStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('readings', models.PositiveIntegerField(default=0, verbose_name='Раскладов')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_spread_stats', to='projects.project', verbose_name='Проект')),
+                ('spread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='tarot.tarotspread', verbose_name='Расклад')),
+            ],
+            options={
+                'verbose_name': 'Статистика расклада за день',
+                'verbose_name_plural': 'Статистика раскладов по дням',
+                'ordering': ['-date'],
+                'unique_together': {('project', 'date', 'spread')},
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.db import models
+
+from payments.models import Package
+from projects.models import Project
+from tarot.models import TarotSpread
+
+
+class RollupWatermark(models.Model):
+    """Момент, до которого строки источника уже учтены в дневной статистике"""
+
+    source = models.CharField('Источник', max_length=50, unique=True)
+    position = models.DateTimeField('Учтено до')
+    updated_at = models.DateTimeField('Обновлен', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отметка агрегации'
+        verbose_name_plural = 'Отметки агрегации'
+
+    def __str__(self):
+        return f"{self.source}: {self.position}"
+
+
+class DailyProjectStats(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='daily_stats', verbose_name='Проект')
+    date = models.DateField('Дата')
+    new_users = models.PositiveIntegerField('Новых пользователей', default=0)
+    readings = models.PositiveIntegerField('Раскладов', default=0)
+    payments = models.PositiveIntegerField('Оплаченных платежей', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Статистика проекта за день'
+        verbose_name_plural = 'Статистика проектов по дням'
+        unique_together = ('project', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.project.name} {self.date}"
+
+
+class DailySpreadStats(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='daily_spread_stats',
+                                verbose_name='Проект')
+    spread = models.ForeignKey(TarotSpread, on_delete=models.CASCADE, related_name='daily_stats',
+                               verbose_name='Расклад')
+    date = models.DateField('Дата')
+    readings = models.PositiveIntegerField('Раскладов', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика расклада за день'
+        verbose_name_plural = 'Статистика раскладов по дням'
+        unique_together = ('project', 'date', 'spread')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.spread.name} {self.date}"
+
+
+class DailyPackageStats(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='daily_package_stats',
+                                verbose_name='Проект')
+    package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='daily_stats',
+                                verbose_name='Пакет')
+    date = models.DateField('Дата')
+    payments = models.PositiveIntegerField('Оплаченных платежей', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пакета за день'
+        verbose_name_plural = 'Статистика пакетов по дням'
+        unique_together = ('project', 'date', 'package')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.package.name} {self.date}"
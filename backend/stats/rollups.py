@@ -0,0 +1,183 @@
+"""
+Инкрементальная агрегация дневной статистики проектов
+
+У каждого источника (новые пользователи, расклады, оплаченные платежи)
+есть отметка — момент, до которого его строки уже учтены. Запуск берет
+только строки из окна (отметка, сейчас − задержка], группирует их по
+проекту и дню и прибавляет к дневным таблицам. Прибавление и сдвиг
+отметки выполняются в одной транзакции под блокировкой отметки, поэтому
+повторный или одновременный запуск не посчитает строки дважды.
+
+Задержка оставляет время транзакциям, которые уже записали строку
+с меткой времени внутри окна, но еще не закоммитили ее. Удаления
+и отмены платежей задним числом инкрементально не учитываются:
+для этого есть полный пересчет (rebuild_rollups).
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from payments.models import Payment
+from tarot.models import Interpretation
+from users.models import UserProfile
+from .models import DailyPackageStats, DailyProjectStats, DailySpreadStats, RollupWatermark
+
+logger = logging.getLogger(__name__)
+
+# Начальная отметка: при первом запуске учитывается вся история
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class RollupSource(NamedTuple):
+    name: str
+    # Строки источника в окне (начало, конец] -> число учтенных строк
+    apply: Callable[[datetime, datetime], int]
+
+
+def _increment(model, keys: Dict[str, Any], **deltas) -> None:
+    """Прибавляет значения к строке дневной таблицы, создавая ее при необходимости"""
+    if not model.objects.filter(**keys).update(**{field: F(field) + value for field, value in deltas.items()}):
+        model.objects.create(**keys, **deltas)
+
+
+def _apply_users(start: datetime, end: datetime) -> int:
+    groups = (UserProfile.objects.filter(created_at__gt=start, created_at__lte=end)
+              .annotate(day=TruncDate('created_at'))
+              .values('project_id', 'day')
+              .annotate(count=Count('id'))
+              .order_by())
+    total = 0
+    for group in groups:
+        _increment(DailyProjectStats, {'project_id': group['project_id'], 'date': group['day']},
+                   new_users=group['count'])
+        total += group['count']
+    return total
+
+
+def _apply_readings(start: datetime, end: datetime) -> int:
+    groups = (Interpretation.objects.filter(created_at__gt=start, created_at__lte=end)
+              .annotate(day=TruncDate('created_at'))
+              .values('spread__project_id', 'spread_id', 'day')
+              .annotate(count=Count('id'))
+              .order_by())
+    per_project: Dict[tuple, int] = {}
+    for group in groups:
+        project_day = (group['spread__project_id'], group['day'])
+        _increment(DailySpreadStats, {'project_id': project_day[0], 'date': project_day[1],
+                                      'spread_id': group['spread_id']}, readings=group['count'])
+        per_project[project_day] = per_project.get(project_day, 0) + group['count']
+    for (project_id, day), count in per_project.items():
+        _increment(DailyProjectStats, {'project_id': project_id, 'date': day}, readings=count)
+    return sum(per_project.values())
+
+
+def _apply_payments(start: datetime, end: datetime) -> int:
+    groups = (Payment.objects.filter(status='completed', completed_at__gt=start, completed_at__lte=end)
+              .annotate(day=TruncDate('completed_at'))
+              .values('project_id', 'package_id', 'day')
+              .annotate(count=Count('id'), revenue=Sum('amount'))
+              .order_by())
+    per_project: Dict[tuple, list] = {}
+    for group in groups:
+        project_day = (group['project_id'], group['day'])
+        _increment(DailyPackageStats, {'project_id': project_day[0], 'date': project_day[1],
+                                       'package_id': group['package_id']},
+                   payments=group['count'], revenue=group['revenue'])
+        totals = per_project.setdefault(project_day, [0, Decimal('0')])
+        totals[0] += group['count']
+        totals[1] += group['revenue']
+    for (project_id, day), (count, revenue) in per_project.items():
+        _increment(DailyProjectStats, {'project_id': project_id, 'date': day}, payments=count, revenue=revenue)
+    return sum(count for count, _ in per_project.values())
+
+
+SOURCES = [
+    RollupSource('users', _apply_users),
+    RollupSource('readings', _apply_readings),
+    RollupSource('payments', _apply_payments),
+]
+
+
+def update_rollups(now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Учитывает в дневной статистике строки, появившиеся после отметок
+
+    Returns:
+        Словарь {источник: число учтенных строк}
+    """
+    end = (now or timezone.now()) - timedelta(seconds=settings.STATS_ROLLUP_LAG)
+    return {source.name: _apply_source(source, end) for source in SOURCES}
+
+
+def rebuild_rollups(now: Optional[datetime] = None) -> Dict[str, int]:
+    """Пересчитывает дневную статистику с нуля (после удалений и правок задним числом)"""
+    with transaction.atomic():
+        for model in (DailyProjectStats, DailySpreadStats, DailyPackageStats, RollupWatermark):
+            model.objects.all().delete()
+        return update_rollups(now)
+
+
+def _apply_source(source: RollupSource, end: datetime) -> int:
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(source=source.name, defaults={'position': EPOCH})
+        watermark = RollupWatermark.objects.select_for_update().get(source=source.name)
+        if watermark.position >= end:
+            return 0
+        count = source.apply(watermark.position, end)
+        watermark.position = end
+        watermark.save(update_fields=['position', 'updated_at'])
+    if count:
+        logger.info(f"Статистика {source.name}: учтено {count} строк до {end.isoformat()}")
+    return count
+
+
+def get_dashboard(project_id: int, date_from: date, date_to: date) -> Dict[str, Any]:
+    """
+    Статистика проекта за период из дневных таблиц
+
+    Число строк, которые читаются, зависит только от длины периода
+    и числа раскладов и пакетов проекта, но не от объема исходных данных.
+    """
+    days = {row.date: row for row in DailyProjectStats.objects.filter(
+        project_id=project_id, date__gte=date_from, date__lte=date_to)}
+    empty = {'new_users': 0, 'readings': 0, 'payments': 0, 'revenue': Decimal('0')}
+    totals = dict(empty)
+    daily = []
+    current = date_from
+    while current <= date_to:
+        row = days.get(current)
+        values = {field: getattr(row, field) for field in empty} if row else dict(empty)
+        for field, value in values.items():
+            totals[field] += value
+        daily.append({'date': current, **values})
+        current += timedelta(days=1)
+
+    spreads = (DailySpreadStats.objects.filter(project_id=project_id, date__gte=date_from, date__lte=date_to)
+               .values('spread_id', 'spread__name')
+               .annotate(readings=Sum('readings'))
+               .order_by('-readings'))
+    packages = (DailyPackageStats.objects.filter(project_id=project_id, date__gte=date_from, date__lte=date_to)
+                .values('package_id', 'package__name')
+                .annotate(payments=Sum('payments'), revenue=Sum('revenue'))
+                .order_by('-revenue'))
+    watermarks = list(RollupWatermark.objects.values_list('position', flat=True))
+
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        # Данные полны до этого момента: более новые строки еще не агрегированы
+        'updated_to': min(watermarks) if len(watermarks) == len(SOURCES) else None,
+        'totals': totals,
+        'daily': daily,
+        'spreads': [{'id': row['spread_id'], 'name': row['spread__name'], 'readings': row['readings']}
+                    for row in spreads],
+        'packages': [{'id': row['package_id'], 'name': row['package__name'], 'payments': row['payments'],
+                      'revenue': row['revenue']} for row in packages],
+    }
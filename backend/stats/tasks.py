@@ -0,0 +1,9 @@
+from core.celery import app
+
+from .rollups import update_rollups
+
+
+@app.task(ignore_result=True)
+def update_stats_rollups_task() -> None:
+    """Периодически дописывает новые строки в дневную статистику проектов"""
+    update_rollups()
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from payments.models import Package, Payment
+from projects.models import Project
+from tarot.models import Interpretation, TarotSpread
+from users.models import UserProfile
+from .models import DailyPackageStats, DailyProjectStats, DailySpreadStats
+from .rollups import rebuild_rollups, update_rollups
+
+
+@override_settings(STATS_ROLLUP_LAG=0)
+class StatsRollupTest(TestCase):
+    """Дневная статистика учитывает только новые строки и не считает их дважды"""
+
+    def setUp(self):
+        self.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        self.spreads = [TarotSpread.objects.create(project=self.project, name=f'Расклад {i}', num_cards=1)
+                        for i in range(2)]
+        self.package = Package.objects.create(project=self.project, name='5 раскладов', price=199, num_readings=5)
+        self.client = APIClient()
+
+    def add_activity(self, users=2):
+        created = [UserProfile.objects.create(project=self.project, telegram_user_id=UserProfile.objects.count() + 1)
+                   for _ in range(users)]
+        for user in created:
+            Interpretation.objects.create(user=user, spread=self.spreads[0], card_ids=[1])
+        Interpretation.objects.create(user=created[0], spread=self.spreads[1], card_ids=[1])
+        Payment.objects.create(user=created[0], project=self.project, package=self.package, amount=199,
+                               status='completed', completed_at=timezone.now())
+        Payment.objects.create(user=created[0], project=self.project, package=self.package, amount=199)
+
+    def day(self):
+        return DailyProjectStats.objects.get(project=self.project, date=timezone.localdate())
+
+    def test_incremental_and_rerunnable(self):
+        self.add_activity()
+        self.assertEqual(update_rollups(), {'users': 2, 'readings': 3, 'payments': 1})
+        self.assertEqual(update_rollups(), {'users': 0, 'readings': 0, 'payments': 0})
+
+        self.add_activity(users=1)
+        update_rollups()
+
+        day = self.day()
+        self.assertEqual((day.new_users, day.readings, day.payments, day.revenue), (3, 5, 2, Decimal('398')))
+        self.assertEqual(DailySpreadStats.objects.get(spread=self.spreads[0]).readings, 3)
+        self.assertEqual(DailyPackageStats.objects.get(package=self.package).revenue, Decimal('398'))
+
+        # Полный пересчет дает тот же результат
+        rebuild_rollups()
+        rebuilt = self.day()
+        self.assertEqual((rebuilt.new_users, rebuilt.readings, rebuilt.payments), (3, 5, 2))
+
+    def test_lag_leaves_recent_rows_for_next_run(self):
+        self.add_activity()
+        with override_settings(STATS_ROLLUP_LAG=60):
+            self.assertEqual(update_rollups(), {'users': 0, 'readings': 0, 'payments': 0})
+        self.assertEqual(update_rollups(now=timezone.now() + timedelta(seconds=1))['users'], 2)
+
+    def test_dashboard_is_served_from_rollups(self):
+        self.add_activity()
+        update_rollups()
+        url = f'/api/projects/{self.project.id}/stats/'
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['daily']), 7)
+        self.assertEqual(data['totals']['readings'], 3)
+        self.assertEqual(data['spreads'][0], {'id': self.spreads[0].id, 'name': 'Расклад 0', 'readings': 2})
+        self.assertEqual(data['packages'][0]['payments'], 1)
+
+        # Число запросов не зависит от объема исходных данных
+        self.add_activity(users=5)
+        update_rollups()
+        with CaptureQueriesContext(connection) as more:
+            self.client.get(url, {'days': 7})
+        self.assertEqual(len(more.captured_queries), len(context.captured_queries))
+
+        self.assertEqual(self.client.get(url, {'days': 1000}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_from': '2024-13-01'}).status_code, 400)
@@ -1,29 +1,63 @@
 from django.contrib import admin
-from .models import TarotDeck, TarotCard, TarotSpread, Interpretation
+
+from core.admin import AutocompleteFilter, LargeTableAdmin
+from .models import TarotDeck, TarotCard, TarotSpread, Interpretation, CardRendition, LLMUsage
 
 @admin.register(TarotDeck)
-class TarotDeckAdmin(admin.ModelAdmin):
+class TarotDeckAdmin(LargeTableAdmin):
     list_display = ('id', 'name', 'project', 'created_at')
     search_fields = ('name',)
     list_filter = ('project',)
+    list_select_related = ('project',)
     readonly_fields = ('created_at', 'updated_at')
 
+class CardRenditionInline(admin.TabularInline):
+    model = CardRendition
+    extra = 0
+    can_delete = False
+    fields = ('size', 'format', 'image', 'width', 'height', 'file_size', 'created_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        # Копии создаются командой generate_renditions или фоновой задачей
+        return False
+
 @admin.register(TarotCard)
-class TarotCardAdmin(admin.ModelAdmin):
+class TarotCardAdmin(LargeTableAdmin):
     list_display = ('id', 'name', 'deck', 'order')
     search_fields = ('name',)
-    list_filter = ('deck',)
+    list_filter = (('deck', AutocompleteFilter),)
+    list_select_related = ('deck__project',)
+    autocomplete_fields = ('deck',)
+    inlines = [CardRenditionInline]
 
 @admin.register(TarotSpread)
-class TarotSpreadAdmin(admin.ModelAdmin):
+class TarotSpreadAdmin(LargeTableAdmin):
     list_display = ('id', 'name', 'project', 'num_cards', 'created_at')
     search_fields = ('name',)
     list_filter = ('project',)
+    list_select_related = ('project',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Interpretation)
-class InterpretationAdmin(admin.ModelAdmin):
+class InterpretationAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'spread', 'created_at')
     search_fields = ('user__username', 'spread__name')
-    list_filter = ('spread', 'user')
+    list_filter = (('spread', AutocompleteFilter), ('user', AutocompleteFilter))
+    list_select_related = ('user__project', 'spread__project')
+    autocomplete_fields = ('user', 'spread', 'cards')
     readonly_fields = ('created_at',)
+
+@admin.register(LLMUsage)
+class LLMUsageAdmin(LargeTableAdmin):
+    list_display = ('id', 'project', 'model', 'prompt_tokens', 'completion_tokens', 'latency_ms', 'fallback', 'cached', 'created_at')
+    list_filter = ('project', 'model', 'fallback', 'cached')
+    list_select_related = ('project',)
+    date_hierarchy = 'created_at'
+
+    # Журнал только дополняется сервисом YandexGPT
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -5,3 +5,7 @@ class TarotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tarot'
     verbose_name = 'Таро: колоды, карты, расклады'
+
+    def ready(self):
+        # Подключаем обработчики сигналов
+        from . import signals  # noqa: F401
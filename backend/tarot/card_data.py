@@ -0,0 +1,140 @@
+"""
+Эталонные данные классической колоды Таро из 78 карт
+
+Используются скриптами наполнения колоды и бенчмарком API.
+Имена файлов изображений совпадают с файлами в media/tarot/cards.
+"""
+from typing import List, NamedTuple
+
+
+class CardData(NamedTuple):
+    name: str
+    meaning_upright: str
+    meaning_reversed: str
+    image: str
+
+
+# Старшие Арканы: (имя файла без номера, название, прямое значение, перевернутое значение)
+MAJOR_ARCANA = [
+    ("TheFool", "Шут", "Начало пути, невинность, спонтанность", "Безрассудство, риск, неопытность"),
+    ("TheMagician", "Маг", "Сила воли, мастерство, концентрация", "Манипуляция, неиспользованные возможности"),
+    ("TheHighPriestess", "Верховная Жрица", "Интуиция, тайные знания, внутренняя мудрость", "Скрытые мотивы, поверхностность"),
+    ("TheEmpress", "Императрица", "Плодородие, материнство, природа", "Зависимость, бесплодие, пустота"),
+    ("TheEmperor", "Император", "Авторитет, структура, контроль", "Тирания, жесткость, доминирование"),
+    ("TheHierophant", "Иерофант", "Традиция, духовность, образование", "Догматизм, ограниченность, невежество"),
+    ("TheLovers", "Влюбленные", "Любовь, гармония, выбор", "Дисгармония, неверность, нерешительность"),
+    ("TheChariot", "Колесница", "Победа, контроль, воля", "Потеря контроля, агрессия, поражение"),
+    ("Strength", "Сила", "Сила духа, мужество, влияние", "Слабость, неуверенность, отсутствие веры"),
+    ("TheHermit", "Отшельник", "Самоанализ, поиск, одиночество", "Изоляция, одиночество, отказ от помощи"),
+    ("WheelOfFortune", "Колесо Фортуны", "Изменения, судьба, поворот событий", "Неудача, застой, плохие перемены"),
+    ("Justice", "Справедливость", "Баланс, справедливость, правда", "Несправедливость, дисбаланс, предвзятость"),
+    ("TheHangedMan", "Повешенный", "Жертва, пауза, новый взгляд", "Бесполезная жертва, застой, сопротивление"),
+    ("Death", "Смерть", "Конец, трансформация, новое начало", "Страх перемен, застой, сопротивление"),
+    ("Temperance", "Умеренность", "Баланс, гармония, терпение", "Дисбаланс, нетерпение, крайности"),
+    ("TheDevil", "Дьявол", "Искушение, материализм, зависимость", "Освобождение, преодоление искушений"),
+    ("TheTower", "Башня", "Внезапные изменения, разрушение, откровение", "Избежание катастрофы, постепенные изменения"),
+    ("TheStar", "Звезда", "Надежда, вдохновение, духовность", "Отчаяние, потеря веры, пессимизм"),
+    ("TheMoon", "Луна", "Интуиция, иллюзии, подсознание", "Ясность, преодоление страхов, правда"),
+    ("TheSun", "Солнце", "Радость, успех, жизненная сила", "Временная депрессия, недостаток энергии"),
+    ("Judgement", "Суд", "Возрождение, призыв, трансформация", "Сомнения, страх перемен, отказ от призыва"),
+    ("TheWorld", "Мир", "Завершение, гармония, путешествие", "Незавершенность, дисгармония, застой"),
+]
+
+# Масти Младших Арканов: (имя файла, название масти в родительном падеже)
+SUITS = [
+    ("Cups", "Кубков"),
+    ("Swords", "Мечей"),
+    ("Pentacles", "Пентаклей"),
+    ("Wands", "Жезлов"),
+]
+
+RANKS = [
+    "Туз", "Двойка", "Тройка", "Четверка", "Пятерка", "Шестерка", "Семерка",
+    "Восьмерка", "Девятка", "Десятка", "Паж", "Рыцарь", "Королева", "Король",
+]
+
+# Значения Младших Арканов по мастям, от Туза до Короля
+MINOR_ARCANA_MEANINGS = {
+    # Кубки (Чувства, эмоции)
+    "Cups": [
+        ("Новые чувства, любовь, вдохновение", "Эмоциональная пустота, потеря вдохновения"),
+        ("Партнерство, гармония, взаимность", "Разлад, непонимание, разрыв"),
+        ("Празднование, дружба, радость", "Одиночество, изоляция, грусть"),
+        ("Апатия, скука, неудовлетворенность", "Новые возможности, пробуждение"),
+        ("Разочарование, потеря, горе", "Принятие, исцеление, надежда"),
+        ("Ностальгия, детские воспоминания", "Застревание в прошлом, незрелость"),
+        ("Выбор, иллюзии, мечты", "Ясность, принятие решений"),
+        ("Уход, поиск, духовный путь", "Страх перемен, застой"),
+        ("Удовлетворение, материальное благополучие", "Неудовлетворенность, жадность"),
+        ("Семейное счастье, гармония, любовь", "Семейные проблемы, дисгармония"),
+        ("Чувствительность, творческая весть, интуиция", "Эмоциональная незрелость, капризы"),
+        ("Романтика, обаяние, предложение", "Непостоянство, ревность, обман чувств"),
+        ("Сострадание, забота, эмоциональная глубина", "Зависимость от чужих чувств, обида"),
+        ("Эмоциональная зрелость, дипломатия, великодушие", "Манипуляция чувствами, холодность"),
+    ],
+    # Мечи (Интеллект, конфликты)
+    "Swords": [
+        ("Победа, сила, ясность мысли", "Поражение, слабость, путаница"),
+        ("Выбор, равновесие, дилемма", "Нерешительность, страх выбора"),
+        ("Сердечная боль, предательство, горе", "Исцеление, прощение, восстановление"),
+        ("Отдых, восстановление, медитация", "Беспокойство, стресс, переутомление"),
+        ("Конфликт, поражение, унижение", "Примирение, прощение, мир"),
+        ("Переход, путешествие, исцеление", "Застревание, сопротивление переменам"),
+        ("Хитрость, обман, скрытность", "Честность, открытость, прямота"),
+        ("Ограничения, ловушка, беспомощность", "Освобождение, преодоление препятствий"),
+        ("Тревога, страх, кошмары", "Надежда, облегчение, спокойствие"),
+        ("Конец, предательство, боль", "Новое начало, исцеление, надежда"),
+        ("Любознательность, бдительность, новые идеи", "Сплетни, поспешные выводы"),
+        ("Решительность, натиск, амбиции", "Импульсивность, агрессия, безрассудство"),
+        ("Независимость, проницательность, честность", "Жестокость, горечь, холодность"),
+        ("Власть разума, справедливость, авторитет", "Злоупотребление властью, деспотизм"),
+    ],
+    # Пентакли (Материя, деньги)
+    "Pentacles": [
+        ("Новые возможности, богатство, успех", "Упущенные возможности, материальные потери"),
+        ("Баланс, адаптация, гибкость", "Дисбаланс, стресс, перегрузка"),
+        ("Сотрудничество, мастерство, обучение", "Недостаток навыков, изоляция"),
+        ("Сохранение, безопасность, консерватизм", "Щедрость, открытость, риск"),
+        ("Бедность, нужда, изоляция", "Восстановление, помощь, надежда"),
+        ("Щедрость, помощь, поддержка", "Эгоизм, долги, зависимость"),
+        ("Терпение, планирование, рост", "Нетерпение, поспешность, неудача"),
+        ("Упорный труд, мастерство, развитие", "Лень, отсутствие прогресса"),
+        ("Благополучие, роскошь, независимость", "Материализм, одиночество"),
+        ("Семейное богатство, наследие, традиции", "Семейные проблемы, потеря"),
+        ("Учеба, новые планы, практичность", "Рассеянность, упущенный шанс"),
+        ("Надежность, трудолюбие, постоянство", "Застой, упрямство, скука"),
+        ("Практичность, забота, достаток", "Хозяйственные заботы, неуверенность"),
+        ("Богатство, стабильность, деловая хватка", "Жадность, упрямство, расточительность"),
+    ],
+    # Жезлы (Энергия, творчество)
+    "Wands": [
+        ("Новые начинания, вдохновение, энергия", "Отсутствие мотивации, задержки"),
+        ("Планирование, выбор, будущее", "Страх, нерешительность, ограничения"),
+        ("Расширение, путешествие, торговля", "Задержки, разочарование"),
+        ("Празднование, гармония, дом", "Семейные проблемы, дисгармония"),
+        ("Конкуренция, конфликт, вызов", "Сотрудничество, мир, избежание конфликтов"),
+        ("Победа, успех, признание", "Гордость, высокомерие, падение"),
+        ("Защита, вызов, настойчивость", "Уязвимость, поражение, слабость"),
+        ("Быстрые изменения, движение, новости", "Задержки, медленные изменения"),
+        ("Сила, выносливость, защита", "Слабость, уязвимость, истощение"),
+        ("Бремя, ответственность, нагрузка", "Освобождение, делегирование"),
+        ("Энтузиазм, открытия, добрые вести", "Нетерпеливость, плохие новости"),
+        ("Приключения, страсть, стремительность", "Спешка, безрассудство, вспыльчивость"),
+        ("Уверенность, харизма, решительность", "Ревность, требовательность, эгоизм"),
+        ("Лидерство, видение, предприимчивость", "Властность, нетерпимость, высокомерие"),
+    ],
+}
+
+
+def get_deck_cards() -> List[CardData]:
+    """Возвращает все 78 карт колоды в каноническом порядке"""
+    cards = [
+        CardData(name, upright, reversed_, f"{number:02d}-{filename}.png")
+        for number, (filename, name, upright, reversed_) in enumerate(MAJOR_ARCANA)
+    ]
+    for suit_filename, suit_name in SUITS:
+        for rank, (rank_name, (upright, reversed_)) in enumerate(
+                zip(RANKS, MINOR_ARCANA_MEANINGS[suit_filename]), start=1):
+            cards.append(CardData(f"{rank_name} {suit_name}", upright, reversed_,
+                                  f"{suit_filename}{rank:02d}.png"))
+    return cards
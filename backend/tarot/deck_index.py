@@ -0,0 +1,156 @@
+import logging
+import random
+import threading
+from typing import Dict, List, NamedTuple, Tuple
+
+from django.core.cache import cache
+
+from core.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class RenditionInfo(NamedTuple):
+    """Готовая копия изображения карты"""
+    size: str
+    format: str
+    url: str
+    width: int
+    height: int
+    file_size: int
+
+
+class DeckCard(NamedTuple):
+    """Облегченное представление карты, достаточное для расклада и ответа API"""
+    id: int
+    deck_id: int
+    name: str
+    meaning_upright: str
+    meaning_reversed: str
+    # URL изображения для ответов: копия размера TAROT_RENDITION_DEFAULT_SIZE, если она есть, иначе оригинал
+    image_url: str
+    original_url: str
+    renditions: Tuple[RenditionInfo, ...]
+
+
+class DeckIndex:
+    """
+    Процессный индекс карт, сгруппированный по проектам.
+
+    Карты проекта загружаются из БД один раз и хранятся в памяти процесса,
+    а выборка карт для расклада выполняется в Python без ORDER BY RANDOM().
+    Версия индекса каждого проекта хранится в общем кэше, поэтому
+    инвалидация в одном процессе видна и остальным воркерам.
+    """
+
+    VERSION_KEY = 'tarot:deck_index:version:{project_id}'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Tuple[int, List[DeckCard], Dict[int, DeckCard]]] = {}
+        self._random = random.SystemRandom()
+
+    def get_cards(self, project_id: int) -> List[DeckCard]:
+        """Возвращает все карты проекта из индекса, при необходимости загружая их"""
+        return self._get_entry(project_id)[1]
+
+    def get_card_map(self, project_id: int) -> Dict[int, DeckCard]:
+        """Карты проекта по id — для подстановки готовых URL изображений"""
+        return self._get_entry(project_id)[2]
+
+    def _get_entry(self, project_id: int) -> Tuple[int, List[DeckCard], Dict[int, DeckCard]]:
+        version = self._get_version(project_id)
+        entry = self._entries.get(project_id)
+        if entry is not None and entry[0] == version:
+            record_cache('deck_index', True)
+            return entry
+        record_cache('deck_index', False)
+
+        cards = self._load_cards(project_id)
+        entry = (version, cards, {card.id: card for card in cards})
+        with self._lock:
+            self._entries[project_id] = entry
+        return entry
+
+    def draw(self, project_id: int, num_cards: int) -> List[DeckCard]:
+        """
+        Выбирает случайные карты проекта без повторений
+
+        Если карт в колодах меньше, чем требуется, возвращает все доступные
+        карты в случайном порядке — проверку количества делает вызывающий код.
+        """
+        cards = self.get_cards(project_id)
+        return self._random.sample(cards, min(num_cards, len(cards)))
+
+    def invalidate(self, project_id: int) -> None:
+        """Сбрасывает индекс проекта во всех процессах"""
+        key = self.VERSION_KEY.format(project_id=project_id)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Ключ мог быть вытеснен из кэша между add и incr
+            cache.set(key, 1, timeout=None)
+        with self._lock:
+            self._entries.pop(project_id, None)
+        logger.debug(f"Индекс колод проекта {project_id} сброшен")
+
+    def clear(self) -> None:
+        """Очищает локальный индекс текущего процесса"""
+        with self._lock:
+            self._entries.clear()
+
+    def _get_version(self, project_id: int) -> int:
+        return cache.get(self.VERSION_KEY.format(project_id=project_id), 0)
+
+    def _load_cards(self, project_id: int) -> List[DeckCard]:
+        from django.conf import settings
+        from django.db.models import Prefetch
+
+        from .models import CardRendition, TarotCard
+        from .renditions import get_rendition_formats
+
+        queryset = TarotCard.objects.filter(deck__project_id=project_id).only(
+            'id', 'deck_id', 'name', 'meaning_upright', 'meaning_reversed', 'image'
+        ).prefetch_related(Prefetch('renditions', queryset=CardRendition.objects.order_by('size', 'format')))
+
+        # Порядок форматов в настройках задает предпочтение для ответов
+        formats = get_rendition_formats()
+        default_size = settings.TAROT_RENDITION_DEFAULT_SIZE
+
+        cards = []
+        for card in queryset:
+            original_url = card.image.url if card.image else ''
+            # Копии от прежнего файла карты не отдаются, пока их не пересоздадут
+            renditions = tuple(
+                RenditionInfo(
+                    size=rendition.size,
+                    format=rendition.format,
+                    url=rendition.image.url,
+                    width=rendition.width,
+                    height=rendition.height,
+                    file_size=rendition.file_size,
+                )
+                for rendition in card.renditions.all()
+                if card.image and rendition.source == card.image.name and rendition.format in formats
+            )
+            preferred = sorted(
+                (rendition for rendition in renditions if rendition.size == default_size),
+                key=lambda rendition: formats.index(rendition.format)
+            )
+            cards.append(DeckCard(
+                id=card.id,
+                deck_id=card.deck_id,
+                name=card.name,
+                meaning_upright=card.meaning_upright,
+                meaning_reversed=card.meaning_reversed,
+                image_url=preferred[0].url if preferred else original_url,
+                original_url=original_url,
+                renditions=renditions,
+            ))
+        logger.info(f"Индекс колод проекта {project_id} загружен: {len(cards)} карт")
+        return cards
+
+
+# Создаем глобальный экземпляр индекса
+deck_index = DeckIndex()
@@ -0,0 +1,119 @@
+import logging
+import secrets
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.core.cache import cache
+
+from .deck_index import deck_index
+from .readings import orient_cards
+
+logger = logging.getLogger(__name__)
+
+
+class ReadingDraft(NamedTuple):
+    """
+    Выпавшие карты между get_cards и create_interpretation
+
+    Черновик живет только в кэше Django: интерпретация и списание
+    расклада появляются в БД одной транзакцией, когда пользователь
+    запрашивает толкование. Брошенный черновик просто истекает.
+    """
+    token: str
+    user_id: int
+    spread_id: int
+    project_id: int
+    card_ids: Tuple[int, ...]
+    reversed_flags: Tuple[bool, ...]
+    user_context: str
+    created_at: float
+
+
+class ReadingDraftStore:
+    """
+    Черновики раскладов в кэше Django с коротким временем жизни
+
+    get_cards и create_interpretation могут попасть в разные воркеры,
+    поэтому в процессе черновик не хранится: при нескольких воркерах
+    кэш должен быть общим (Redis в settings_production). С LocMemCache
+    черновики работают только в одном процессе (runserver, тесты).
+    """
+
+    KEY = 'tarot:draft:{token}'
+
+    def __init__(self, ttl: int = 1800):
+        self.ttl = ttl
+
+    def create(self, user_id: int, spread, cards: Sequence[Any], cards_data: Sequence[Dict[str, Any]],
+               user_context: str = '') -> ReadingDraft:
+        """Сохраняет выпавшие карты и их ориентацию, возвращает черновик с токеном"""
+        draft = ReadingDraft(
+            token=secrets.token_urlsafe(16),
+            user_id=user_id,
+            spread_id=spread.id,
+            project_id=spread.project_id,
+            card_ids=tuple(card.id for card in cards),
+            reversed_flags=tuple(bool(card['is_reversed']) for card in cards_data),
+            user_context=user_context or '',
+            created_at=time.time(),
+        )
+        cache.set(self._key(draft.token), tuple(draft), self.ttl)
+        return draft
+
+    def get(self, token: str) -> Optional[ReadingDraft]:
+        """Черновик по токену или None, если он истек или уже использован"""
+        if not token:
+            return None
+        data = cache.get(self._key(str(token)))
+        return ReadingDraft(*data) if data is not None else None
+
+    def claim(self, token: str, user_id: int, spread_id: int) -> Optional[ReadingDraft]:
+        """
+        Забирает черновик для создания интерпретации
+
+        Черновик удаляется из кэша, поэтому два одновременных запроса
+        с одним токеном не создадут две интерпретации и не спишут
+        расклад дважды: выиграет тот, чье удаление сработало.
+
+        Returns:
+            Черновик или None, если его нет или он чужой
+        """
+        draft = self.get(token)
+        if draft is None or draft.user_id != int(user_id) or draft.spread_id != int(spread_id):
+            return None
+        if not cache.delete(self._key(draft.token)):
+            return None
+        return draft
+
+    def restore(self, draft: ReadingDraft) -> None:
+        """Возвращает забранный черновик, если интерпретацию создать не удалось"""
+        remaining = self.ttl - (time.time() - draft.created_at)
+        if remaining > 0:
+            cache.set(self._key(draft.token), tuple(draft), int(remaining) or 1)
+
+    def load_cards(self, draft: ReadingDraft) -> Optional[Tuple[List[Any], List[Dict[str, Any]]]]:
+        """
+        Карты черновика из индекса колод и их данные для AI
+
+        Returns:
+            Кортеж (карты, данные карт) или None, если карты удалили из колоды
+        """
+        card_map = deck_index.get_card_map(draft.project_id)
+        cards = [card_map.get(card_id) for card_id in draft.card_ids]
+        if any(card is None for card in cards):
+            logger.warning(f"Карты черновика {draft.token} больше нет в колодах проекта {draft.project_id}")
+            return None
+        return cards, orient_cards(cards, draft.reversed_flags)
+
+    def _key(self, token: str) -> str:
+        return self.KEY.format(token=token)
+
+
+def _create_draft_store() -> ReadingDraftStore:
+    from django.conf import settings
+
+    return ReadingDraftStore(ttl=getattr(settings, 'TAROT_DRAFT_TTL', 1800))
+
+
+# Создаем глобальное хранилище черновиков
+reading_drafts = _create_draft_store()
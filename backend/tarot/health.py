@@ -0,0 +1,157 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Any, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .services import yandex_gpt_service, YANDEX_SDK_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class YandexGPTHealthProbe:
+    """
+    Фоновая проверка доступности YandexGPT.
+
+    Результаты проверок хранятся в общем кэше, поэтому health-эндпоинты
+    только читают готовое состояние и никогда не обращаются к модели сами.
+    Проверку запускает периодическая задача Celery beat; веб-воркеры сами
+    проверяют модель в фоновом потоке, только если задача не запланирована
+    (разработка без beat). Если задача запланирована, а состояние
+    устарело, значит beat остановлен, и состояние отдается как есть.
+    """
+
+    TASK_NAME = 'tarot.tasks.probe_yandex_gpt_task'
+    STATE_KEY = 'tarot:yandexgpt:probe:state'
+    LOCK_KEY = 'tarot:yandexgpt:probe:lock'
+    # Сколько последних замеров латентности учитывать в перцентилях
+    LATENCY_WINDOW = 100
+
+    def __init__(self, service):
+        self.service = service
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, 'YANDEX_GPT_PROBE_TTL', 120)
+
+    @property
+    def scheduled_by_beat(self) -> bool:
+        """Запланирована ли проверка в CELERY_BEAT_SCHEDULE"""
+        schedule = getattr(settings, 'CELERY_BEAT_SCHEDULE', {}) or {}
+        return any(entry.get('task') == self.TASK_NAME for entry in schedule.values())
+
+    def probe(self) -> Dict[str, Any]:
+        """Выполняет проверку подключения и сохраняет результат в кэш"""
+        state = self._get_state()
+        now = time.time()
+
+        if self.service.model is None:
+            state.update({'ok': False, 'configured': False, 'checked_at': now})
+            cache.set(self.STATE_KEY, state, timeout=None)
+            return state
+
+        started = time.perf_counter()
+        try:
+            ok = self.service.test_connection()
+            error = None if ok else 'Модель не подтвердила работоспособность'
+        except Exception as e:
+            ok = False
+            error = str(e)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        state['configured'] = True
+        state['ok'] = ok
+        state['checked_at'] = now
+        state['latencies_ms'] = (state['latencies_ms'] + [round(latency_ms, 1)])[-self.LATENCY_WINDOW:]
+        if ok:
+            state['success_count'] += 1
+            state['consecutive_failures'] = 0
+            state['last_success_at'] = now
+        else:
+            state['error_count'] += 1
+            state['consecutive_failures'] += 1
+            state['last_error'] = error
+            state['last_error_at'] = now
+            logger.warning(f"Проверка YandexGPT не пройдена: {error}")
+
+        cache.set(self.STATE_KEY, state, timeout=None)
+        return state
+
+    def get_status(self, refresh_if_stale: bool = True) -> Dict[str, Any]:
+        """Возвращает последнее известное состояние YandexGPT без обращения к модели"""
+        state = self._get_state()
+        checked_at = state.get('checked_at')
+        stale = checked_at is None or time.time() - checked_at > self.ttl
+        if stale and refresh_if_stale and not self.scheduled_by_beat:
+            self.refresh_in_background()
+
+        latencies = state['latencies_ms']
+        return {
+            'sdk_available': YANDEX_SDK_AVAILABLE,
+            'model_initialized': self.service.model is not None,
+            'api_key_configured': bool(self.service.api_key),
+            'folder_id_configured': bool(self.service.folder_id),
+            'connection_test': bool(state.get('ok')) and not stale,
+            'stale': stale,
+            'checked_at': self._format_ts(checked_at),
+            'last_success_at': self._format_ts(state.get('last_success_at')),
+            'last_error': state.get('last_error'),
+            'last_error_at': self._format_ts(state.get('last_error_at')),
+            'success_count': state['success_count'],
+            'error_count': state['error_count'],
+            'consecutive_failures': state['consecutive_failures'],
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'samples': len(latencies),
+            },
+        }
+
+    def refresh_in_background(self) -> bool:
+        """Запускает проверку в фоновом потоке, если её еще никто не выполняет"""
+        if not cache.add(self.LOCK_KEY, True, timeout=self.ttl):
+            return False
+        thread = threading.Thread(target=self._refresh, name='yandexgpt-probe', daemon=True)
+        thread.start()
+        return True
+
+    def _refresh(self) -> None:
+        try:
+            self.probe()
+        except Exception as e:
+            logger.error(f"Ошибка фоновой проверки YandexGPT: {e}")
+        finally:
+            cache.delete(self.LOCK_KEY)
+
+    def _get_state(self) -> Dict[str, Any]:
+        state = cache.get(self.STATE_KEY) or {}
+        state.setdefault('ok', None)
+        state.setdefault('latencies_ms', [])
+        state.setdefault('success_count', 0)
+        state.setdefault('error_count', 0)
+        state.setdefault('consecutive_failures', 0)
+        return state
+
+    @staticmethod
+    def _format_ts(ts: Optional[float]) -> Optional[str]:
+        if ts is None:
+            return None
+        return datetime.fromtimestamp(ts, tz=dt_timezone.utc).isoformat()
+
+
+# Создаем глобальный экземпляр проверки
+yandex_gpt_probe = YandexGPTHealthProbe(yandex_gpt_service)
@@ -0,0 +1,375 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClientError(Exception):
+    """Базовая ошибка клиента LLM"""
+
+
+class LLMTimeoutError(LLMClientError):
+    """Вызов модели не уложился в дедлайн"""
+
+
+class LLMBusyError(LLMClientError):
+    """Все слоты параллельных вызовов заняты дольше допустимого"""
+
+
+class CircuitOpenError(LLMClientError):
+    """Предохранитель разомкнут: апстрим считается недоступным"""
+
+
+# Коды gRPC, при которых повторный запрос имеет смысл
+RETRYABLE_STATUS_CODES = {'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'RESOURCE_EXHAUSTED', 'ABORTED', 'INTERNAL'}
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Определяет, стоит ли повторять вызов после ошибки"""
+    if isinstance(exc, (LLMTimeoutError, TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, 'code', None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            return False
+    name = getattr(code, 'name', code)
+    return isinstance(name, str) and name in RETRYABLE_STATUS_CODES
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для вызовов апстрима
+
+    После failure_threshold неудачных вызовов подряд размыкается на
+    reset_timeout секунд, затем пропускает один пробный вызов
+    (half-open) и по его результату замыкается или размыкается снова.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._get_state()
+
+    def allow_request(self) -> bool:
+        """Разрешает вызов, если предохранитель замкнут или ждет пробного вызова"""
+        with self._lock:
+            state = self._get_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Предохранитель LLM разомкнут после {self._failures} ошибок подряд")
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Отменяет пробный вызов, который так и не дошел до апстрима"""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def _get_state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+
+class LLMClient:
+    """
+    Клиент для блокирующих вызовов модели с ограничением параллелизма
+
+    Вызовы выполняются в общем пуле потоков, поэтому объект модели SDK
+    и его соединение переиспользуются между запросами. Клиент добавляет
+    дедлайн на каждый вызов, повторы с экспоненциальной задержкой для
+    временных ошибок и предохранитель, который сразу отклоняет вызовы,
+    пока апстрим нездоров.
+    """
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 30, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8, queue_timeout: float = 10,
+                 breaker: Optional[CircuitBreaker] = None, max_async_concurrency: int = 100):
+        self.max_concurrency = max_concurrency
+        self.max_async_concurrency = max_async_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm-call')
+        # Семафоры нативных асинхронных вызовов, по одному на цикл событий
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def call(self, func: Callable[..., Any], *args, retries: Optional[int] = None,
+             timeout: Optional[float] = None) -> Any:
+        """
+        Выполняет блокирующий вызов модели с дедлайном и повторами
+
+        Raises:
+            CircuitOpenError: предохранитель разомкнут
+            LLMBusyError: не удалось дождаться свободного слота
+            LLMTimeoutError: вызов не уложился в дедлайн после всех повторов
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("YandexGPT временно недоступен")
+
+        retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                result = self._call_once(func, args, self.timeout if timeout is None else timeout)
+            except LLMBusyError:
+                # Перегрузка на нашей стороне не говорит о здоровье апстрима
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if attempt < retries and is_retryable(e):
+                    delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+                    delay *= random.uniform(0.5, 1)
+                    logger.warning(f"Повтор вызова LLM через {delay:.2f}с после ошибки: {e}")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def call_many(self, func: Callable[..., Any], args_list: Sequence[tuple],
+                  timeout: Optional[float] = None) -> List[Any]:
+        """
+        Выполняет пачку блокирующих вызовов параллельно в пуле клиента
+
+        Вызовы ставятся прямо в пул клиента без промежуточных потоков:
+        вызывающий поток ждет свободных слотов и затем результатов.
+        Дедлайн каждого вызова отсчитывается от его постановки в пул,
+        вызовы с временной ошибкой повторяются через call.
+
+        Returns:
+            Результаты в порядке args_list; на месте неудачного вызова —
+            его исключение (CircuitOpenError, LLMBusyError, LLMTimeoutError...)
+        """
+        timeout = self.timeout if timeout is None else timeout
+        submitted = []
+        for args in args_list:
+            if not self.breaker.allow_request():
+                submitted.append(CircuitOpenError("YandexGPT временно недоступен"))
+                continue
+            try:
+                submitted.append((self._submit(func, args), time.monotonic()))
+            except LLMBusyError as e:
+                self.breaker.release_trial()
+                submitted.append(e)
+
+        results = []
+        for args, item in zip(args_list, submitted):
+            if isinstance(item, Exception):
+                results.append(item)
+                continue
+            future, submitted_at = item
+            try:
+                result = self._wait(future, timeout, max(timeout - (time.monotonic() - submitted_at), 0))
+            except Exception as e:
+                if self.max_retries and is_retryable(e):
+                    logger.warning(f"Повтор вызова LLM после ошибки: {e}")
+                    try:
+                        result = self.call(func, *args, retries=self.max_retries - 1, timeout=timeout)
+                    except Exception as retry_error:
+                        result = retry_error
+                    results.append(result)
+                    continue
+                self.breaker.record_failure()
+                results.append(e)
+                continue
+            self.breaker.record_success()
+            results.append(result)
+        return results
+
+    async def acall(self, func: Callable[..., Any], *args, retries: Optional[int] = None,
+                    timeout: Optional[float] = None) -> Any:
+        """Асинхронная версия call, не блокирующая цикл событий"""
+        return await asyncio.to_thread(self.call, func, *args, retries=retries, timeout=timeout)
+
+    async def arun(self, coro_func: Callable[..., Any], *args, retries: Optional[int] = None,
+                   timeout: Optional[float] = None) -> Any:
+        """
+        Вызов асинхронного SDK с дедлайном, повторами и предохранителем
+
+        В отличие от acall, ожидание ответа модели не занимает поток,
+        поэтому параллелизм ограничен отдельным лимитом max_async_concurrency.
+
+        Raises:
+            CircuitOpenError: предохранитель разомкнут
+            LLMBusyError: не удалось дождаться свободного слота
+            LLMTimeoutError: вызов не уложился в дедлайн после всех повторов
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("YandexGPT временно недоступен")
+
+        retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                result = await self._arun_once(coro_func, args, self.timeout if timeout is None else timeout)
+            except LLMBusyError:
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if attempt < retries and is_retryable(e):
+                    delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+                    delay *= random.uniform(0.5, 1)
+                    logger.warning(f"Повтор вызова LLM через {delay:.2f}с после ошибки: {e}")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def stream(self, func: Callable[..., Any], *args) -> Iterator[Any]:
+        """
+        Потоковый вызов модели: отдает фрагменты ответа по мере поступления
+
+        Вызов занимает слот параллелизма на все время потока и учитывается
+        предохранителем. Повторов нет: часть ответа уже могла уйти клиенту.
+
+        Raises:
+            CircuitOpenError: предохранитель разомкнут
+            LLMBusyError: не удалось дождаться свободного слота
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("YandexGPT временно недоступен")
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            self.breaker.release_trial()
+            raise LLMBusyError("Превышен лимит параллельных запросов к YandexGPT")
+
+        try:
+            for item in func(*args):
+                yield item
+        except GeneratorExit:
+            # Клиент перестал читать поток — апстрим тут ни при чем
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            self._semaphore.release()
+
+    async def astream(self, func: Callable[..., Any], *args) -> AsyncIterator[Any]:
+        """
+        Асинхронная версия stream для асинхронного SDK
+
+        func возвращает асинхронный итератор фрагментов. Ожидание фрагментов
+        не занимает поток, слот берется из лимита max_async_concurrency.
+
+        Raises:
+            CircuitOpenError: предохранитель разомкнут
+            LLMBusyError: не удалось дождаться свободного слота
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("YandexGPT временно недоступен")
+        semaphore = self._get_async_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.breaker.release_trial()
+            raise LLMBusyError("Превышен лимит параллельных запросов к YandexGPT")
+
+        try:
+            async for item in func(*args):
+                yield item
+        except (GeneratorExit, asyncio.CancelledError):
+            # Клиент перестал читать поток — апстрим тут ни при чем
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            semaphore.release()
+
+    async def _arun_once(self, coro_func: Callable[..., Any], args: tuple, timeout: float) -> Any:
+        semaphore = self._get_async_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusyError("Превышен лимит параллельных запросов к YandexGPT")
+        try:
+            return await asyncio.wait_for(coro_func(*args), timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"YandexGPT не ответил за {timeout}с")
+        finally:
+            semaphore.release()
+
+    def _get_async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.max_async_concurrency)
+        return semaphore
+
+    def _call_once(self, func: Callable[..., Any], args: tuple, timeout: float) -> Any:
+        return self._wait(self._submit(func, args), timeout)
+
+    def _submit(self, func: Callable[..., Any], args: tuple) -> Future:
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            raise LLMBusyError("Превышен лимит параллельных запросов к YandexGPT")
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._semaphore.release()
+            raise
+        # Слот освобождается, только когда вызов действительно завершился,
+        # даже если мы перестали его ждать по дедлайну
+        future.add_done_callback(lambda _: self._semaphore.release())
+        return future
+
+    @staticmethod
+    def _wait(future: Future, timeout: float, remaining: Optional[float] = None) -> Any:
+        try:
+            return future.result(timeout=timeout if remaining is None else remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            raise LLMTimeoutError(f"YandexGPT не ответил за {timeout}с")
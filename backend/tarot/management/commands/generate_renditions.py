@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tarot.models import TarotCard
+from tarot.renditions import generate_renditions, get_rendition_formats
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии изображений карт (WebP/AVIF) в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Только карты колод проекта')
+        parser.add_argument('--deck', type=int, help='Только карты колоды')
+        parser.add_argument('--workers', type=int, help='Число процессов (по умолчанию TAROT_RENDITION_WORKERS)')
+        parser.add_argument('--force', action='store_true', help='Пересоздать актуальные копии')
+
+    def handle(self, *args, **options):
+        formats = get_rendition_formats()
+        if not formats:
+            raise CommandError('Нет доступных форматов копий: проверьте TAROT_RENDITION_FORMATS и сборку Pillow')
+
+        cards = TarotCard.objects.exclude(image='').exclude(image__isnull=True).select_related('deck')
+        if options['project']:
+            cards = cards.filter(deck__project_id=options['project'])
+        if options['deck']:
+            cards = cards.filter(deck_id=options['deck'])
+
+        self.stdout.write(f"🖼  Форматы: {', '.join(formats)}")
+        started = time.perf_counter()
+        stats = generate_renditions(cards, force=options['force'], workers=options['workers'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Карт: {stats.cards}, создано копий: {stats.created}, актуальных: {stats.skipped}, "
+            f"ошибок: {stats.failed} за {elapsed:.1f} с"
+        )
+        if stats.source_bytes:
+            self.stdout.write(
+                f"Оригиналы {stats.source_bytes / 1024:.0f} КБ → копии {stats.rendition_bytes / 1024:.0f} КБ"
+            )
+        if stats.failed:
+            raise CommandError(f'Не удалось создать {stats.failed} копий, подробности в логе')
+        self.stdout.write(self.style.SUCCESS('Готово'))
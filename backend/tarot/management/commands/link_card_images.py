@@ -0,0 +1,95 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from core.bulk import BulkCommand
+from tarot.card_data import get_deck_cards
+from tarot.models import TarotCard, TarotDeck
+from tarot.signals import catalog_bulk_changed
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def match_card_names(image_files):
+    """
+    Сопоставляет файлы изображений с названиями карт
+
+    Файл подходит, если его имя совпадает с эталонным из card_data
+    (например, 00-TheFool.png, Cups01.png) или с названием карты
+    (например, Шут.jpg) без учета расширения.
+
+    Returns:
+        Словарь {название карты: файл}; из нескольких файлов одной карты берется первый по имени
+    """
+    names_by_stem = {Path(card.image).stem: card.name for card in get_deck_cards()}
+    linked = {}
+    for image_file in sorted(image_files):
+        linked.setdefault(names_by_stem.get(image_file.stem, image_file.stem), image_file)
+    return linked
+
+
+class Command(BulkCommand):
+    help = 'Связывает файлы изображений с картами Таро пакетными UPDATE (bulk_update)'
+
+    default_batch_size = 1000
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--dir', help='Папка с изображениями (по умолчанию MEDIA_ROOT/tarot/cards)')
+        parser.add_argument('--project', type=int, help='Только карты колод проекта')
+        parser.add_argument('--missing-only', action='store_true', help='Не трогать карты, у которых уже есть изображение')
+
+    def handle(self, *args, **options):
+        media_root = Path(settings.MEDIA_ROOT)
+        images_dir = Path(options['dir']) if options['dir'] else media_root / 'tarot' / 'cards'
+        if not images_dir.is_dir():
+            raise CommandError(f'Папка {images_dir} не найдена')
+        try:
+            upload_prefix = images_dir.resolve().relative_to(media_root.resolve()).as_posix()
+        except ValueError:
+            raise CommandError(f'Папка {images_dir} должна находиться внутри MEDIA_ROOT ({media_root})')
+
+        image_files = [path for path in images_dir.iterdir() if path.suffix.lower() in IMAGE_EXTENSIONS]
+        linked = match_card_names(image_files)
+
+        project_cards = TarotCard.objects.all()
+        if options['project']:
+            project_cards = project_cards.filter(deck__project_id=options['project'])
+        known_names = set(project_cards.filter(name__in=linked.keys()).values_list('name', flat=True).distinct())
+        unmatched = sorted(image_file.name for name, image_file in linked.items() if name not in known_names)
+        self.stdout.write(f"📸 Изображений: {len(image_files)}, сопоставлено с картами: {len(known_names)}")
+
+        cards = project_cards.filter(name__in=known_names).only('id', 'name', 'image', 'deck')
+        if options['missing_only']:
+            cards = cards.filter(self.without_image())
+
+        changed = []
+        for card in cards.iterator(chunk_size=options['batch_size']):
+            image = f"{upload_prefix}/{linked[card.name].name}"
+            if card.image.name != image:
+                card.image = image
+                changed.append(card)
+
+        if not self.dry_run and changed:
+            with transaction.atomic():
+                TarotCard.objects.bulk_update(changed, ['image'], batch_size=options['batch_size'])
+            project_ids = set(TarotDeck.objects.filter(id__in={card.deck_id for card in changed})
+                              .values_list('project_id', flat=True))
+            catalog_bulk_changed.send(sender=self.__class__, project_ids=project_ids)
+
+        self.report('Карт связано', len(changed))
+        if unmatched:
+            self.stdout.write(f"❌ Не удалось сопоставить: {len(unmatched)} файлов")
+            for filename in unmatched[:10]:
+                self.stdout.write(f"  - {filename}")
+        self.stdout.write(f"Карт без изображений: {project_cards.filter(self.without_image()).count()}")
+        if changed and not self.dry_run:
+            self.stdout.write('Копии изображений создаст команда generate_renditions')
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    @staticmethod
+    def without_image():
+        return Q(image='') | Q(image__isnull=True)
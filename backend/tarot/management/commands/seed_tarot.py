@@ -0,0 +1,115 @@
+from django.core.management.base import CommandError
+from django.db import transaction
+
+from core.bulk import BulkCommand
+from projects.models import Project
+from tarot.card_data import get_deck_cards
+from tarot.models import TarotCard, TarotDeck, TarotSpread
+from tarot.signals import catalog_bulk_changed
+from tarot.spread_data import get_standard_spreads
+
+DEFAULT_DECK_NAME = 'Классическая колода Таро'
+DECK_DESCRIPTION = 'Стандартная колода из 78 карт'
+
+
+class Command(BulkCommand):
+    help = 'Создает колоду из 78 карт и стандартные расклады в проектах пакетными INSERT ... ON CONFLICT'
+
+    default_batch_size = 1000
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--project', type=int, action='append',
+                            help='ID проекта (можно указать несколько раз), по умолчанию все активные проекты')
+        parser.add_argument('--deck-name', default=DEFAULT_DECK_NAME, help='Название колоды')
+        parser.add_argument('--skip-cards', action='store_true', help='Не создавать колоду и карты')
+        parser.add_argument('--skip-spreads', action='store_true', help='Не создавать расклады')
+        parser.add_argument('--update', action='store_true',
+                            help='Перезаписать значения уже существующих карт и описания раскладов')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['project']:
+            projects = projects.filter(id__in=options['project'])
+        else:
+            projects = projects.filter(status='active')
+        project_ids = list(projects.values_list('id', flat=True))
+        if not project_ids:
+            raise CommandError('Нет проектов для наполнения')
+
+        with transaction.atomic():
+            if not options['skip_cards']:
+                self.seed_cards(project_ids, options)
+            if not options['skip_spreads']:
+                self.seed_spreads(project_ids, options)
+
+        if not self.dry_run:
+            catalog_bulk_changed.send(sender=self.__class__, project_ids=project_ids)
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def seed_cards(self, project_ids, options):
+        deck_name = options['deck_name']
+        decks = self.get_decks(project_ids, deck_name)
+        missing_decks = [project_id for project_id in project_ids if project_id not in decks]
+
+        cards = get_deck_cards()
+        existing = set(TarotCard.objects.filter(deck_id__in=decks.values()).values_list('deck_id', 'name'))
+        created = sum(1 for project_id in project_ids for card in cards
+                      if (decks.get(project_id), card.name) not in existing)
+        updated = len(project_ids) * len(cards) - created if options['update'] else 0
+
+        if not self.dry_run:
+            TarotDeck.objects.bulk_create(
+                [TarotDeck(project_id=project_id, name=deck_name, description=DECK_DESCRIPTION)
+                 for project_id in missing_decks],
+                batch_size=options['batch_size'], ignore_conflicts=True
+            )
+            if missing_decks:
+                decks = self.get_decks(project_ids, deck_name)
+            TarotCard.objects.bulk_create(
+                [TarotCard(deck_id=decks[project_id], name=card.name, meaning_upright=card.meaning_upright,
+                           meaning_reversed=card.meaning_reversed, order=order)
+                 for project_id in project_ids for order, card in enumerate(cards)],
+                batch_size=options['batch_size'],
+                **self.conflict_options(options['update'], ['deck', 'name'],
+                                        ['meaning_upright', 'meaning_reversed', 'order'])
+            )
+
+        self.report('Колод создано', len(missing_decks))
+        self.report('Карт создано', created)
+        if options['update']:
+            self.report('Карт обновлено', updated)
+
+    def seed_spreads(self, project_ids, options):
+        spreads = get_standard_spreads()
+        existing = set(TarotSpread.objects.filter(
+            project_id__in=project_ids, name__in=[spread.name for spread in spreads]
+        ).values_list('project_id', 'name'))
+        created = sum(1 for project_id in project_ids for spread in spreads
+                      if (project_id, spread.name) not in existing)
+
+        if not self.dry_run:
+            TarotSpread.objects.bulk_create(
+                [TarotSpread(project_id=project_id, name=spread.name, description=spread.description,
+                             num_cards=spread.num_cards)
+                 for project_id in project_ids for spread in spreads],
+                batch_size=options['batch_size'],
+                **self.conflict_options(options['update'], ['project', 'name'],
+                                        ['description', 'num_cards', 'updated_at'])
+            )
+
+        self.report('Раскладов создано', created)
+        if options['update']:
+            self.report('Раскладов обновлено', len(project_ids) * len(spreads) - created)
+
+    @staticmethod
+    def get_decks(project_ids, deck_name):
+        return dict(TarotDeck.objects.filter(project_id__in=project_ids, name=deck_name)
+                    .values_list('project_id', 'id'))
+
+    @staticmethod
+    def conflict_options(update, unique_fields, update_fields):
+        """Параметры bulk_create: обновить существующие строки или пропустить их"""
+        if update:
+            return {'update_conflicts': True, 'unique_fields': unique_fields, 'update_fields': update_fields}
+        return {'ignore_conflicts': True}
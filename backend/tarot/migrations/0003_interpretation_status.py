@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tarot", "0002_interpretation_user_question"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="interpretation",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Ожидает интерпретации"),
+                    ("completed", "Готова"),
+                    ("failed", "Ошибка"),
+                ],
+                default="completed",
+                max_length=20,
+                verbose_name="Статус",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0003_interpretation_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(max_length=20, verbose_name='Размер')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('avif', 'AVIF')], max_length=10, verbose_name='Формат')),
+                ('image', models.ImageField(upload_to='tarot/renditions/', verbose_name='Изображение')),
+                ('width', models.PositiveIntegerField(default=0, verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(default=0, verbose_name='Высота')),
+                ('file_size', models.PositiveIntegerField(default=0, verbose_name='Размер файла, байт')),
+                ('source', models.CharField(max_length=255, verbose_name='Исходный файл')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='tarot.tarotcard', verbose_name='Карта')),
+            ],
+            options={
+                'verbose_name': 'Копия изображения карты',
+                'verbose_name_plural': 'Копии изображений карт',
+                'unique_together': {('card', 'size', 'format')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0004_card_rendition'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='interpretation',
+            index=models.Index(fields=['user', '-created_at'], name='tarot_interp_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interpretation',
+            index=models.Index(fields=['spread', '-created_at'], name='tarot_interp_spread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interpretation',
+            index=models.Index(fields=['-created_at'], name='tarot_interp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tarotcard',
+            index=models.Index(fields=['deck', 'order'], name='tarot_card_deck_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tarotspread',
+            index=models.Index(fields=['project', 'num_cards'], name='tarot_spread_project_cards_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def copy_cards_from_m2m(apps, schema_editor):
+    """Переносит карты из связи cards в card_ids; порядок — порядок записи связей, ориентация не сохранялась"""
+    Interpretation = apps.get_model('tarot', 'Interpretation')
+    Through = Interpretation.cards.through
+
+    batch = []
+    current_id, current_cards = None, []
+    rows = Through.objects.order_by('interpretation_id', 'id').values_list('interpretation_id', 'tarotcard_id')
+    for interpretation_id, card_id in rows.iterator(chunk_size=BATCH_SIZE):
+        if interpretation_id != current_id:
+            if current_id is not None:
+                batch.append(Interpretation(id=current_id, card_ids=current_cards))
+            current_id, current_cards = interpretation_id, []
+            if len(batch) >= BATCH_SIZE:
+                Interpretation.objects.bulk_update(batch, ['card_ids'])
+                batch = []
+        current_cards.append(card_id)
+    if current_id is not None:
+        batch.append(Interpretation(id=current_id, card_ids=current_cards))
+    if batch:
+        Interpretation.objects.bulk_update(batch, ['card_ids'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interpretation',
+            name='card_ids',
+            field=models.JSONField(blank=True, default=list, verbose_name='Карты расклада'),
+        ),
+        migrations.AddField(
+            model_name='interpretation',
+            name='reversed_mask',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Перевернутые карты (битовая маска)'),
+        ),
+        migrations.AlterField(
+            model_name='interpretation',
+            name='cards',
+            field=models.ManyToManyField(blank=True, to='tarot.tarotcard', verbose_name='Карты'),
+        ),
+        migrations.RunPython(copy_cards_from_m2m, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_project_llm_daily_token_budget'),
+        ('tarot', '0006_interpretation_card_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32, verbose_name='Модель')),
+                ('prompt_tokens', models.PositiveIntegerField(default=0, verbose_name='Токенов в запросе')),
+                ('completion_tokens', models.PositiveIntegerField(default=0, verbose_name='Токенов в ответе')),
+                ('latency_ms', models.PositiveIntegerField(default=0, verbose_name='Время ответа (мс)')),
+                ('fallback', models.BooleanField(default=False, verbose_name='Запасной ответ')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время вызова')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='llm_usage', to='projects.project', verbose_name='Проект')),
+            ],
+            options={
+                'verbose_name': 'Вызов LLM',
+                'verbose_name_plural': 'Вызовы LLM',
+                'indexes': [models.Index(fields=['project', 'created_at'], name='tarot_llm_usage_project_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0007_llmusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmusage',
+            name='cached',
+            field=models.BooleanField(default=False, verbose_name='Ответ из кэша'),
+        ),
+    ]
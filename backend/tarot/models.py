@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from projects.models import Project
 from users.models import UserProfile
 
@@ -30,10 +31,39 @@ class TarotCard(models.Model):
         verbose_name_plural = 'Карты Таро'
         unique_together = ('deck', 'name')
         ordering = ['deck', 'order']
+        indexes = [
+            # Карты колоды в порядке колоды (фильтр deck и сортировка по умолчанию)
+            models.Index(fields=['deck', 'order'], name='tarot_card_deck_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.deck.name})"
 
+class CardRendition(models.Model):
+    """Уменьшенная копия изображения карты в современном формате"""
+    FORMAT_CHOICES = [
+        ('webp', 'WebP'),
+        ('avif', 'AVIF'),
+    ]
+
+    card = models.ForeignKey(TarotCard, on_delete=models.CASCADE, related_name='renditions', verbose_name='Карта')
+    size = models.CharField('Размер', max_length=20)
+    format = models.CharField('Формат', max_length=10, choices=FORMAT_CHOICES)
+    image = models.ImageField('Изображение', upload_to='tarot/renditions/')
+    width = models.PositiveIntegerField('Ширина', default=0)
+    height = models.PositiveIntegerField('Высота', default=0)
+    file_size = models.PositiveIntegerField('Размер файла, байт', default=0)
+    source = models.CharField('Исходный файл', max_length=255)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Копия изображения карты'
+        verbose_name_plural = 'Копии изображений карт'
+        unique_together = ('card', 'size', 'format')
+
+    def __str__(self):
+        return f"{self.card.name} {self.size} {self.format} ({self.width}x{self.height})"
+
 class TarotSpread(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='spreads', verbose_name='Проект')
     name = models.CharField('Название расклада', max_length=255)
@@ -46,22 +76,71 @@ class TarotSpread(models.Model):
         verbose_name = 'Расклад Таро'
         verbose_name_plural = 'Расклады Таро'
         unique_together = ('project', 'name')
+        indexes = [
+            models.Index(fields=['project', 'num_cards'], name='tarot_spread_project_cards_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.project.name})"
 
 class Interpretation(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает интерпретации'),
+        ('completed', 'Готова'),
+        ('failed', 'Ошибка'),
+    ]
+
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='interpretations', verbose_name='Пользователь')
     spread = models.ForeignKey(TarotSpread, on_delete=models.CASCADE, related_name='interpretations', verbose_name='Расклад')
-    cards = models.ManyToManyField(TarotCard, verbose_name='Карты')
+    # Карты в порядке расклада; бит i маски означает, что i-я карта перевернута
+    card_ids = models.JSONField('Карты расклада', default=list, blank=True)
+    reversed_mask = models.PositiveBigIntegerField('Перевернутые карты (битовая маска)', default=0)
+    # Связь для совместимости: заполняется только при TAROT_WRITE_CARDS_M2M
+    cards = models.ManyToManyField(TarotCard, verbose_name='Карты', blank=True)
     ai_response = models.TextField('AI-ответ')
     user_question = models.TextField('Вопрос пользователя', blank=True, null=True)
+    status = models.CharField('Статус', max_length=20, choices=STATUS_CHOICES, default='completed')
     created_at = models.DateTimeField('Дата', auto_now_add=True)
 
     class Meta:
         verbose_name = 'Интерпретация'
         verbose_name_plural = 'Интерпретации'
         ordering = ['-created_at']
+        indexes = [
+            # История пользователя и выборки по раскладу — от новых к старым
+            models.Index(fields=['user', '-created_at'], name='tarot_interp_user_idx'),
+            models.Index(fields=['spread', '-created_at'], name='tarot_interp_spread_idx'),
+            models.Index(fields=['-created_at'], name='tarot_interp_created_idx'),
+        ]
 
     def __str__(self):
         return f"Интерпретация для {self.user} ({self.created_at:%Y-%m-%d %H:%M})"
+
+    @property
+    def reversed_flags(self):
+        """Ориентация карт расклада в порядке card_ids"""
+        return [bool(self.reversed_mask >> i & 1) for i in range(len(self.card_ids))]
+
+class LLMUsage(models.Model):
+    """Вызов языковой модели: только добавление, пишется пакетами через tarot.usage"""
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='llm_usage', verbose_name='Проект',
+                                null=True, blank=True)
+    model = models.CharField('Модель', max_length=32)
+    prompt_tokens = models.PositiveIntegerField('Токенов в запросе', default=0)
+    completion_tokens = models.PositiveIntegerField('Токенов в ответе', default=0)
+    latency_ms = models.PositiveIntegerField('Время ответа (мс)', default=0)
+    fallback = models.BooleanField('Запасной ответ', default=False)
+    cached = models.BooleanField('Ответ из кэша', default=False)
+    created_at = models.DateTimeField('Время вызова', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Вызов LLM'
+        verbose_name_plural = 'Вызовы LLM'
+        indexes = [
+            # Расход проекта за период
+            models.Index(fields=['project', 'created_at'], name='tarot_llm_usage_project_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.prompt_tokens}+{self.completion_tokens} ({self.created_at:%Y-%m-%d %H:%M})"
@@ -0,0 +1,102 @@
+import logging
+import random
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from users.models import UserProfile
+from users.services import BalanceService
+from .deck_index import deck_index
+from .models import Interpretation, TarotSpread
+
+logger = logging.getLogger(__name__)
+
+# Ориентация хранится в PositiveBigIntegerField, по биту на карту
+MAX_DRAW_CARDS = 63
+
+
+def encode_orientations(reversed_flags: Sequence[bool]) -> int:
+    """Упаковывает ориентацию карт в битовую маску: бит i — i-я карта перевернута"""
+    if len(reversed_flags) > MAX_DRAW_CARDS:
+        raise ValueError(f'В раскладе не может быть больше {MAX_DRAW_CARDS} карт')
+    return sum(1 << i for i, is_reversed in enumerate(reversed_flags) if is_reversed)
+
+
+def orient_cards(cards, reversed_flags: Optional[Sequence[bool]] = None) -> List[Dict[str, Any]]:
+    """
+    Готовит данные карт для AI
+
+    Ориентация берется из reversed_flags (сохраненный расклад) или
+    выбирается случайно для нового расклада.
+    """
+    cards_data = []
+    for i, card in enumerate(cards):
+        if reversed_flags is not None:
+            is_reversed = bool(reversed_flags[i]) if i < len(reversed_flags) else False
+        else:
+            is_reversed = random.choice([True, False])
+        cards_data.append({
+            'name': card.name,
+            'meaning': card.meaning_reversed if is_reversed else card.meaning_upright,
+            'is_reversed': is_reversed
+        })
+    return cards_data
+
+
+def get_interpretation_cards(interpretation: Interpretation, project_id: int) -> Tuple[list, List[bool]]:
+    """
+    Карты сохраненного расклада из индекса колод, без запросов к БД
+
+    Returns:
+        Кортеж (карты в порядке расклада, их ориентация). Удаленные из колоды
+        карты пропускаются вместе со своей ориентацией, так что пары карта —
+        ориентация не сдвигаются; пропуск пишется в лог
+    """
+    deck_cards = deck_index.get_card_map(project_id)
+    cards = []
+    reversed_flags = []
+    for card_id, is_reversed in zip(interpretation.card_ids, interpretation.reversed_flags):
+        card = deck_cards.get(card_id)
+        if card is None:
+            logger.warning(f"Карта {card_id} интерпретации {interpretation.id} удалена из колоды и пропущена")
+            continue
+        cards.append(card)
+        reversed_flags.append(is_reversed)
+    return cards, reversed_flags
+
+
+def create_paid_interpretation(user: UserProfile, spread: TarotSpread, cards, user_context: str = '',
+                               status: str = 'completed', cards_data: Optional[List[Dict[str, Any]]] = None,
+                               ai_response: str = '') -> Optional[Tuple[Interpretation, int]]:
+    """
+    Списывает расклад и создает интерпретацию в одной транзакции
+
+    ai_response сохраняется сразу, если ответ уже получен (например,
+    черновик подтверждается вместе с интерпретацией), иначе остается
+    пустым до генерации.
+
+    Карты и их ориентация (из cards_data) сохраняются в самой интерпретации,
+    поэтому запись расклада — это одна вставка.
+
+    Returns:
+        Кортеж (интерпретация, новый баланс) или None, если раскладов не хватило
+    """
+    reversed_flags = [card['is_reversed'] for card in cards_data] if cards_data else []
+    with transaction.atomic():
+        new_balance = BalanceService.debit(user.id)
+        if new_balance is None:
+            return None
+
+        interpretation = Interpretation.objects.create(
+            user=user,
+            spread=spread,
+            card_ids=[card.id for card in cards],
+            reversed_mask=encode_orientations(reversed_flags),
+            ai_response=ai_response,
+            user_question=user_context if user_context else None,
+            status=status
+        )
+        if settings.TAROT_WRITE_CARDS_M2M:
+            interpretation.cards.set([card.id for card in cards])
+    return interpretation, new_balance
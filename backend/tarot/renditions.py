@@ -0,0 +1,205 @@
+"""
+Копии изображений карт: уменьшенные WebP/AVIF вместо оригиналов
+
+Копии генерируются пулом процессов (команда generate_renditions или
+фоновая задача при загрузке карты) и хранятся в CardRendition вместе
+с размерами и весом файла. Индекс колод заранее вычисляет URL копий,
+поэтому ответы API не собирают их на каждый запрос.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Параметры кодирования по форматам
+ENCODER_OPTIONS = {
+    'webp': {'format': 'WEBP', 'method': 6},
+    'avif': {'format': 'AVIF', 'speed': 6},
+}
+
+
+class Variant(NamedTuple):
+    size: str
+    width: int
+    format: str
+
+
+class RenderedVariant(NamedTuple):
+    size: str
+    format: str
+    data: bytes
+    width: int
+    height: int
+
+
+class RenditionStats(NamedTuple):
+    cards: int
+    created: int
+    skipped: int
+    failed: int
+    source_bytes: int
+    rendition_bytes: int
+
+
+def get_rendition_formats() -> List[str]:
+    """Форматы из настроек, которые поддерживает установленный Pillow"""
+    formats = []
+    for fmt in settings.TAROT_RENDITION_FORMATS:
+        if fmt not in ENCODER_OPTIONS:
+            logger.warning(f"Неизвестный формат копий изображений: {fmt}")
+        elif not features.check(fmt):
+            logger.warning(f"Pillow собран без поддержки {fmt}, копии в этом формате не создаются")
+        else:
+            formats.append(fmt)
+    return formats
+
+
+def get_variants() -> List[Variant]:
+    return [
+        Variant(size, width, fmt)
+        for size, width in settings.TAROT_RENDITION_SIZES.items()
+        for fmt in get_rendition_formats()
+    ]
+
+
+def render_variants(data: bytes, variants: List[Variant], quality: int) -> List[RenderedVariant]:
+    """
+    Кодирует все копии одного изображения
+
+    Выполняется в дочернем процессе, поэтому работает только с байтами
+    и не обращается к Django. Изображение декодируется один раз, копии
+    не увеличивают оригинал.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    rendered = []
+    for variant in variants:
+        resized = image
+        if image.width > variant.width:
+            height = max(1, round(image.height * variant.width / image.width))
+            resized = image.resize((variant.width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, quality=quality, **ENCODER_OPTIONS[variant.format])
+        rendered.append(RenderedVariant(variant.size, variant.format, output.getvalue(), *resized.size))
+    return rendered
+
+
+def media_base_url(request) -> str:
+    """Схема и хост запроса; вычисляется один раз на ответ"""
+    if request is None:
+        return ''
+    return request.build_absolute_uri('/').rstrip('/')
+
+
+def absolute_media_url(url: str, base: str) -> str:
+    """Добавляет хост к относительному URL; абсолютные URL (MEDIA_URL на CDN) не меняются"""
+    if not url or '://' in url:
+        return url
+    return base + url
+
+
+def generate_renditions(cards: Iterable, force: bool = False, workers: Optional[int] = None) -> RenditionStats:
+    """
+    Создает недостающие и устаревшие копии изображений карт
+
+    Копия считается актуальной, если она сделана из текущего файла карты.
+    Кодирование идет в пуле процессов, чтение исходников и запись
+    результатов — в текущем процессе.
+
+    Args:
+        cards: Карты (TarotCard), для которых нужны копии
+        force: Пересоздать копии, даже если они актуальны
+        workers: Число процессов; None — из настроек, 1 — без пула
+    """
+    from .models import CardRendition
+
+    variants = get_variants()
+    cards = [card for card in cards if card.image]
+    existing = {
+        (rendition.card_id, rendition.size, rendition.format): rendition
+        for rendition in CardRendition.objects.filter(card__in=cards)
+    }
+
+    jobs: Dict[int, Tuple[object, List[Variant]]] = {}
+    skipped = 0
+    for card in cards:
+        pending = [
+            variant for variant in variants
+            if force or getattr(existing.get((card.id, variant.size, variant.format)), 'source', None) != card.image.name
+        ]
+        skipped += len(variants) - len(pending)
+        if pending:
+            jobs[card.id] = (card, pending)
+
+    created = failed = source_bytes = rendition_bytes = 0
+    for card, rendered in _render_jobs(jobs, workers):
+        if rendered is None:
+            failed += len(jobs[card.id][1])
+            continue
+        source_bytes += card.image.size
+        for result in rendered:
+            _save_rendition(card, result, existing.get((card.id, result.size, result.format)))
+            rendition_bytes += len(result.data)
+            created += 1
+
+    return RenditionStats(len(cards), created, skipped, failed, source_bytes, rendition_bytes)
+
+
+def _render_jobs(jobs, workers: Optional[int]):
+    """Выдает пары (карта, копии); копии равны None, если изображение не удалось обработать"""
+    quality = settings.TAROT_RENDITION_QUALITY
+    workers = workers or settings.TAROT_RENDITION_WORKERS or os.cpu_count() or 1
+
+    if workers == 1 or len(jobs) <= 1:
+        for card, variants in jobs.values():
+            try:
+                yield card, render_variants(_read_source(card), variants, quality)
+            except Exception as e:
+                logger.error(f"Не удалось создать копии изображения карты {card.id}: {e}")
+                yield card, None
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = {
+            executor.submit(render_variants, _read_source(card), variants, quality): card
+            for card, variants in jobs.values()
+        }
+        for future in as_completed(futures):
+            card = futures[future]
+            try:
+                yield card, future.result()
+            except Exception as e:
+                logger.error(f"Не удалось создать копии изображения карты {card.id}: {e}")
+                yield card, None
+
+
+def _read_source(card) -> bytes:
+    with card.image.open('rb') as source:
+        return source.read()
+
+
+def _save_rendition(card, result: RenderedVariant, rendition=None) -> None:
+    from .models import CardRendition
+
+    if rendition is None:
+        rendition = CardRendition(card=card, size=result.size, format=result.format)
+    elif rendition.image:
+        rendition.image.delete(save=False)
+
+    stem = os.path.splitext(os.path.basename(card.image.name))[0]
+    rendition.image.save(f'{stem}_{result.size}.{result.format}', ContentFile(result.data), save=False)
+    rendition.width = result.width
+    rendition.height = result.height
+    rendition.file_size = len(result.data)
+    rendition.source = card.image.name
+    rendition.save()
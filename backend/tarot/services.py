@@ -1,12 +1,21 @@
+import asyncio
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any
+import random
+import time
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.cache import cache
 
+from core.metrics import record_cache, record_llm_call
+from .llm_client import LLMClient, CircuitBreaker, CircuitOpenError
+from .usage import estimate_tokens, llm_usage_writer, token_budget
+
 # Импортируем официальный SDK
 try:
-    from yandex_cloud_ml_sdk import YCloudML
+    from yandex_cloud_ml_sdk import YCloudML, AsyncYCloudML
     YANDEX_SDK_AVAILABLE = True
 except ImportError:
     YANDEX_SDK_AVAILABLE = False
@@ -14,14 +23,119 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+class PromptResponseCache:
+    """
+    Кэш ответов YandexGPT по нормализованному промпту
+
+    Для каждого промпта хранится пул из нескольких вариантов ответа:
+    пока пул не заполнен, запросы уходят в модель и пополняют его,
+    после этого ответ выбирается из пула случайно, чтобы пользователи
+    с одинаковыми раскладами получали разные тексты. Каждый вариант
+    лежит в своем слоте и записывается через cache.add, поэтому
+    параллельные запросы не затирают ответы друг друга.
+
+    Кэшируются только промпты без вопроса пользователя — это решает
+    YandexGPTService: вопрос делает ключ одноразовым и не должен
+    храниться в кэше.
+    """
+
+    KEY_PREFIX = 'tarot:yandexgpt:response'
+    STATS_KEY = 'tarot:yandexgpt:response:stats:{name}'
+
+    def __init__(self, enabled: bool = False, ttl: int = 86400, pool_size: int = 5):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.pool_size = max(pool_size, 1)
+
+    @classmethod
+    def make_key(cls, prompt: str) -> str:
+        """Строит ключ кэша из промпта без учета регистра и пробельных символов"""
+        normalized = ' '.join(prompt.split()).lower()
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return f"{cls.KEY_PREFIX}:{digest}"
+
+    def slot_keys(self, prompt: str) -> List[str]:
+        key = self.make_key(prompt)
+        return [f"{key}:{slot}" for slot in range(self.pool_size)]
+
+    def get(self, prompt: str) -> Optional[str]:
+        """Возвращает ответ из заполненного пула или None, если нужен запрос к модели"""
+        if not self.enabled:
+            return None
+
+        pool = list(cache.get_many(self.slot_keys(prompt)).values())
+        if len(pool) < self.pool_size:
+            self._incr('misses')
+            record_cache('yandexgpt_response', False)
+            return None
+
+        self._incr('hits')
+        record_cache('yandexgpt_response', True)
+        return random.choice(pool)
+
+    def add(self, prompt: str, response: str) -> None:
+        """Добавляет ответ модели в пул вариантов для промпта"""
+        if not self.enabled or not response:
+            return
+
+        keys = self.slot_keys(prompt)
+        pool = cache.get_many(keys)
+        if response in pool.values():
+            return
+        for key in keys:
+            # Слот, занятый параллельным запросом, пропускаем и пробуем следующий
+            if key not in pool and cache.add(key, response, timeout=self.ttl):
+                return
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики попаданий и промахов кэша"""
+        hits = cache.get(self.STATS_KEY.format(name='hits'), 0)
+        misses = cache.get(self.STATS_KEY.format(name='misses'), 0)
+        total = hits + misses
+        return {
+            'enabled': self.enabled,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None,
+        }
+
+    def _incr(self, name: str) -> None:
+        key = self.STATS_KEY.format(name=name)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
 class YandexGPTService:
     """Сервис для работы с YandexGPT Lite через официальный SDK"""
     
+    MODEL_NAME = 'yandexgpt-lite'
+    
     def __init__(self):
         self.api_key = getattr(settings, 'YANDEX_API_KEY', None)
         self.folder_id = getattr(settings, 'YANDEX_FOLDER_ID', None)
         self.sdk = None
         self.model = None
+        # Модель асинхронного SDK для вызовов из асинхронных представлений
+        self.async_model = None
+        self.response_cache = PromptResponseCache(
+            enabled=getattr(settings, 'YANDEX_GPT_RESPONSE_CACHE_ENABLED', False),
+            ttl=getattr(settings, 'YANDEX_GPT_RESPONSE_CACHE_TTL', 86400),
+            pool_size=getattr(settings, 'YANDEX_GPT_RESPONSE_CACHE_VARIANTS', 5)
+        )
+        self.client = LLMClient(
+            max_concurrency=getattr(settings, 'YANDEX_GPT_MAX_CONCURRENCY', 4),
+            timeout=getattr(settings, 'YANDEX_GPT_TIMEOUT', 30),
+            max_retries=getattr(settings, 'YANDEX_GPT_MAX_RETRIES', 2),
+            queue_timeout=getattr(settings, 'YANDEX_GPT_QUEUE_TIMEOUT', 10),
+            breaker=CircuitBreaker(
+                failure_threshold=getattr(settings, 'YANDEX_GPT_BREAKER_THRESHOLD', 5),
+                reset_timeout=getattr(settings, 'YANDEX_GPT_BREAKER_RESET_TIMEOUT', 30)
+            ),
+            max_async_concurrency=getattr(settings, 'YANDEX_GPT_ASYNC_MAX_CONCURRENCY', 100)
+        )
         
         if not self.api_key or not self.folder_id:
             logger.warning("YandexGPT не настроен: отсутствуют API_KEY или FOLDER_ID")
@@ -35,19 +149,25 @@ class YandexGPTService:
             # Инициализируем SDK
             self.sdk = YCloudML(folder_id=self.folder_id, auth=self.api_key)
             # Получаем модель
-            self.model = self.sdk.models.completions('yandexgpt-lite')
+            self.model = self.sdk.models.completions(self.MODEL_NAME)
             # Настраиваем параметры по умолчанию
             self.model = self.model.configure(
                 temperature=0.7,
                 max_tokens=1000
             )
+            # Та же модель в асинхронном SDK
+            self.async_model = AsyncYCloudML(folder_id=self.folder_id, auth=self.api_key).models.completions(
+                self.MODEL_NAME
+            ).configure(temperature=0.7, max_tokens=1000)
             logger.info("YandexGPT SDK успешно инициализирован")
         except Exception as e:
             logger.error(f"Ошибка инициализации YandexGPT SDK: {e}")
             self.sdk = None
             self.model = None
+            self.async_model = None
     
-    def generate_interpretation(self, spread_name: str, cards: List[Dict], user_context: str = "") -> str:
+    def generate_interpretation(self, spread_name: str, cards: List[Dict], user_context: str = "",
+                                project_id: Optional[int] = None) -> str:
         """
         Генерирует интерпретацию расклада с помощью YandexGPT Lite
         
@@ -55,36 +175,310 @@ class YandexGPTService:
             spread_name: Название расклада
             cards: Список карт с их значениями
             user_context: Дополнительный контекст от пользователя (опционально)
+            project_id: Проект, на который записывается расход токенов (опционально)
         
         Returns:
             Строка с интерпретацией
         """
         if not self.model:
             logger.warning("YandexGPT модель недоступна, используем fallback")
-            return self._get_fallback_interpretation(spread_name, cards)
+            return self._fallback(spread_name, cards, project_id)
         
+        use_cache = self._cacheable(user_context)
+        started = None
         try:
             # Формируем промпт для AI
             prompt = self._build_prompt(spread_name, cards, user_context)
             
-            # Отправляем запрос к YandexGPT через SDK
-            result = self.model.run(prompt)
+            # Проект сверх дневного бюджета не занимает общую очередь вызовов модели
+            # и не получает ответы из кэша
+            if token_budget.exceeded(project_id):
+                logger.info(f"Проект {project_id} исчерпал дневной бюджет токенов, используем fallback")
+                return self._fallback(spread_name, cards, project_id)
             
-            if result:
-                # Получаем текст из первого альтернативного ответа
-                for alternative in result:
-                    if hasattr(alternative, 'text') and alternative.text:
-                        return alternative.text.strip()
-                
-                logger.warning("Получен пустой ответ от YandexGPT")
-                return self._get_fallback_interpretation(spread_name, cards)
-            else:
-                logger.error("Не удалось получить ответ от YandexGPT")
-                return self._get_fallback_interpretation(spread_name, cards)
+            # Проверяем кэш ответов по промпту
+            cached_response = self.response_cache.get(prompt) if use_cache else None
+            if cached_response:
+                return self._cached(project_id, prompt, cached_response)
+            
+            # Отправляем запрос к YandexGPT через клиент с дедлайном и повторами
+            started = time.perf_counter()
+            result = self.client.call(self.model.run, prompt)
+            return self._complete(spread_name, cards, project_id, prompt, started, result, use_cache)
                 
+        except CircuitOpenError:
+            logger.warning("YandexGPT временно недоступен, используем fallback")
+            return self._fallback(spread_name, cards, project_id, started, error='circuit_open')
         except Exception as e:
             logger.error(f"Ошибка при генерации интерпретации: {e}")
-            return self._get_fallback_interpretation(spread_name, cards)
+            return self._fallback(spread_name, cards, project_id, started, error='error')
+    
+    async def agenerate_interpretation(self, spread_name: str, cards: List[Dict], user_context: str = "",
+                                       project_id: Optional[int] = None) -> str:
+        """
+        Асинхронная версия generate_interpretation, не блокирующая цикл событий
+        
+        Через асинхронный SDK ожидание ответа не занимает поток; если он
+        недоступен, синхронная генерация выполняется в отдельном потоке.
+        """
+        if self.async_model is None or self.model is None:
+            return await asyncio.to_thread(self.generate_interpretation, spread_name, cards, user_context, project_id)
+        
+        use_cache = self._cacheable(user_context)
+        started = None
+        try:
+            prompt = self._build_prompt(spread_name, cards, user_context)
+            
+            # Бюджет берется из снимка справочников проекта, который может читаться из БД
+            if await sync_to_async(token_budget.exceeded)(project_id):
+                logger.info(f"Проект {project_id} исчерпал дневной бюджет токенов, используем fallback")
+                return self._fallback(spread_name, cards, project_id)
+            
+            cached_response = self.response_cache.get(prompt) if use_cache else None
+            if cached_response:
+                return self._cached(project_id, prompt, cached_response)
+            
+            started = time.perf_counter()
+            result = await self.client.arun(self.async_model.run, prompt)
+            return self._complete(spread_name, cards, project_id, prompt, started, result, use_cache)
+        except CircuitOpenError:
+            logger.warning("YandexGPT временно недоступен, используем fallback")
+            return self._fallback(spread_name, cards, project_id, started, error='circuit_open')
+        except Exception as e:
+            logger.error(f"Ошибка при генерации интерпретации: {e}")
+            return self._fallback(spread_name, cards, project_id, started, error='error')
+    
+    def stream_interpretation(self, spread_name: str, cards: List[Dict], user_context: str = "",
+                              project_id: Optional[int] = None) -> Iterator[str]:
+        """
+        Генерирует интерпретацию потоком: отдает новые фрагменты текста по мере поступления
+        
+        Если модель недоступна или упала до первого фрагмента, отдает
+        запасную интерпретацию одним фрагментом. Ответ из кэша тоже
+        отдается целиком.
+        """
+        if not self.model:
+            logger.warning("YandexGPT модель недоступна, используем fallback")
+            yield self._fallback(spread_name, cards, project_id)
+            return
+        
+        run_stream = getattr(self.model, 'run_stream', None)
+        if run_stream is None:
+            yield self.generate_interpretation(spread_name, cards, user_context, project_id)
+            return
+        
+        use_cache = self._cacheable(user_context)
+        prompt = self._build_prompt(spread_name, cards, user_context)
+        if token_budget.exceeded(project_id):
+            logger.info(f"Проект {project_id} исчерпал дневной бюджет токенов, используем fallback")
+            yield self._fallback(spread_name, cards, project_id)
+            return
+        
+        cached_response = self.response_cache.get(prompt) if use_cache else None
+        if cached_response:
+            yield self._cached(project_id, prompt, cached_response)
+            return
+        
+        text = ''
+        result = None
+        completed = False
+        error = 'empty'
+        started = time.perf_counter()
+        try:
+            for result in self.client.stream(run_stream, prompt):
+                text, delta = self._stream_delta(text, result)
+                if delta:
+                    yield delta
+            completed = True
+        except CircuitOpenError:
+            logger.warning("YandexGPT временно недоступен, используем fallback")
+            error = 'circuit_open'
+        except Exception as e:
+            logger.error(f"Ошибка при потоковой генерации интерпретации: {e}")
+            error = 'error'
+        finally:
+            # Прерванный поток (ошибка модели или отключение клиента) тоже стоил токенов:
+            # учитываем уже полученный текст
+            if text:
+                self._record_usage(project_id, started, prompt, text, result)
+        
+        if not text:
+            yield self._fallback(spread_name, cards, project_id, started, error=error)
+            return
+        if completed and use_cache:
+            self.response_cache.add(prompt, text.strip())
+    
+    async def astream_interpretation(self, spread_name: str, cards: List[Dict], user_context: str = "",
+                                     project_id: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Асинхронная версия stream_interpretation для ответов под ASGI
+        
+        Фрагменты читаются из асинхронного SDK, поэтому ожидание модели не
+        занимает поток. Без асинхронного SDK интерпретация генерируется
+        в отдельном потоке и отдается одним фрагментом.
+        """
+        run_stream = getattr(self.async_model, 'run_stream', None)
+        if self.model is None or run_stream is None:
+            yield await asyncio.to_thread(self.generate_interpretation, spread_name, cards, user_context, project_id)
+            return
+        
+        use_cache = self._cacheable(user_context)
+        prompt = self._build_prompt(spread_name, cards, user_context)
+        if await sync_to_async(token_budget.exceeded)(project_id):
+            logger.info(f"Проект {project_id} исчерпал дневной бюджет токенов, используем fallback")
+            yield self._fallback(spread_name, cards, project_id)
+            return
+        
+        cached_response = self.response_cache.get(prompt) if use_cache else None
+        if cached_response:
+            yield self._cached(project_id, prompt, cached_response)
+            return
+        
+        text = ''
+        result = None
+        completed = False
+        error = 'empty'
+        started = time.perf_counter()
+        try:
+            async for result in self.client.astream(run_stream, prompt):
+                text, delta = self._stream_delta(text, result)
+                if delta:
+                    yield delta
+            completed = True
+        except CircuitOpenError:
+            logger.warning("YandexGPT временно недоступен, используем fallback")
+            error = 'circuit_open'
+        except Exception as e:
+            logger.error(f"Ошибка при потоковой генерации интерпретации: {e}")
+            error = 'error'
+        finally:
+            # Отключение клиента закрывает генератор, но полученные токены учитываются
+            if text:
+                self._record_usage(project_id, started, prompt, text, result)
+        
+        if not text:
+            yield self._fallback(spread_name, cards, project_id, started, error=error)
+            return
+        if completed and use_cache:
+            self.response_cache.add(prompt, text.strip())
+    
+    @staticmethod
+    def _stream_delta(text: str, result) -> Tuple[str, str]:
+        """Накопленный текст и новый фрагмент после очередного ответа потока"""
+        # Каждый фрагмент содержит весь накопленный текст первой альтернативы
+        alternative = next(iter(result), None)
+        current = getattr(alternative, 'text', '') or ''
+        if current.startswith(text):
+            return current, current[len(text):]
+        return text + current, current
+    
+    def generate_many(self, readings: List[Dict[str, Any]]) -> List[str]:
+        """
+        Генерирует интерпретации для пачки раскладов параллельно
+        
+        Args:
+            readings: Список словарей с ключами spread_name, cards, user_context
+                и project_id (последние два необязательны)
+        
+        Returns:
+            Список интерпретаций в том же порядке, что и readings
+        """
+        if not self.model:
+            return [self.generate_interpretation(reading['spread_name'], reading['cards'],
+                                                 reading.get('user_context', ''), reading.get('project_id'))
+                    for reading in readings]
+        
+        # Промпты, кэш и бюджет проверяются в текущем потоке, в пул клиента уходят только вызовы модели
+        results: List[Optional[str]] = [None] * len(readings)
+        pending = []
+        for index, reading in enumerate(readings):
+            spread_name, cards = reading['spread_name'], reading['cards']
+            user_context, project_id = reading.get('user_context', ''), reading.get('project_id')
+            prompt = self._build_prompt(spread_name, cards, user_context)
+            if token_budget.exceeded(project_id):
+                logger.info(f"Проект {project_id} исчерпал дневной бюджет токенов, используем fallback")
+                results[index] = self._fallback(spread_name, cards, project_id)
+                continue
+            cached_response = self.response_cache.get(prompt) if self._cacheable(user_context) else None
+            if cached_response:
+                results[index] = self._cached(project_id, prompt, cached_response)
+            else:
+                pending.append((index, prompt))
+        
+        started = time.perf_counter()
+        outcomes = self.client.call_many(self.model.run, [(prompt,) for _, prompt in pending])
+        for (index, prompt), outcome in zip(pending, outcomes):
+            reading = readings[index]
+            spread_name, cards, project_id = reading['spread_name'], reading['cards'], reading.get('project_id')
+            if isinstance(outcome, CircuitOpenError):
+                results[index] = self._fallback(spread_name, cards, project_id, started, error='circuit_open')
+            elif isinstance(outcome, Exception):
+                logger.error(f"Ошибка при генерации интерпретации: {outcome}")
+                results[index] = self._fallback(spread_name, cards, project_id, started, error='error')
+            else:
+                results[index] = self._complete(spread_name, cards, project_id, prompt, started, outcome,
+                                                self._cacheable(reading.get('user_context', '')))
+        return results
+    
+    def _complete(self, spread_name: str, cards: List[Dict], project_id: Optional[int], prompt: str,
+                  started: float, result, use_cache: bool) -> str:
+        """Текст первой альтернативы ответа с учетом вызова или запасной текст, если ответ пустой"""
+        for alternative in result or []:
+            if getattr(alternative, 'text', None):
+                text = alternative.text.strip()
+                self._record_usage(project_id, started, prompt, text, result)
+                if use_cache:
+                    self.response_cache.add(prompt, text)
+                return text
+        
+        logger.warning("Получен пустой ответ от YandexGPT")
+        return self._fallback(spread_name, cards, project_id, started, error='empty')
+    
+    @staticmethod
+    def _cacheable(user_context: str) -> bool:
+        """Ответ кэшируется, только если в раскладе нет вопроса пользователя"""
+        return not (user_context or '').strip()
+    
+    def _record_usage(self, project_id: Optional[int], started: float, prompt: str, text: str, result=None) -> None:
+        """Учитывает успешный вызов модели в журнале и в дневном бюджете проекта"""
+        usage = getattr(result, 'usage', None)
+        prompt_tokens = int(getattr(usage, 'input_text_tokens', 0) or estimate_tokens(prompt))
+        completion_tokens = int(getattr(usage, 'completion_tokens', 0) or estimate_tokens(text))
+        token_budget.consume(project_id, prompt_tokens + completion_tokens)
+        duration = time.perf_counter() - started
+        llm_usage_writer.record(project_id, self.MODEL_NAME, prompt_tokens, completion_tokens,
+                                latency_ms=duration * 1000)
+        record_llm_call(fallback=False, duration=duration)
+    
+    def _cached(self, project_id: Optional[int], prompt: str, text: str) -> str:
+        """
+        Ответ из кэша с записью в журнал вызовов
+
+        Кэш экономит вызов модели, но расклад проекта все равно учитывается
+        в дневном бюджете по оценке токенов промпта и ответа.
+        """
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        token_budget.consume(project_id, prompt_tokens + completion_tokens)
+        llm_usage_writer.record(project_id, self.MODEL_NAME, prompt_tokens, completion_tokens, cached=True)
+        record_llm_call(fallback=False, cached=True)
+        return text
+    
+    def _fallback(self, spread_name: str, cards: List[Dict], project_id: Optional[int] = None,
+                  started: Optional[float] = None, error: str = '') -> str:
+        """
+        Запасная интерпретация с записью в журнал вызовов (токены не расходуются)
+
+        error — причина неудачного вызова модели для метрик (error, empty,
+        circuit_open); пустая, если модель не вызывалась.
+        """
+        duration = time.perf_counter() - started if started is not None else None
+        llm_usage_writer.record(project_id, self.MODEL_NAME, latency_ms=(duration or 0) * 1000, fallback=True)
+        record_llm_call(fallback=True, duration=duration, error=error)
+        return self._get_fallback_interpretation(spread_name, cards)
+    
+    def is_available(self) -> bool:
+        """Проверяет, будут ли запросы отправлены в модель, а не в fallback"""
+        return self.model is not None and self.client.breaker.state != CircuitBreaker.OPEN
     
     def _build_prompt(self, spread_name: str, cards: List[Dict], user_context: str) -> str:
         """Строит промпт для YandexGPT"""
@@ -164,11 +558,14 @@ class YandexGPTService:
         
         try:
             test_prompt = "Привет! Это тестовое сообщение. Ответь одним словом: 'Работает'"
-            result = self.model.run(test_prompt)
+            started = time.perf_counter()
+            result = self.client.call(self.model.run, test_prompt, retries=0)
             
             if result:
                 for alternative in result:
                     if hasattr(alternative, 'text') and alternative.text:
+                        # Проверка не относится к проекту и не расходует его бюджет
+                        self._record_usage(None, started, test_prompt, alternative.text, result)
                         return "работает" in alternative.text.lower()
             
             return False
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .deck_index import deck_index
+from .models import TarotDeck, TarotCard, CardRendition
+
+# bulk_create и bulk_update не отправляют post_save, поэтому массовые команды
+# сообщают об изменении колод, карт и раскладов этим сигналом (аргумент project_ids)
+catalog_bulk_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=TarotDeck)
+def invalidate_deck_index_for_deck(sender, instance, **kwargs):
+    """Сбрасываем индекс карт проекта при изменении колоды"""
+    deck_index.invalidate(instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=TarotCard)
+def invalidate_deck_index_for_card(sender, instance, **kwargs):
+    """Сбрасываем индекс карт проекта при изменении карты"""
+    try:
+        project_id = instance.deck.project_id
+    except TarotDeck.DoesNotExist:
+        # Колода уже удалена — её собственный сигнал сбросит индекс
+        return
+    deck_index.invalidate(project_id)
+
+
+@receiver(catalog_bulk_changed)
+def invalidate_deck_index_for_bulk_change(sender, project_ids, **kwargs):
+    """Сбрасываем индексы карт проектов после массового изменения"""
+    for project_id in project_ids:
+        deck_index.invalidate(project_id)
+
+
+@receiver([post_save, post_delete], sender=CardRendition)
+def invalidate_deck_index_for_rendition(sender, instance, **kwargs):
+    """Сбрасываем индекс карт проекта, чтобы подхватить новые URL копий изображений"""
+    try:
+        project_id = instance.card.deck.project_id
+    except (TarotCard.DoesNotExist, TarotDeck.DoesNotExist):
+        return
+    deck_index.invalidate(project_id)
+
+
+@receiver(post_delete, sender=CardRendition)
+def delete_rendition_file(sender, instance, **kwargs):
+    """Удаляем файл копии вместе с записью"""
+    if instance.image:
+        instance.image.delete(save=False)
+
+
+@receiver(post_save, sender=TarotCard)
+def schedule_card_renditions(sender, instance, **kwargs):
+    """Ставим генерацию копий изображения в очередь после загрузки карты"""
+    if not settings.TAROT_RENDITIONS_ON_UPLOAD or not instance.image:
+        return
+    from .tasks import generate_card_renditions_task
+
+    # Актуальные копии задача пропустит сама
+    transaction.on_commit(lambda: generate_card_renditions_task.delay(instance.id))
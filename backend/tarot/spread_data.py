@@ -0,0 +1,48 @@
+"""
+Стандартные расклады, которые получает каждый проект
+
+Используются командой seed_tarot. Названия раскладов уникальны
+в пределах проекта, по ним команда находит уже созданные расклады.
+"""
+from typing import List, NamedTuple
+
+
+class SpreadData(NamedTuple):
+    name: str
+    description: str
+    num_cards: int
+
+
+STANDARD_SPREADS = [
+    SpreadData("Карта дня",
+               "Ежедневное предсказание на основе одной карты. Помогает понять энергетику дня "
+               "и получить совет на текущий период.", 1),
+    SpreadData("Расклад одной карты", "Простое гадание на одну карту", 1),
+    SpreadData("Расклад трех карт", "Прошлое, настоящее, будущее", 3),
+    SpreadData("Кельтский крест", "Классический расклад из 10 карт", 10),
+    SpreadData("Расклад любви",
+               "Гадание на любовь и отношения. 7 карт раскрывают прошлое, настоящее и будущее ваших чувств.", 7),
+    SpreadData("Расклад карьеры",
+               "Профессиональное гадание. 5 карт покажут ваш карьерный путь и возможности роста.", 5),
+    SpreadData("Расклад здоровья",
+               "Гадание на здоровье и благополучие. 4 карты раскроют состояние вашего здоровья.", 4),
+    SpreadData("Расклад денег",
+               "Финансовое гадание. 6 карт покажут ваше финансовое будущее и возможности.", 6),
+    SpreadData("Расклад путешествий",
+               "Гадание на путешествия и поездки. 3 карты предскажут ваши будущие путешествия.", 3),
+    SpreadData("Расклад семьи",
+               "Семейное гадание. 8 карт раскроют отношения в семье и семейные события.", 8),
+    SpreadData("Расклад дружбы",
+               "Гадание на дружбу и социальные связи. 4 карты покажут ваши отношения с друзьями.", 4),
+    SpreadData("Расклад духовного роста",
+               "Гадание на духовное развитие. 9 карт покажут ваш духовный путь и возможности роста.", 9),
+    SpreadData("Расклад принятия решений",
+               "Гадание для принятия важных решений. 5 карт помогут выбрать правильный путь.", 5),
+    SpreadData("Расклад прошлых жизней",
+               "Кармическое гадание. 6 карт раскроют тайны ваших прошлых воплощений.", 6),
+]
+
+
+def get_standard_spreads() -> List[SpreadData]:
+    """Возвращает стандартные расклады в порядке показа"""
+    return list(STANDARD_SPREADS)
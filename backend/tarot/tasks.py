@@ -0,0 +1,94 @@
+import logging
+from typing import List, Dict, Optional
+
+from core.celery import app
+
+from .models import Interpretation, TarotCard
+from .services import yandex_gpt_service
+from .health import yandex_gpt_probe
+from .renditions import generate_renditions
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(ignore_result=True)
+def generate_interpretation_task(interpretation_id: int, spread_name: str,
+                                 cards: List[Dict], user_context: str = '', project_id: Optional[int] = None) -> None:
+    """
+    Генерирует AI-ответ для интерпретации в фоне
+
+    Повторно доставленное или продублированное сообщение не перезаписывает
+    готовый ответ: генерация выполняется только для интерпретации в статусе
+    pending, а результат записывается, только если статус не изменился.
+
+    Args:
+        interpretation_id: ID интерпретации со статусом pending
+        spread_name: Название расклада
+        cards: Список карт с их значениями и ориентацией
+        user_context: Дополнительный контекст от пользователя
+        project_id: Проект, на который записывается расход токенов
+    """
+    if not Interpretation.objects.filter(id=interpretation_id, status='pending').exists():
+        logger.info(f"Интерпретация {interpretation_id} уже обработана, повторная генерация пропущена")
+        return
+
+    try:
+        ai_response = yandex_gpt_service.generate_interpretation(
+            spread_name=spread_name,
+            cards=cards,
+            user_context=user_context,
+            project_id=project_id
+        )
+    except Exception as e:
+        logger.error(f"Ошибка фоновой генерации интерпретации {interpretation_id}: {e}")
+        Interpretation.objects.filter(id=interpretation_id, status='pending').update(status='failed')
+        return
+
+    Interpretation.objects.filter(id=interpretation_id, status='pending').update(
+        ai_response=ai_response,
+        status='completed'
+    )
+
+
+@app.task(ignore_result=True)
+def generate_interpretations_batch_task(readings: List[Dict]) -> None:
+    """
+    Генерирует AI-ответы для пачки интерпретаций параллельно
+
+    Интерпретации, которые уже не в статусе pending, пропускаются.
+
+    Args:
+        readings: Список словарей с ключами interpretation_id, spread_name,
+            cards, user_context и project_id
+    """
+    pending = set(Interpretation.objects.filter(
+        id__in=[reading['interpretation_id'] for reading in readings], status='pending'
+    ).values_list('id', flat=True))
+    readings = [reading for reading in readings if reading['interpretation_id'] in pending]
+    if not readings:
+        return
+
+    responses = yandex_gpt_service.generate_many(readings)
+    for reading, ai_response in zip(readings, responses):
+        Interpretation.objects.filter(id=reading['interpretation_id'], status='pending').update(
+            ai_response=ai_response, status='completed'
+        )
+
+
+@app.task(ignore_result=True)
+def probe_yandex_gpt_task() -> None:
+    """Периодическая проверка доступности YandexGPT для health-эндпоинтов"""
+    yandex_gpt_probe.probe()
+
+
+@app.task(ignore_result=True)
+def generate_card_renditions_task(card_id: int) -> None:
+    """
+    Создает копии изображения карты после загрузки
+
+    Args:
+        card_id: ID карты
+    """
+    stats = generate_renditions(TarotCard.objects.filter(id=card_id), workers=1)
+    if stats.failed:
+        logger.error(f"Не удалось создать {stats.failed} копий изображения карты {card_id}")
@@ -1,3 +1,561 @@
-from django.test import TestCase
+import asyncio
+import io
+import threading
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from projects.models import Project
+from users.models import UserProfile
+from .deck_index import deck_index
+from .health import yandex_gpt_probe
+from .llm_client import CircuitBreaker, CircuitOpenError, LLMBusyError, LLMClient, LLMTimeoutError
+from .models import TarotDeck, TarotCard, TarotSpread, CardRendition, Interpretation, LLMUsage
+from .renditions import generate_renditions
+from .services import PromptResponseCache, yandex_gpt_service
+from .tasks import generate_interpretation_task, generate_interpretations_batch_task
+from .usage import UsageWriter, token_budget
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_png(width=1200, height=2000):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (120, 40, 200)).save(output, format='PNG')
+    return SimpleUploadedFile('00-TheFool.png', output.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_URL='/media/', TAROT_RENDITION_FORMATS=['webp'])
+class CardRenditionTest(TestCase):
+    """Копии изображений карт создаются один раз и подставляются в ответы"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        deck_index.clear()
+        project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        self.deck = TarotDeck.objects.create(name='Колода', project=project)
+        self.card = TarotCard.objects.create(deck=self.deck, name='Шут', order=0, image=make_png())
+
+    def test_generates_webp_renditions_once(self):
+        stats = generate_renditions(TarotCard.objects.all(), workers=1)
+
+        self.assertEqual((stats.created, stats.skipped, stats.failed), (2, 0, 0))
+        self.assertLess(stats.rendition_bytes, stats.source_bytes)
+        renditions = {rendition.size: rendition for rendition in self.card.renditions.all()}
+        self.assertEqual((renditions['thumb'].width, renditions['thumb'].height), (240, 400))
+        self.assertEqual(renditions['card'].format, 'webp')
+        self.assertEqual(renditions['card'].file_size, renditions['card'].image.size)
+
+        stats = generate_renditions(TarotCard.objects.all(), workers=1)
+        self.assertEqual((stats.created, stats.skipped), (0, 2))
+        self.assertEqual(CardRendition.objects.count(), 2)
+
+    def test_index_serves_rendition_urls(self):
+        self.assertTrue(deck_index.get_cards(self.deck.project_id)[0].image_url.endswith('.png'))
+
+        generate_renditions(TarotCard.objects.all(), workers=1)
+
+        card = deck_index.get_cards(self.deck.project_id)[0]
+        self.assertTrue(card.image_url.endswith('_card.webp'))
+        self.assertEqual(len(card.renditions), 2)
+
+        response = APIClient().get(f'/api/tarot/decks/{self.deck.id}/images/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['cards'][0]
+        self.assertTrue(data['image'].startswith('http://testserver/media/'))
+        self.assertEqual({rendition['size'] for rendition in data['renditions']}, {'thumb', 'card'})
+
+    def test_stale_renditions_are_not_served(self):
+        generate_renditions(TarotCard.objects.all(), workers=1)
+
+        self.card.image = make_png(800, 800)
+        self.card.save()
+
+        self.assertTrue(deck_index.get_cards(self.deck.project_id)[0].image_url.endswith('.png'))
+        stats = generate_renditions(TarotCard.objects.all(), workers=1)
+        self.assertEqual(stats.created, 2)
+        self.assertEqual(CardRendition.objects.count(), 2)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BulkCommandsTest(TestCase):
+    """Наполнение колод и связывание изображений работают множествами строк"""
+
+    def setUp(self):
+        deck_index.clear()
+        self.projects = [Project.objects.create(name=f'Bot {i}', telegram_token=f'token-{i}') for i in range(2)]
+
+    def call(self, *args):
+        output = io.StringIO()
+        call_command(*args, stdout=output)
+        return output.getvalue()
+
+    def test_seed_is_idempotent_and_updates_on_request(self):
+        self.assertIn('Карт создано: 156', self.call('seed_tarot', '--dry-run'))
+        self.assertFalse(TarotCard.objects.exists())
+
+        self.call('seed_tarot')
+        self.assertEqual(TarotCard.objects.count(), 156)
+        spreads = TarotSpread.objects.filter(project=self.projects[0]).count()
+        self.assertEqual(len(deck_index.get_cards(self.projects[0].id)), 78)
+
+        TarotCard.objects.filter(name='Шут').update(meaning_upright='Изменено')
+        output = self.call('seed_tarot')
+        self.assertIn('Карт создано: 0', output)
+        self.assertEqual(TarotCard.objects.filter(meaning_upright='Изменено').count(), 2)
+        self.assertEqual(TarotSpread.objects.filter(project=self.projects[0]).count(), spreads)
+
+        self.call('seed_tarot', '--update', '--project', str(self.projects[0].id), '--skip-spreads')
+        self.assertEqual(TarotCard.objects.filter(meaning_upright='Изменено').count(), 1)
+
+    def test_link_images_by_reference_and_card_names(self):
+        self.call('seed_tarot', '--skip-spreads')
+        images_dir = Path(MEDIA_ROOT) / 'tarot' / 'bulk'
+        images_dir.mkdir(parents=True, exist_ok=True)
+        for filename in ('00-TheFool.png', 'Маг.jpg', 'unknown.png'):
+            (images_dir / filename).write_bytes(b'')
+        self.assertEqual(len(deck_index.get_cards(self.projects[0].id)), 78)
+
+        output = self.call('link_card_images', '--dir', str(images_dir))
+
+        self.assertIn('Карт связано: 4', output)
+        self.assertIn('unknown.png', output)
+        self.assertEqual(TarotCard.objects.filter(image='tarot/bulk/00-TheFool.png').count(), 2)
+        self.assertEqual(TarotCard.objects.get(deck__project=self.projects[1], name='Маг').image.name,
+                         'tarot/bulk/Маг.jpg')
+        # Индекс колод сброшен, хотя bulk_update не отправляет post_save
+        fool = next(card for card in deck_index.get_cards(self.projects[0].id) if card.name == 'Шут')
+        self.assertTrue(fool.image_url.endswith('00-TheFool.png'))
+        self.assertIn('Карт связано: 0', self.call('link_card_images', '--dir', str(images_dir)))
+
+
+class LLMUsageTest(TestCase):
+    """Вызовы модели учитываются в журнале, а проект сверх бюджета получает запасной ответ"""
+
+    cards = [{'name': 'Шут', 'meaning': 'Начало пути'}]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token', llm_daily_token_budget=50)
+
+    def setUp(self):
+        from benchmarks.runner import stub_yandex_gpt
+
+        cache.clear()
+        self.enterContext(stub_yandex_gpt())
+        self.writer = self.enterContext(
+            mock.patch('tarot.services.llm_usage_writer', UsageWriter(batch_size=100, flush_interval=3600))
+        )
+
+    def generate(self):
+        return yandex_gpt_service.generate_interpretation('Расклад', self.cards, project_id=self.project.id)
+
+    def test_calls_are_buffered_then_written(self):
+        self.assertEqual(self.generate(), yandex_gpt_service.model.RESPONSE)
+        self.assertFalse(LLMUsage.objects.exists())
+        self.assertEqual(self.writer.pending(), 1)
+
+        self.assertEqual(self.writer.flush(), 1)
+        usage = LLMUsage.objects.get()
+        self.assertEqual((usage.project_id, usage.model, usage.fallback), (self.project.id, 'yandexgpt-lite', False))
+        self.assertGreater(usage.prompt_tokens, 0)
+        self.assertGreater(usage.completion_tokens, 0)
+        self.assertEqual(token_budget.used(self.project.id), usage.prompt_tokens + usage.completion_tokens)
+
+    def test_budget_exceeded_degrades_to_fallback(self):
+        self.generate()
+        self.assertTrue(token_budget.exceeded(self.project.id))
+
+        with mock.patch.object(yandex_gpt_service.model, 'run') as run:
+            response = self.generate()
+        run.assert_not_called()
+        self.assertNotEqual(response, yandex_gpt_service.model.RESPONSE)
+
+        self.writer.flush()
+        fallback = LLMUsage.objects.get(fallback=True)
+        self.assertEqual((fallback.prompt_tokens, fallback.completion_tokens), (0, 0))
+        self.assertEqual(LLMUsage.objects.count(), 2)
+
+    def test_cache_hits_are_recorded_and_budgeted(self):
+        unlimited = Project.objects.create(name='Other Bot', telegram_token='other-token')
+        self.enterContext(mock.patch.object(yandex_gpt_service, 'response_cache',
+                                            PromptResponseCache(enabled=True, pool_size=1)))
+        with mock.patch.object(yandex_gpt_service.model, 'run', wraps=yandex_gpt_service.model.run) as run:
+            for _ in range(2):
+                yandex_gpt_service.generate_interpretation('Расклад', self.cards, project_id=unlimited.id)
+        run.assert_called_once()
+
+        self.writer.flush()
+        model_call, cache_hit = LLMUsage.objects.order_by('id')
+        self.assertEqual((model_call.cached, cache_hit.cached, cache_hit.fallback), (False, True, False))
+        self.assertGreater(cache_hit.completion_tokens, 0)
+        self.assertEqual(token_budget.used(unlimited.id), sum(usage.prompt_tokens + usage.completion_tokens
+                                                              for usage in (model_call, cache_hit)))
+
+    def test_budget_is_checked_before_response_cache(self):
+        self.enterContext(mock.patch.object(yandex_gpt_service, 'response_cache',
+                                            PromptResponseCache(enabled=True, pool_size=1)))
+        self.assertEqual(self.generate(), yandex_gpt_service.model.RESPONSE)
+        self.assertTrue(token_budget.exceeded(self.project.id))
+
+        self.assertNotEqual(self.generate(), yandex_gpt_service.model.RESPONSE)
+        self.writer.flush()
+        self.assertFalse(LLMUsage.objects.filter(cached=True).exists())
+
+
+class GenerateInterpretationTaskTest(TestCase):
+    """Повторная доставка задачи не перезаписывает готовую интерпретацию"""
+
+    cards = [{'name': 'Шут', 'meaning': 'Начало пути'}]
+
+    @classmethod
+    def setUpTestData(cls):
+        project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        cls.spread = TarotSpread.objects.create(project=project, name='Расклад', num_cards=1)
+        cls.user = UserProfile.objects.create(project=project, telegram_user_id=1)
+
+    def setUp(self):
+        from benchmarks.runner import stub_yandex_gpt
+
+        self.enterContext(stub_yandex_gpt())
+        self.enterContext(mock.patch('tarot.services.llm_usage_writer'))
+
+    def create(self, **fields):
+        return Interpretation.objects.create(user=self.user, spread=self.spread, **fields)
+
+    def test_pending_interpretation_is_completed(self):
+        interpretation = self.create(status='pending')
+
+        generate_interpretation_task(interpretation.id, 'Расклад', self.cards)
+
+        interpretation.refresh_from_db()
+        self.assertEqual((interpretation.status, interpretation.ai_response),
+                         ('completed', yandex_gpt_service.model.RESPONSE))
+
+    def test_completed_interpretation_is_skipped(self):
+        interpretation = self.create(status='completed', ai_response='Готовый ответ')
+
+        with mock.patch.object(yandex_gpt_service.model, 'run') as run:
+            generate_interpretation_task(interpretation.id, 'Расклад', self.cards)
+            generate_interpretations_batch_task([{
+                'interpretation_id': interpretation.id, 'spread_name': 'Расклад', 'cards': self.cards,
+            }])
+        run.assert_not_called()
+
+        interpretation.refresh_from_db()
+        self.assertEqual(interpretation.ai_response, 'Готовый ответ')
+
+    def test_response_is_not_written_over_concurrent_result(self):
+        interpretation = self.create(status='pending')
+
+        def finish_elsewhere(*args, **kwargs):
+            # Дубликат задачи успел записать ответ, пока эта ждала модель
+            Interpretation.objects.filter(id=interpretation.id).update(ai_response='Первый ответ', status='completed')
+            return 'Второй ответ'
+
+        with mock.patch.object(yandex_gpt_service, 'generate_interpretation', side_effect=finish_elsewhere):
+            generate_interpretation_task(interpretation.id, 'Расклад', self.cards)
+
+        interpretation.refresh_from_db()
+        self.assertEqual(interpretation.ai_response, 'Первый ответ')
+
+
+class HealthProbeTest(TestCase):
+    """Веб-воркеры не проверяют модель сами, если проверку выполняет beat"""
+
+    beat_schedule = {'probe-yandexgpt': {'task': 'tarot.tasks.probe_yandex_gpt_task', 'schedule': 60.0}}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_state_is_not_refreshed_when_beat_probes(self):
+        with override_settings(CELERY_BEAT_SCHEDULE=self.beat_schedule), \
+                mock.patch.object(yandex_gpt_probe, 'refresh_in_background') as refresh:
+            status = yandex_gpt_probe.get_status()
+        refresh.assert_not_called()
+        self.assertTrue(status['stale'])
+
+    def test_stale_state_is_refreshed_without_beat(self):
+        with override_settings(CELERY_BEAT_SCHEDULE={}), \
+                mock.patch.object(yandex_gpt_probe, 'refresh_in_background') as refresh:
+            yandex_gpt_probe.get_status()
+        refresh.assert_called_once()
+
+    def test_probe_result_is_read_from_cache(self):
+        with mock.patch.object(yandex_gpt_probe.service, 'model', object()), \
+                mock.patch.object(yandex_gpt_probe.service, 'test_connection', return_value=True):
+            yandex_gpt_probe.probe()
+
+        with override_settings(CELERY_BEAT_SCHEDULE=self.beat_schedule):
+            status = yandex_gpt_probe.get_status()
+        self.assertFalse(status['stale'])
+        self.assertEqual(status['success_count'], 1)
+
+
+class UsageWriterTest(SimpleTestCase):
+    """Буфер вызовов модели сбрасывается по таймеру и не теряет пакет при ошибке БД"""
+
+    def test_quiet_buffer_is_flushed_by_timer(self):
+        writer = UsageWriter(batch_size=100, flush_interval=0.05)
+        self.addCleanup(writer.close)
+        written = threading.Event()
+
+        with mock.patch.object(LLMUsage.objects, 'bulk_create', side_effect=lambda *args, **kwargs: written.set()):
+            writer.record(1, 'yandexgpt-lite', 10, 20)
+            self.assertTrue(written.wait(timeout=5))
+        self.assertEqual(writer.pending(), 0)
+
+    def test_failed_batch_is_kept_for_next_flush(self):
+        writer = UsageWriter(batch_size=100, flush_interval=3600)
+        writer.record(1, 'yandexgpt-lite', 10, 20)
+
+        with mock.patch.object(LLMUsage.objects, 'bulk_create', side_effect=[DatabaseError('БД недоступна'), None]):
+            self.assertEqual(writer.flush(), 0)
+            self.assertEqual(writer.pending(), 1)
+            writer.close()
+        self.assertEqual(writer.pending(), 0)
+
+
+class ResponseCacheTest(TestCase):
+    """Кэш ответов хранит только расклады без вопроса и не теряет параллельные записи"""
+
+    cards = [{'name': 'Шут', 'meaning': 'Начало пути'}]
+
+    def setUp(self):
+        from benchmarks.runner import stub_yandex_gpt
+
+        cache.clear()
+        self.enterContext(stub_yandex_gpt())
+        self.enterContext(mock.patch('tarot.services.llm_usage_writer'))
+        self.enterContext(mock.patch.object(yandex_gpt_service, 'response_cache',
+                                            PromptResponseCache(enabled=True, pool_size=2)))
+
+    def test_prompts_with_question_are_not_cached(self):
+        yandex_gpt_service.generate_interpretation('Расклад', self.cards, user_context='Выйду ли я замуж?')
+        yandex_gpt_service.generate_interpretation('Расклад', self.cards)
+
+        response_cache = yandex_gpt_service.response_cache
+        question = yandex_gpt_service._build_prompt('Расклад', self.cards, 'Выйду ли я замуж?')
+        self.assertEqual(cache.get_many(response_cache.slot_keys(question)), {})
+        prompt = yandex_gpt_service._build_prompt('Расклад', self.cards, '')
+        self.assertEqual(list(cache.get_many(response_cache.slot_keys(prompt)).values()),
+                         [yandex_gpt_service.model.RESPONSE])
+        self.assertEqual(response_cache.get_stats()['misses'], 1)
+
+    def test_concurrent_writer_does_not_lose_variants(self):
+        response_cache = yandex_gpt_service.response_cache
+        first_slot = response_cache.slot_keys('промпт')[0]
+        real_get_many = cache.get_many
+
+        def get_many_then_race(keys):
+            pool = real_get_many(keys)
+            # Другой процесс занял первый слот между чтением и записью
+            cache.add(first_slot, 'Ответ другого процесса')
+            return pool
+
+        with mock.patch.object(cache, 'get_many', side_effect=get_many_then_race):
+            response_cache.add('промпт', 'Мой ответ')
+
+        self.assertEqual(set(cache.get_many(response_cache.slot_keys('промпт')).values()),
+                         {'Ответ другого процесса', 'Мой ответ'})
+        self.assertIn(response_cache.get('промпт'), {'Ответ другого процесса', 'Мой ответ'})
+
+    def test_generate_many_submits_to_client_pool(self):
+        readings = [{'spread_name': 'Расклад', 'cards': self.cards, 'user_context': f'Вопрос {i}'} for i in range(3)]
+        with mock.patch.object(yandex_gpt_service.client, 'call_many',
+                               wraps=yandex_gpt_service.client.call_many) as call_many:
+            responses = yandex_gpt_service.generate_many(readings)
+
+        call_many.assert_called_once()
+        self.assertEqual(len(call_many.call_args.args[1]), 3)
+        self.assertEqual(responses, [yandex_gpt_service.model.RESPONSE] * 3)
+
+
+class Unavailable(Exception):
+    """Ошибка апстрима с кодом gRPC, после которой вызов повторяется"""
+
+    code = 'UNAVAILABLE'
+
+
+class LLMClientTest(SimpleTestCase):
+    """Предохранитель, повторы, дедлайны и слоты клиента LLM на поддельных вызовах"""
+
+    def setUp(self):
+        self.sleep = self.enterContext(mock.patch('tarot.llm_client.time.sleep'))
+
+    def make_client(self, **kwargs):
+        kwargs.setdefault('breaker', CircuitBreaker(failure_threshold=2, reset_timeout=30))
+        return LLMClient(**{'timeout': 1, 'max_retries': 2, 'queue_timeout': 0.05, **kwargs})
+
+    @staticmethod
+    def wait_reset_timeout(breaker):
+        # Вместо ожидания сдвигаем момент размыкания назад
+        breaker._opened_at -= breaker.reset_timeout
+
+    def test_breaker_opens_then_lets_one_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        self.wait_reset_timeout(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+        # Неудачный пробный вызов снова размыкает предохранитель
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.wait_reset_timeout(breaker)
+        self.assertTrue(breaker.allow_request())
+        breaker.release_trial()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_retryable_errors_are_retried_with_backoff(self):
+        client = self.make_client()
+        func = mock.Mock(side_effect=[Unavailable(), Unavailable(), 'ответ'])
+
+        self.assertEqual(client.call(func, 'промпт'), 'ответ')
+        self.assertEqual(func.call_count, 3)
+        delays = [call.args[0] for call in self.sleep.call_args_list]
+        self.assertEqual(len(delays), 2)
+        self.assertTrue(0.25 <= delays[0] <= 0.5 and 0.5 <= delays[1] <= 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_non_retryable_errors_fail_fast_and_open_breaker(self):
+        client = self.make_client()
+        func = mock.Mock(side_effect=ValueError('плохой запрос'))
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                client.call(func)
+        self.assertEqual(func.call_count, 2)
+        self.sleep.assert_not_called()
+
+        with self.assertRaises(CircuitOpenError):
+            client.call(func)
+        self.assertEqual(func.call_count, 2)
+
+    def test_deadline_keeps_slot_until_call_finishes(self):
+        client = self.make_client(max_concurrency=1)
+        release = threading.Event()
+        finished = threading.Event()
+
+        def slow():
+            release.wait(5)
+            finished.set()
+            return 'поздно'
+
+        with self.assertRaises(LLMTimeoutError):
+            client.call(slow, retries=0, timeout=0.05)
+        # Брошенный вызов еще занимает слот: новый вызов не превышает лимит
+        with self.assertRaises(LLMBusyError):
+            client.call(lambda: 'ответ')
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+        release.set()
+        finished.wait(5)
+        self.assertTrue(client._semaphore.acquire(timeout=1))
+        client._semaphore.release()
+
+    def test_call_many_keeps_order_and_reports_errors_in_place(self):
+        client = self.make_client(max_concurrency=2, max_retries=0)
+
+        def run(prompt):
+            if prompt == 'ошибка':
+                raise ValueError(prompt)
+            return prompt.upper()
+
+        results = client.call_many(run, [('а',), ('ошибка',), ('б',)])
+        self.assertEqual(results[0], 'А')
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], 'Б')
+
+    def test_arun_retries_and_applies_deadline(self):
+        client = self.make_client()
+        attempts = []
+
+        async def flaky(prompt):
+            attempts.append(prompt)
+            if len(attempts) == 1:
+                raise Unavailable()
+            return 'ответ'
+
+        async def hangs():
+            await asyncio.sleep(5)
+
+        async def scenario():
+            with mock.patch('tarot.llm_client.asyncio.sleep', new=mock.AsyncMock()):
+                self.assertEqual(await client.arun(flaky, 'промпт'), 'ответ')
+            with self.assertRaises(LLMTimeoutError):
+                await client.arun(hangs, retries=0, timeout=0.05)
+
+        asyncio.run(scenario())
+        self.assertEqual(attempts, ['промпт', 'промпт'])
+        self.assertEqual(client.breaker._failures, 1)
+
+    def test_stream_releases_slot_and_trial_when_reader_stops(self):
+        client = self.make_client(max_concurrency=1)
+        client.breaker.record_failure()
+        client.breaker.record_failure()
+        self.wait_reset_timeout(client.breaker)
+
+        stream = client.stream(lambda: iter(['раз', 'два', 'три']))
+        self.assertEqual(next(stream), 'раз')
+        stream.close()
+
+        # Пробный вызов не засчитан ни в успех, ни в ошибку, слот свободен
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(list(client.stream(lambda: iter(['раз']))), ['раз'])
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_stream_failure_is_recorded(self):
+        client = self.make_client()
+
+        def broken():
+            yield 'начало'
+            raise Unavailable()
+
+        with self.assertRaises(Unavailable):
+            list(client.stream(broken))
+        self.assertEqual(client.breaker._failures, 1)
+        self.assertTrue(client._semaphore.acquire(timeout=0))
+
+    def test_astream_releases_slot_and_records_outcome(self):
+        client = self.make_client(max_async_concurrency=1)
+
+        async def chunks(*items):
+            for item in items:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+        async def scenario():
+            stream = client.astream(chunks, 'раз', 'два')
+            self.assertEqual(await stream.__anext__(), 'раз')
+            await stream.aclose()
+            self.assertEqual([item async for item in client.astream(chunks, 'раз')], ['раз'])
+            with self.assertRaises(Unavailable):
+                [item async for item in client.astream(chunks, 'раз', Unavailable())]
+
+        asyncio.run(scenario())
+        self.assertEqual(client.breaker._failures, 1)
@@ -0,0 +1,231 @@
+"""
+Учет вызовов языковой модели и дневные бюджеты токенов проектов
+
+Каждый вызов модели (токены запроса и ответа, время, модель, был ли
+запасной ответ или ответ из кэша) попадает в буфер процесса, который фоновый поток
+сбрасывает в LLMUsage пакетными INSERT: запросы пользователей и цикл
+событий асинхронных представлений не ждут записи в БД. Буфер
+сбрасывается, когда он заполнен, не реже раза в flush_interval секунд
+(даже если новых вызовов нет) и при штатном завершении процесса;
+пакет, который не удалось записать, возвращается в буфер.
+
+Расход токенов за сутки (UTC) считается общим для всех процессов
+счетчиком: INCRBY в Redis или incr кэша Django. Проект, исчерпавший
+бюджет, получает запасные тексты и не занимает слоты общей очереди
+вызовов модели.
+"""
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCall(NamedTuple):
+    project_id: Optional[int]
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: int
+    fallback: bool
+    cached: bool
+    created_at: datetime
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов, когда модель не вернула usage (около 4 символов на токен)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+class UsageWriter:
+    """Буферизованная запись вызовов модели в таблицу LLMUsage"""
+
+    # Во сколько пакетов может вырасти буфер, пока БД недоступна; сверх этого старые записи теряются
+    MAX_PENDING_BATCHES = 10
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 10.0):
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self._buffer: List[LLMCall] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flush_pending = False
+        # Один поток записи: пакеты не пишутся параллельно и не занимают потоки запросов
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm-usage')
+        self._timer: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def record(self, project_id: Optional[int], model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               latency_ms: int = 0, fallback: bool = False, cached: bool = False) -> None:
+        """Добавляет вызов в буфер; полный или устаревший буфер сбрасывается в фоне"""
+        call = LLMCall(project_id, model, max(int(prompt_tokens), 0), max(int(completion_tokens), 0),
+                       max(int(latency_ms), 0), fallback, cached, timezone.now())
+        with self._lock:
+            self._buffer.append(call)
+            if self._timer is None:
+                # Поток таймера запускается с первой записью: процессы без вызовов модели его не держат
+                self._timer = threading.Thread(target=self._run_timer, name='llm-usage-timer', daemon=True)
+                self._timer.start()
+            due = (len(self._buffer) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self._schedule_flush()
+
+    def flush(self) -> int:
+        """Записывает буфер в БД в текущем потоке, возвращает число записей"""
+        from .models import LLMUsage
+
+        with self._lock:
+            calls, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not calls:
+            return 0
+        try:
+            LLMUsage.objects.bulk_create([LLMUsage(**call._asdict()) for call in calls], batch_size=self.batch_size)
+        except Exception as e:
+            self._requeue(calls)
+            logger.error(f"Не удалось записать {len(calls)} вызовов LLM, повторим при следующем сбросе: {e}")
+            return 0
+        return len(calls)
+
+    def close(self) -> None:
+        """Останавливает таймер и записывает остаток буфера (вызывается при завершении процесса)"""
+        self._stopped.set()
+        self.flush()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def _requeue(self, calls: List[LLMCall]) -> None:
+        """Возвращает незаписанный пакет в начало буфера, сохраняя порядок вызовов"""
+        with self._lock:
+            self._buffer = calls + self._buffer
+            overflow = len(self._buffer) - self.batch_size * self.MAX_PENDING_BATCHES
+            if overflow > 0:
+                del self._buffer[:overflow]
+                logger.error(f"Буфер вызовов LLM переполнен, потеряно {overflow} записей")
+
+    def _schedule_flush(self) -> None:
+        with self._lock:
+            if self._flush_pending or not self._buffer:
+                return
+            self._flush_pending = True
+        self._executor.submit(self._flush_in_background)
+
+    def _run_timer(self) -> None:
+        # Сбрасывает буфер по времени, даже если новых вызовов модели больше нет
+        while not self._stopped.wait(self.flush_interval):
+            self._schedule_flush()
+
+    def _flush_in_background(self) -> None:
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._flush_pending = False
+            close_old_connections()
+
+
+class TokenBudget:
+    """
+    Дневной бюджет токенов проекта с общим счетчиком расхода
+
+    С redis_url счетчик — ключ Redis, который увеличивается атомарным
+    INCRBY вместе с продлением срока жизни в одной транзакции, так что
+    параллельные воркеры не теряют расход друг друга. Без него
+    используется incr кэша Django (в production это тот же INCRBY,
+    в LocMem — счетчик процесса).
+    """
+
+    KEY = 'tarot:llm_budget:{project_id}:{day}'
+    # Счетчик живет чуть дольше суток, чтобы пережить границу дня
+    COUNTER_TTL = 2 * 86400
+
+    def __init__(self, default_budget: int = 0, redis_url: Optional[str] = None):
+        self.default_budget = default_budget
+        self._redis = None
+        if redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+
+    def limit_for(self, project_id: Optional[int]) -> int:
+        """Бюджет проекта на сутки; 0 — без ограничения"""
+        from projects.catalog import project_catalog
+
+        if project_id is None:
+            return 0
+        snapshot = project_catalog.get(project_id)
+        budget = snapshot.project.llm_daily_token_budget if snapshot is not None else None
+        return self.default_budget if budget is None else budget
+
+    def used(self, project_id: int) -> int:
+        key = self._key(project_id)
+        if self._redis is None:
+            return cache.get(key, 0)
+        try:
+            return int(self._redis.get(key) or 0)
+        except Exception as e:
+            # Как и лимитер запросов, при недоступном Redis не блокируем проект
+            logger.warning(f"Счетчик бюджета токенов недоступен: {e}")
+            return 0
+
+    def exceeded(self, project_id: Optional[int]) -> bool:
+        """Исчерпан ли бюджет проекта на сегодня"""
+        limit = self.limit_for(project_id)
+        return bool(limit) and self.used(project_id) >= limit
+
+    def consume(self, project_id: Optional[int], tokens: int) -> None:
+        if project_id is None or tokens <= 0:
+            return
+        key = self._key(project_id)
+        if self._redis is not None:
+            try:
+                with self._redis.pipeline() as pipe:
+                    pipe.incrby(key, tokens).expire(key, self.COUNTER_TTL).execute()
+            except Exception as e:
+                logger.warning(f"Не удалось учесть {tokens} токенов проекта {project_id}: {e}")
+            return
+        cache.add(key, 0, self.COUNTER_TTL)
+        try:
+            cache.incr(key, tokens)
+        except ValueError:
+            # Счетчик вытеснили между add и incr
+            cache.add(key, tokens, self.COUNTER_TTL)
+
+    def _key(self, project_id: int) -> str:
+        return self.KEY.format(project_id=project_id, day=timezone.now().date().isoformat())
+
+
+def _create_usage_writer() -> UsageWriter:
+    from django.conf import settings
+
+    writer = UsageWriter(
+        batch_size=getattr(settings, 'LLM_USAGE_BATCH_SIZE', 100),
+        flush_interval=getattr(settings, 'LLM_USAGE_FLUSH_INTERVAL', 10.0),
+    )
+    atexit.register(writer.close)
+    return writer
+
+
+def _create_token_budget() -> TokenBudget:
+    from django.conf import settings
+
+    redis_url = None
+    if getattr(settings, 'LLM_BUDGET_BACKEND', 'cache') == 'redis':
+        redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
+    return TokenBudget(default_budget=getattr(settings, 'LLM_DAILY_TOKEN_BUDGET', 0), redis_url=redis_url)
+
+
+# Создаем глобальные экземпляры учета вызовов и бюджета токенов
+llm_usage_writer = _create_usage_writer()
+token_budget = _create_token_budget()
@@ -1,12 +1,18 @@
 import logging
-from typing import Dict, Any
+import math
+import threading
+from typing import Dict, Any, Optional, Tuple
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 
+from core.ratelimit import reading_rate_limiter
 from projects.models import Project
+from projects.catalog import CatalogSnapshot, project_catalog
 from users.models import UserProfile
-from tarot.models import TarotSpread, TarotCard, Interpretation
-from payments.models import Package
+from users.cache import user_profile_cache
+from tarot.readings import orient_cards, create_paid_interpretation
+from tarot.deck_index import deck_index
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +23,13 @@ class TelegramBotHandler:
         self.project = project
         self.bot_token = project.telegram_token
         
+    def _get_catalog(self) -> CatalogSnapshot:
+        """Снимок справочников проекта: пакеты и расклады без запросов к БД"""
+        snapshot = project_catalog.get(self.project.id)
+        if snapshot is None:
+            raise ValueError(f"Проект {self.project.id} не найден")
+        return snapshot
+    
     def handle_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
         """Обработка входящего сообщения"""
         message_type = message_data.get('type', 'text')
@@ -34,26 +47,42 @@ class TelegramBotHandler:
         user_id = message_data.get('user_id')
         username = message_data.get('username', '')
         
-        # Получаем или создаем пользователя
-        user, created = UserProfile.objects.get_or_create(
-            project=self.project,
-            telegram_user_id=user_id,
-            defaults={'username': username}
-        )
+        # Справке не нужен профиль пользователя
+        if command == '/help':
+            return self._handle_help(None)
+        
+        # Лимит раскладов проверяется до обращения к профилю, отказ не трогает БД
+        if command == '/tarot':
+            retry_after = reading_rate_limiter.check(self.project.id, f'telegram:{self.project.id}:{user_id}')
+            if retry_after is not None:
+                return self._create_response(
+                    f"⏳ Слишком много раскладов подряд. Попробуйте снова через {math.ceil(retry_after)} с."
+                )
+        
+        # Баланс показываем по актуальным данным из БД
+        if command == '/balance':
+            return self._handle_balance(self._get_fresh_user(user_id, username))
+        
+        # Получаем или создаем пользователя (из кэша профилей)
+        user = user_profile_cache.get_or_create(self.project, user_id, username)
         
         if command == '/start':
             return self._handle_start(user)
-        elif command == '/help':
-            return self._handle_help(user)
         elif command == '/tarot':
             return self._handle_tarot(user)
-        elif command == '/balance':
-            return self._handle_balance(user)
         elif command == '/packages':
             return self._handle_packages(user)
         else:
             return self._create_response("Неизвестная команда. Используйте /help для справки.")
     
+    def _get_fresh_user(self, user_id: int, username: str) -> UserProfile:
+        """Получает профиль из БД одним запросом и обновляет кэш профилей"""
+        user = UserProfile.objects.filter(project=self.project, telegram_user_id=user_id).first()
+        if user is None:
+            return user_profile_cache.get_or_create(self.project, user_id, username)
+        user_profile_cache.set(user)
+        return user
+    
     def _handle_start(self, user: UserProfile) -> Dict[str, Any]:
         """Обработка команды /start"""
         welcome_text = f"""
@@ -71,7 +100,7 @@ class TelegramBotHandler:
         """
         return self._create_response(welcome_text.strip())
     
-    def _handle_help(self, user: UserProfile) -> Dict[str, Any]:
+    def _handle_help(self, user: Optional[UserProfile]) -> Dict[str, Any]:
         """Обработка команды /help"""
         help_text = f"""
 🔮 {self.project.name} - Помощь
@@ -96,33 +125,36 @@ class TelegramBotHandler:
                 "Используйте /packages для покупки новых раскладов."
             )
         
-        # Получаем случайный расклад
-        spreads = TarotSpread.objects.filter(project=self.project)
-        if not spreads.exists():
+        # Получаем расклад из снимка справочников проекта
+        spreads = self._get_catalog().spreads
+        if not spreads:
             return self._create_response("❌ Нет доступных раскладов.")
         
-        spread = spreads.first()
+        spread = spreads[0]
         
-        # Получаем карты для расклада
-        cards = TarotCard.objects.filter(deck__project=self.project).order_by('?')[:spread.num_cards]
+        # Получаем карты для расклада из индекса колод
+        cards = deck_index.draw(self.project.id, spread.num_cards)
         
         if len(cards) < spread.num_cards:
             return self._create_response("❌ Недостаточно карт для расклада.")
         
-        # Создаем интерпретацию
-        interpretation = Interpretation.objects.create(
-            user=user,
-            spread=spread,
+        # Списываем расклад и создаем интерпретацию в одной транзакции
+        cards_data = orient_cards(cards)
+        created = create_paid_interpretation(
+            user, spread, cards, cards_data=cards_data,
             ai_response="Это пример AI-интерпретации для вашего расклада. В реальной версии здесь будет ответ от OpenAI."
         )
-        interpretation.cards.set(cards)
-        
-        # Уменьшаем баланс
-        user.balance -= 1
-        user.save()
+        if created is None:
+            return self._create_response(
+                "❌ У вас закончились расклады!\n"
+                "Используйте /packages для покупки новых раскладов."
+            )
+        interpretation, user.balance = created
         
         # Формируем ответ
-        cards_text = "\n".join([f"• {card.name}" for card in cards])
+        cards_text = "\n".join([
+            f"• {card['name']}" + (" (перевернута)" if card['is_reversed'] else "") for card in cards_data
+        ])
         response_text = f"""
 🔮 Ваше предсказание:
 
@@ -154,9 +186,9 @@ class TelegramBotHandler:
     
     def _handle_packages(self, user: UserProfile) -> Dict[str, Any]:
         """Обработка команды /packages"""
-        packages = Package.objects.filter(project=self.project, is_active=True)
+        packages = self._get_catalog().packages
         
-        if not packages.exists():
+        if not packages:
             return self._create_response("❌ Нет доступных пакетов.")
         
         packages_text = "📦 Доступные пакеты:\n\n"
@@ -187,22 +219,60 @@ class TelegramBotHandler:
 class TelegramBotManager:
     """Менеджер для управления несколькими ботами"""
     
+    # Реестр обработчиков: project_id -> (версия, обработчик)
+    _handlers: Dict[int, Tuple[int, TelegramBotHandler]] = {}
+    _lock = threading.Lock()
+    VERSION_KEY = 'telegram_bot:handler:version:{project_id}'
+    
     @staticmethod
-    def get_bot_handler(project_id: int) -> TelegramBotHandler:
-        """Получение обработчика для конкретного проекта"""
+    def get_bot_handler(project_id: int, token: Optional[str] = None) -> TelegramBotHandler:
+        """Получение обработчика для конкретного проекта (из реестра прогретых обработчиков)"""
         try:
-            project = Project.objects.get(id=project_id, status='active')
-            return TelegramBotHandler(project)
-        except Project.DoesNotExist:
+            project_id = int(project_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Проект {project_id} не найден или неактивен")
+        
+        version = cache.get(TelegramBotManager.VERSION_KEY.format(project_id=project_id), 0)
+        entry = TelegramBotManager._handlers.get(project_id)
+        if entry is not None and entry[0] == version:
+            handler = entry[1]
+        else:
+            try:
+                project = Project.objects.get(id=project_id, status='active')
+            except Project.DoesNotExist:
+                raise ValueError(f"Проект {project_id} не найден или неактивен")
+            handler = TelegramBotHandler(project)
+            with TelegramBotManager._lock:
+                TelegramBotManager._handlers[project_id] = (version, handler)
+        
+        if token is not None and token != handler.bot_token:
             raise ValueError(f"Проект {project_id} не найден или неактивен")
+        return handler
+    
+    @staticmethod
+    def invalidate_handler(project_id: int) -> None:
+        """Сбрасывает обработчик проекта в реестрах всех процессов"""
+        key = TelegramBotManager.VERSION_KEY.format(project_id=project_id)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+        TelegramBotManager.drop_local_handler(project_id)
+    
+    @staticmethod
+    def drop_local_handler(project_id: int) -> None:
+        """Сбрасывает обработчик проекта только в реестре текущего процесса"""
+        with TelegramBotManager._lock:
+            TelegramBotManager._handlers.pop(project_id, None)
     
     @staticmethod
-    def handle_webhook(project_id: int, message_data: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_webhook(project_id: int, message_data: Dict[str, Any], token: Optional[str] = None) -> Dict[str, Any]:
         """Обработка webhook от Telegram"""
-        handler = TelegramBotManager.get_bot_handler(project_id)
+        handler = TelegramBotManager.get_bot_handler(project_id, token)
         return handler.handle_message(message_data)
     
     @staticmethod
     def get_active_bots() -> list:
         """Получение списка активных ботов"""
-        return Project.objects.filter(status='active') 
\ No newline at end of file
+        return Project.objects.filter(status='active')
@@ -0,0 +1,235 @@
+import json
+import logging
+import math
+import queue
+import threading
+import urllib.request
+import zlib
+from typing import Callable, Dict, Any, Optional, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryUpdateQueue:
+    """
+    Очередь обновлений Telegram в памяти процесса, по одной на шард
+
+    Только для разработки: порядок сообщений пользователя сохраняется
+    лишь внутри одного процесса, а при нескольких воркерах gunicorn
+    обновления одного пользователя обрабатываются разными процессами.
+    """
+
+    def __init__(self, num_shards: int):
+        self._queues = [queue.Queue() for _ in range(num_shards)]
+
+    def put(self, shard: int, item: Dict[str, Any]) -> None:
+        self._queues[shard].put(item)
+
+    def get(self, shard: int, timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+        try:
+            return self._queues[shard].get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def size(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+
+class RedisUpdateQueue:
+    """
+    Очередь обновлений Telegram в списках Redis, общая для всех процессов
+
+    Доставка «не более одного раза»: BLPOP забирает обновление из списка
+    до обработки, поэтому обновление, которое обрабатывал погибший
+    воркер, теряется. При штатной остановке (SIGTERM) воркер дожидается
+    конца текущего обновления, а непрочитанные остаются в Redis.
+    """
+
+    KEY = 'telegram_bot:updates:{shard}'
+
+    def __init__(self, url: str, num_shards: int):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._num_shards = num_shards
+
+    def put(self, shard: int, item: Dict[str, Any]) -> None:
+        self._redis.rpush(self.KEY.format(shard=shard), json.dumps(item))
+
+    def get(self, shard: int, timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+        result = self._redis.blpop(self.KEY.format(shard=shard), timeout=max(math.ceil(timeout), 1))
+        if result is None:
+            return None
+        return json.loads(result[1])
+
+    def size(self) -> int:
+        return sum(self._redis.llen(self.KEY.format(shard=shard)) for shard in range(self._num_shards))
+
+
+class BotApiReplySender:
+    """Отправляет ответ бота пользователю через метод sendMessage Bot API"""
+
+    def __init__(self, api_url: str = 'https://api.telegram.org', timeout: float = 10.0):
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+
+    def __call__(self, item: Dict[str, Any], response: Dict[str, Any]) -> None:
+        message = item['message']
+        # В личном чате id чата совпадает с id пользователя
+        chat_id = message.get('chat_id', message.get('user_id'))
+        token = response.get('bot_token')
+        if chat_id is None or not token or not response.get('text'):
+            logger.warning(f"Ответ на обновление {item.get('update_id')} проекта {item['project_id']} "
+                           f"некуда отправить")
+            return
+        request = urllib.request.Request(
+            f"{self.api_url}/bot{token}/sendMessage",
+            data=json.dumps({'chat_id': chat_id, 'text': response['text']}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as reply:
+            reply.read()
+
+
+class UpdateIngestor:
+    """
+    Прием обновлений Telegram через очередь
+
+    Webhook только проверяет обновление и кладет его в очередь, а пул
+    воркеров обрабатывает его позже. Обновления одного пользователя всегда
+    попадают в один шард, а каждый шард читает ровно один воркер, поэтому
+    порядок сообщений пользователя сохраняется. Повторные доставки
+    отбрасываются по update_id. Ответ бота воркер отправляет через
+    reply_sender (по умолчанию sendMessage Bot API): ответ webhook
+    в этом режиме содержит только подтверждение приема.
+    """
+
+    DEDUP_KEY = 'telegram_bot:update:{project_id}:{update_id}'
+
+    def __init__(self, update_queue, num_shards: int, dedup_ttl: int = 86400, error_delay: float = 1.0,
+                 reply_sender: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None):
+        self.queue = update_queue
+        self.reply_sender = reply_sender or BotApiReplySender()
+        self.num_shards = num_shards
+        self.dedup_ttl = dedup_ttl
+        self.error_delay = error_delay
+        self._workers: List[threading.Thread] = []
+        self._workers_lock = threading.Lock()
+
+    def shard_for(self, project_id: int, user_id: Any) -> int:
+        """Стабильный между процессами номер шарда для пользователя"""
+        return zlib.crc32(f"{project_id}:{user_id}".encode()) % self.num_shards
+
+    def submit(self, project_id: int, message_data: Dict[str, Any], update_id: Optional[int] = None) -> bool:
+        """
+        Ставит обновление в очередь
+
+        Отметка update_id ставится до записи в очередь, чтобы параллельная
+        повторная доставка не попала в очередь дважды, и снимается, если
+        записать не удалось: тогда Telegram сможет доставить обновление снова.
+
+        Returns:
+            False, если обновление с таким update_id уже принималось
+        """
+        key = None
+        if update_id is not None:
+            key = self.DEDUP_KEY.format(project_id=project_id, update_id=update_id)
+            if not cache.add(key, True, timeout=self.dedup_ttl):
+                logger.info(f"Повторное обновление {update_id} проекта {project_id} пропущено")
+                return False
+
+        shard = self.shard_for(project_id, message_data.get('user_id'))
+        try:
+            self.queue.put(shard, {
+                'project_id': project_id,
+                'update_id': update_id,
+                'message': message_data,
+            })
+        except Exception:
+            if key is not None:
+                cache.delete(key)
+            raise
+        return True
+
+    def start_workers(self) -> None:
+        """Запускает фоновые потоки-воркеры, по одному на шард"""
+        with self._workers_lock:
+            if self._workers:
+                return
+            for shard in range(self.num_shards):
+                worker = threading.Thread(
+                    target=self.run_worker, args=(shard,),
+                    name=f'telegram-updates-{shard}', daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def run_worker(self, shard: int, stop_event: Optional[threading.Event] = None) -> None:
+        """
+        Последовательно обрабатывает обновления одного шарда
+
+        Ошибка чтения очереди (например, недоступен Redis) не останавливает
+        поток: воркер ждет error_delay секунд и пробует снова.
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                item = self.queue.get(shard)
+                if item is not None:
+                    self.process(item)
+            except Exception as e:
+                logger.error(f"Ошибка воркера обновлений шарда {shard}: {e}")
+                stop_event.wait(self.error_delay)
+
+    def process(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Обрабатывает одно обновление из очереди и отправляет ответ бота пользователю"""
+        from .handlers import TelegramBotManager
+
+        try:
+            response = TelegramBotManager.handle_webhook(item['project_id'], item['message'])
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {item.get('update_id')} проекта {item['project_id']}: {e}")
+            return None
+        finally:
+            close_old_connections()
+
+        if response:
+            try:
+                self.reply_sender(item, response)
+            except Exception as e:
+                logger.error(f"Не удалось отправить ответ на обновление {item.get('update_id')} "
+                             f"проекта {item['project_id']}: {e}")
+        logger.debug(f"Обновление {item.get('update_id')} проекта {item['project_id']} обработано")
+        return response
+
+
+_ingestor: Optional[UpdateIngestor] = None
+_ingestor_lock = threading.Lock()
+
+
+def get_update_ingestor() -> UpdateIngestor:
+    """Возвращает приемник обновлений, настроенный через TELEGRAM_UPDATE_QUEUE"""
+    global _ingestor
+    if _ingestor is None:
+        with _ingestor_lock:
+            if _ingestor is None:
+                num_shards = settings.TELEGRAM_UPDATE_WORKERS
+                if settings.TELEGRAM_UPDATE_QUEUE == 'redis':
+                    update_queue = RedisUpdateQueue(getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0'), num_shards)
+                else:
+                    update_queue = InMemoryUpdateQueue(num_shards)
+                _ingestor = UpdateIngestor(update_queue, num_shards, reply_sender=BotApiReplySender(
+                    getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org')
+                ))
+                # Очередь в памяти обрабатывают потоки текущего процесса,
+                # очередь Redis — команда run_update_workers
+                if settings.TELEGRAM_UPDATE_QUEUE == 'memory':
+                    if not settings.DEBUG:
+                        logger.warning("TELEGRAM_UPDATE_QUEUE=memory предназначена для разработки: при нескольких "
+                                       "процессах порядок сообщений пользователя не гарантируется")
+                    _ingestor.start_workers()
+    return _ingestor
@@ -0,0 +1,50 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from telegram_bot.ingestion import get_update_ingestor
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры обработки обновлений Telegram из очереди Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shards',
+            help='Номера шардов через запятую (по умолчанию все). '
+                 'Каждый шард должен обрабатываться ровно одним воркером.'
+        )
+
+    def handle(self, *args, **options):
+        if settings.TELEGRAM_UPDATE_QUEUE != 'redis':
+            raise CommandError('Команда работает только при TELEGRAM_UPDATE_QUEUE=redis')
+
+        ingestor = get_update_ingestor()
+        if options['shards']:
+            shards = [int(shard) for shard in options['shards'].split(',')]
+        else:
+            shards = list(range(ingestor.num_shards))
+
+        self.stdout.write(f"🤖 Обработка обновлений Telegram, шарды: {', '.join(map(str, shards))}")
+
+        stop_event = threading.Event()
+        # docker stop шлет SIGTERM: воркеры дообрабатывают текущие обновления и выходят,
+        # непрочитанные остаются в Redis
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+        workers = [
+            threading.Thread(target=ingestor.run_worker, args=(shard, stop_event), name=f'telegram-updates-{shard}')
+            for shard in shards
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            # Главный поток ждет с таймаутом, чтобы успевать обрабатывать сигналы
+            while not stop_event.is_set():
+                stop_event.wait(1.0)
+        except KeyboardInterrupt:
+            stop_event.set()
+        for worker in workers:
+            worker.join()
+        self.stdout.write("Остановлено")
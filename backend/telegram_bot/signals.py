@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from projects.models import Project
+from .handlers import TelegramBotManager
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_bot_handler(sender, instance, **kwargs):
+    """Сбрасываем прогретый обработчик при изменении проекта"""
+    project_id = instance.pk
+    # Свой процесс видит изменения сразу, остальным версию поднимаем после коммита,
+    # иначе они могут собрать обработчик из старых данных под новой версией
+    TelegramBotManager.drop_local_handler(project_id)
+    transaction.on_commit(lambda: TelegramBotManager.invalidate_handler(project_id))
@@ -0,0 +1,230 @@
+import io
+import json
+import os
+import signal
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from projects.models import Project
+from users.cache import user_profile_cache
+from users.models import UserProfile
+from users.services import BalanceService
+from .handlers import TelegramBotManager
+from .ingestion import BotApiReplySender, InMemoryUpdateQueue, UpdateIngestor
+
+
+class BotHandlerRegistryTest(TestCase):
+    """Прогретые обработчики ботов сбрасываются во всех процессах через общую версию в кэше"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+
+    def setUp(self):
+        cache.clear()
+        TelegramBotManager._handlers.clear()
+        # Обработчики держат проекты этого теста, другие тесты создают свои с теми же id
+        self.addCleanup(TelegramBotManager._handlers.clear)
+
+    def test_handler_is_reused_until_project_changes(self):
+        handler = TelegramBotManager.get_bot_handler(self.project.id)
+        with self.assertNumQueries(0):
+            self.assertIs(TelegramBotManager.get_bot_handler(self.project.id, 'test-token'), handler)
+
+        version_key = TelegramBotManager.VERSION_KEY.format(project_id=self.project.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.name = 'Renamed Bot'
+            self.project.save()
+            # Общая версия поднимается только после коммита
+            self.assertIsNone(cache.get(version_key))
+
+        self.assertEqual(cache.get(version_key), 1)
+        rebuilt = TelegramBotManager.get_bot_handler(self.project.id)
+        self.assertIsNot(rebuilt, handler)
+        self.assertEqual(rebuilt.project.name, 'Renamed Bot')
+
+    def test_version_bump_from_another_process_rebuilds_handler(self):
+        handler = TelegramBotManager.get_bot_handler(self.project.id)
+        # Другой процесс увеличил версию в общем кэше, локальный реестр он не видит
+        cache.set(TelegramBotManager.VERSION_KEY.format(project_id=self.project.id), 5, timeout=None)
+
+        self.assertIsNot(TelegramBotManager.get_bot_handler(self.project.id), handler)
+
+    def test_inactive_or_wrong_token_is_rejected(self):
+        with self.assertRaises(ValueError):
+            TelegramBotManager.get_bot_handler(self.project.id, 'other-token')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.status = 'inactive'
+            self.project.save()
+        with self.assertRaises(ValueError):
+            TelegramBotManager.get_bot_handler(self.project.id)
+
+    def test_balance_change_invalidates_cached_profile(self):
+        handler = TelegramBotManager.get_bot_handler(self.project.id)
+        handler.handle_message({'type': 'command', 'command': '/start', 'user_id': 7})
+        user = UserProfile.objects.get(project=self.project, telegram_user_id=7)
+        self.assertIsNotNone(user_profile_cache.get(self.project.id, 7))
+
+        BalanceService.credit(user.id, 10)
+
+        self.assertIsNone(user_profile_cache.get(self.project.id, 7))
+        response = handler.handle_message({'type': 'command', 'command': '/start', 'user_id': 7})
+        self.assertIn(f'Ваш баланс: {user.balance + 10}', response['text'])
+
+
+class FlakyQueue(InMemoryUpdateQueue):
+    """Очередь, первые обращения к которой завершаются ошибкой"""
+
+    def __init__(self, num_shards: int, put_errors: int = 0, get_errors: int = 0):
+        super().__init__(num_shards)
+        self.put_errors = put_errors
+        self.get_errors = get_errors
+
+    def put(self, shard, item):
+        if self.put_errors:
+            self.put_errors -= 1
+            raise ConnectionError('redis недоступен')
+        super().put(shard, item)
+
+    def get(self, shard, timeout=1.0):
+        if self.get_errors:
+            self.get_errors -= 1
+            raise ConnectionError('redis недоступен')
+        return super().get(shard, timeout=0.01)
+
+
+class UpdateIngestorTest(TestCase):
+    """Очередь обновлений: отсев повторов, шардирование по пользователю, устойчивость воркеров"""
+
+    def setUp(self):
+        cache.clear()
+
+    def message(self, user_id, text='привет'):
+        return {'type': 'text', 'user_id': user_id, 'text': text}
+
+    def drain(self, update_queue, shard):
+        items = []
+        while (item := update_queue.get(shard, timeout=0.01)) is not None:
+            items.append(item)
+        return items
+
+    def test_repeated_update_id_is_queued_once(self):
+        ingestor = UpdateIngestor(InMemoryUpdateQueue(2), 2)
+
+        self.assertTrue(ingestor.submit(1, self.message(7), update_id=100))
+        self.assertFalse(ingestor.submit(1, self.message(7), update_id=100))
+        # update_id уникален только в пределах бота
+        self.assertTrue(ingestor.submit(2, self.message(7), update_id=100))
+        self.assertTrue(ingestor.submit(1, self.message(7)))
+        self.assertTrue(ingestor.submit(1, self.message(7)))
+
+        self.assertEqual(ingestor.queue.size(), 4)
+
+    def test_user_updates_keep_order_in_one_shard(self):
+        ingestor = UpdateIngestor(InMemoryUpdateQueue(4), 4)
+        for i in range(5):
+            for user_id in (1, 2, 3):
+                ingestor.submit(1, self.message(user_id, str(i)), update_id=i * 10 + user_id)
+
+        shards = {shard: self.drain(ingestor.queue, shard) for shard in range(4)}
+        for user_id in (1, 2, 3):
+            shard = ingestor.shard_for(1, user_id)
+            # Номер шарда не зависит от процесса (в отличие от hash())
+            self.assertEqual(shard, UpdateIngestor(None, 4).shard_for(1, user_id))
+            texts = [item['message']['text'] for item in shards[shard] if item['message']['user_id'] == user_id]
+            self.assertEqual(texts, ['0', '1', '2', '3', '4'])
+
+    def test_failed_put_releases_update_id(self):
+        ingestor = UpdateIngestor(FlakyQueue(1, put_errors=1), 1)
+
+        with self.assertRaises(ConnectionError):
+            ingestor.submit(1, self.message(7), update_id=100)
+        self.assertEqual(ingestor.queue.size(), 0)
+
+        # Повторная доставка от Telegram принимается
+        self.assertTrue(ingestor.submit(1, self.message(7), update_id=100))
+        self.assertEqual(ingestor.queue.size(), 1)
+
+    def test_worker_survives_queue_and_handler_errors(self):
+        ingestor = UpdateIngestor(FlakyQueue(1, get_errors=2), 1, error_delay=0)
+        ingestor.submit(1, self.message(7, 'first'), update_id=1)
+        ingestor.submit(1, self.message(7, 'second'), update_id=2)
+        stop_event = threading.Event()
+        processed = []
+
+        def handle_webhook(project_id, message):
+            processed.append(message['text'])
+            if len(processed) == 2:
+                stop_event.set()
+            if message['text'] == 'first':
+                raise RuntimeError('ошибка обработчика')
+            return {}
+
+        with mock.patch.object(TelegramBotManager, 'handle_webhook', side_effect=handle_webhook):
+            worker = threading.Thread(target=ingestor.run_worker, args=(0, stop_event))
+            worker.start()
+            worker.join(timeout=5)
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(processed, ['first', 'second'])
+
+
+class QueuedReplyTest(TestCase):
+    """Ответ на обновление из очереди уходит пользователю через Bot API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+
+    def setUp(self):
+        cache.clear()
+        TelegramBotManager._handlers.clear()
+        self.addCleanup(TelegramBotManager._handlers.clear)
+
+    def test_queued_update_sends_reply(self):
+        ingestor = UpdateIngestor(InMemoryUpdateQueue(1), 1,
+                                  reply_sender=BotApiReplySender('https://bot.api.test/'))
+        ingestor.submit(self.project.id, {'type': 'command', 'command': '/help', 'user_id': 42}, update_id=1)
+
+        with mock.patch('urllib.request.urlopen') as urlopen:
+            ingestor.process(ingestor.queue.get(0, timeout=0.01))
+
+        request = urlopen.call_args.args[0]
+        self.assertEqual(request.full_url, 'https://bot.api.test/bottest-token/sendMessage')
+        payload = json.loads(request.data)
+        self.assertEqual(payload['chat_id'], 42)
+        self.assertIn('/tarot', payload['text'])
+
+    def test_send_error_does_not_break_worker(self):
+        sender = mock.Mock(side_effect=ConnectionError('Bot API недоступен'))
+        ingestor = UpdateIngestor(InMemoryUpdateQueue(1), 1, reply_sender=sender)
+
+        response = ingestor.process({'project_id': self.project.id, 'update_id': 1,
+                                     'message': {'type': 'text', 'user_id': 42, 'text': 'привет'}})
+
+        sender.assert_called_once()
+        self.assertEqual(response['type'], 'text')
+
+
+class RunUpdateWorkersCommandTest(TestCase):
+    """Команда run_update_workers по SIGTERM останавливает воркеры всех шардов и дожидается их"""
+
+    def test_sigterm_stops_workers(self):
+        self.addCleanup(signal.signal, signal.SIGTERM, signal.getsignal(signal.SIGTERM))
+        ingestor = UpdateIngestor(InMemoryUpdateQueue(2), 2, reply_sender=mock.Mock())
+        real_get = ingestor.queue.get
+        ingestor.queue.get = mock.Mock(side_effect=lambda shard, timeout=1.0: real_get(shard, timeout=0.01))
+        threading.Timer(0.2, os.kill, args=(os.getpid(), signal.SIGTERM)).start()
+
+        with override_settings(TELEGRAM_UPDATE_QUEUE='redis'), \
+                mock.patch('telegram_bot.management.commands.run_update_workers.get_update_ingestor',
+                           return_value=ingestor):
+            out = io.StringIO()
+            call_command('run_update_workers', stdout=out)
+
+        self.assertIn('Остановлено', out.getvalue())
+        self.assertEqual({call.args[0] for call in ingestor.queue.get.call_args_list}, {0, 1})
@@ -0,0 +1,63 @@
+import logging
+from typing import Iterable, Optional, Tuple
+
+from django.core.cache import cache
+
+from core.metrics import record_cache
+
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+
+class UserProfileCache:
+    """
+    Кэш профилей пользователей по паре (проект, Telegram user id)
+
+    Используется ботом, чтобы не обращаться к БД на каждое сообщение.
+    Запись сбрасывается при сохранении профиля и при изменении баланса
+    через BalanceService.
+    """
+
+    KEY = 'users:profile:{project_id}:{telegram_user_id}'
+
+    def __init__(self, timeout: int = 300):
+        self.timeout = timeout
+
+    def get(self, project_id: int, telegram_user_id: int) -> Optional[UserProfile]:
+        return cache.get(self._key(project_id, telegram_user_id))
+
+    def set(self, profile: UserProfile) -> None:
+        cache.set(self._key(profile.project_id, profile.telegram_user_id), profile, timeout=self.timeout)
+
+    def invalidate(self, project_id: int, telegram_user_id: int) -> None:
+        cache.delete(self._key(project_id, telegram_user_id))
+
+    def invalidate_many(self, keys: Iterable[Tuple[int, int]]) -> None:
+        """Сбрасывает записи по парам (проект, Telegram user id) одним обращением к кэшу"""
+        cache.delete_many([self._key(project_id, telegram_user_id) for project_id, telegram_user_id in keys])
+
+    def get_or_create(self, project, telegram_user_id: int, username: str = '') -> UserProfile:
+        """Возвращает профиль из кэша или получает (создает) его в БД"""
+        profile = self.get(project.id, telegram_user_id)
+        record_cache('user_profile', profile is not None)
+        if profile is not None:
+            return profile
+
+        profile, created = UserProfile.objects.get_or_create(
+            project=project,
+            telegram_user_id=telegram_user_id,
+            defaults={'username': username}
+        )
+        self.set(profile)
+        if created:
+            logger.info(f"Создан пользователь {telegram_user_id} в проекте {project.id}")
+        return profile
+
+    @staticmethod
+    def _key(project_id: int, telegram_user_id: int) -> str:
+        return UserProfileCache.KEY.format(project_id=project_id, telegram_user_id=telegram_user_id)
+
+
+# Создаем глобальный экземпляр кэша
+user_profile_cache = UserProfileCache()
@@ -0,0 +1,42 @@
+from django.core.management.base import CommandError
+
+from core.bulk import BulkCommand, iter_id_ranges
+from users.models import UserProfile
+from users.services import BalanceService
+
+
+class Command(BulkCommand):
+    help = 'Начисляет расклады пользователям пакетными UPDATE по диапазонам id'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        mode = parser.add_mutually_exclusive_group(required=True)
+        mode.add_argument('--add', type=int, help='Прибавить расклады к балансу каждого пользователя')
+        mode.add_argument('--at-least', type=int,
+                          help='Поднять баланс до этого значения тем, у кого меньше')
+        parser.add_argument('--project', type=int, help='Только пользователи проекта')
+
+    def handle(self, *args, **options):
+        amount, at_least = options['add'], options['at_least']
+        if (amount is not None and amount <= 0) or (at_least is not None and at_least < 0):
+            raise CommandError('Количество раскладов должно быть положительным')
+
+        users = UserProfile.objects.all()
+        if options['project']:
+            users = users.filter(project_id=options['project'])
+
+        if self.dry_run:
+            affected = users.filter(balance__lt=at_least) if at_least is not None else users
+            self.report('Пользователей будет изменено', affected.count())
+            return
+
+        updated = 0
+        for id_range in iter_id_ranges(users, options['batch_size']):
+            updated += BalanceService.bulk_credit(
+                amount=amount or 0, at_least=at_least, project_id=options['project'], id_range=id_range
+            )
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  id {id_range[0]}–{id_range[1] - 1}: всего изменено {updated}")
+
+        self.report('Изменено пользователей', updated)
+        self.stdout.write(self.style.SUCCESS('Готово'))
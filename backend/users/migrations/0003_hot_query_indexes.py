@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_userprofile_balance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['project', '-created_at'], name='users_project_created_idx'),
+        ),
+    ]
@@ -17,6 +17,11 @@ class UserProfile(models.Model):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         unique_together = ('project', 'telegram_user_id')
+        indexes = [
+            models.Index(fields=['project', '-created_at'], name='users_project_created_idx'),
+            # Новые пользователи после отметки агрегации статистики
+            models.Index(fields=['created_at'], name='users_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.username or self.telegram_user_id} ({self.project.name})"
@@ -0,0 +1,132 @@
+import logging
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import user_profile_cache
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceService:
+    """
+    Атомарные операции с балансом раскладов и подпиской пользователя
+
+    Списание и пополнение выполняются одним условным UPDATE ... RETURNING,
+    поэтому баланс остается корректным при одновременных запросах
+    из нескольких воркеров и не требует предварительного чтения строки.
+    """
+
+    @staticmethod
+    def debit(user_id: int, amount: int = 1) -> Optional[int]:
+        """
+        Списывает расклады, если на балансе их достаточно
+
+        Returns:
+            Новый баланс или None, если раскладов не хватило
+        """
+        return BalanceService._update_balance('-', amount, user_id, require_funds=True)
+
+    @staticmethod
+    def credit(user_id: int, amount: int) -> Optional[int]:
+        """
+        Начисляет расклады на баланс
+
+        Returns:
+            Новый баланс или None, если пользователь не найден
+        """
+        return BalanceService._update_balance('+', amount, user_id)
+
+    @staticmethod
+    def extend_subscription(user_id: int, days: int) -> Tuple[date, date]:
+        """
+        Продлевает подписку пользователя на указанное число дней
+
+        Активная подписка продлевается от даты окончания, истекшая
+        или отсутствующая начинается заново с сегодняшнего дня.
+
+        Returns:
+            Кортеж (начало подписки, конец подписки)
+        """
+        today = timezone.now().date()
+        with transaction.atomic():
+            user = (UserProfile.objects.select_for_update()
+                    .only('id', 'subscription_start', 'subscription_end')
+                    .get(id=user_id))
+            if user.subscription_end and user.subscription_end >= today:
+                user.subscription_end += timedelta(days=days)
+            else:
+                user.subscription_start = today
+                user.subscription_end = today + timedelta(days=days)
+            user.save(update_fields=['subscription_start', 'subscription_end', 'updated_at'])
+        return user.subscription_start, user.subscription_end
+
+    @staticmethod
+    def bulk_credit(amount: int = 0, at_least: Optional[int] = None, project_id: Optional[int] = None,
+                    id_range: Optional[Tuple[int, int]] = None) -> int:
+        """
+        Начисляет расклады множеству пользователей одним UPDATE
+
+        amount прибавляется к балансу каждого пользователя; at_least вместо
+        этого поднимает баланс до указанного значения тем, у кого меньше.
+        id_range [начало, конец) ограничивает пакет строк, чтобы не держать
+        блокировку на всей таблице. Кэш профилей сбрасывается только для
+        измененных строк (их возвращает RETURNING).
+
+        Returns:
+            Число измененных профилей
+        """
+        table = connection.ops.quote_name(UserProfile._meta.db_table)
+        if at_least is not None:
+            assignment, conditions, params = "balance = %s", ["balance < %s"], [at_least]
+            where_params = [at_least]
+        else:
+            assignment, conditions, params = "balance = balance + %s", [], [amount]
+            where_params = []
+        params.append(connection.ops.adapt_datetimefield_value(timezone.now()))
+        if project_id is not None:
+            conditions.append("project_id = %s")
+            where_params.append(project_id)
+        if id_range is not None:
+            conditions.append("id >= %s AND id < %s")
+            where_params.extend(id_range)
+
+        sql = f"UPDATE {table} SET {assignment}, updated_at = %s"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " RETURNING project_id, telegram_user_id"
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + where_params)
+            rows = cursor.fetchall()
+
+        user_profile_cache.invalidate_many(rows)
+        return len(rows)
+
+    @staticmethod
+    def _update_balance(operator: str, amount: int, user_id: int, require_funds: bool = False) -> Optional[int]:
+        table = connection.ops.quote_name(UserProfile._meta.db_table)
+        sql = (
+            f"UPDATE {table} SET balance = balance {operator} %s, updated_at = %s "
+            f"WHERE id = %s"
+        )
+        params = [amount, connection.ops.adapt_datetimefield_value(timezone.now()), user_id]
+        if require_funds:
+            sql += " AND balance >= %s"
+            params.append(amount)
+        sql += " RETURNING balance, project_id, telegram_user_id"
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+
+        if row is None:
+            logger.info(f"Баланс пользователя {user_id} не изменен ({operator}{amount})")
+            return None
+
+        balance, project_id, telegram_user_id = row
+        user_profile_cache.invalidate(project_id, telegram_user_id)
+        return balance
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import user_profile_cache
+from .models import UserProfile
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_user_profile_cache(sender, instance, **kwargs):
+    """Сбрасываем кэш профиля при его изменении"""
+    user_profile_cache.invalidate(instance.project_id, instance.telegram_user_id)
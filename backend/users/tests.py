@@ -1,3 +1,137 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from projects.models import Project
+from .cache import user_profile_cache
+from .models import UserProfile
+from .services import BalanceService
+
+
+class GrantReadingsCommandTest(TestCase):
+    """Массовое начисление раскладов меняет баланс пакетными UPDATE"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        other = Project.objects.create(name='Other Bot', telegram_token='other-token')
+        UserProfile.objects.bulk_create(
+            [UserProfile(project=cls.project, telegram_user_id=i, balance=i) for i in range(10)]
+            + [UserProfile(project=other, telegram_user_id=i, balance=0) for i in range(3)]
+        )
+
+    def grant(self, *args):
+        output = StringIO()
+        call_command('grant_readings', *args, '--batch-size', '4', stdout=output)
+        return output.getvalue()
+
+    def balances(self, project):
+        return list(UserProfile.objects.filter(project=project).order_by('telegram_user_id')
+                    .values_list('balance', flat=True))
+
+    def test_at_least_raises_only_low_balances(self):
+        cached = UserProfile.objects.get(project=self.project, telegram_user_id=1)
+        user_profile_cache.set(cached)
+
+        output = self.grant('--at-least', '5', '--project', str(self.project.id))
+
+        self.assertIn('Изменено пользователей: 5', output)
+        self.assertEqual(self.balances(self.project), [5, 5, 5, 5, 5, 5, 6, 7, 8, 9])
+        self.assertEqual(UserProfile.objects.filter(balance=0).count(), 3)
+        self.assertIsNone(user_profile_cache.get(self.project.id, 1))
+
+    def test_add_and_dry_run(self):
+        output = self.grant('--add', '2', '--dry-run')
+        self.assertIn('[пробный запуск] Пользователей будет изменено: 13', output)
+        self.assertEqual(self.balances(self.project), list(range(10)))
+
+        self.grant('--add', '2')
+        self.assertEqual(self.balances(self.project), list(range(2, 12)))
+
+
+class BalanceServiceTest(TestCase):
+    """Списание, пополнение и продление подписки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        cls.user = UserProfile.objects.create(project=cls.project, telegram_user_id=1, balance=2)
+
+    def balance(self):
+        return UserProfile.objects.get(id=self.user.id).balance
+
+    def test_debit_and_credit_are_single_update(self):
+        user_profile_cache.set(self.user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(BalanceService.debit(self.user.id), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(BalanceService.credit(self.user.id, 3), 4)
+
+        self.assertEqual(self.balance(), 4)
+        self.assertIsNone(user_profile_cache.get(self.project.id, 1))
+
+    def test_insufficient_balance_is_rejected(self):
+        self.assertIsNone(BalanceService.debit(self.user.id, 3))
+        self.assertEqual(self.balance(), 2)
+        self.assertEqual(BalanceService.debit(self.user.id, 2), 0)
+        self.assertIsNone(BalanceService.debit(self.user.id))
+        self.assertEqual(self.balance(), 0)
+
+    def test_unknown_user(self):
+        self.assertIsNone(BalanceService.credit(self.user.id + 100, 1))
+
+    def test_extend_subscription_stacks_on_active(self):
+        today = timezone.now().date()
+
+        self.assertEqual(BalanceService.extend_subscription(self.user.id, 30),
+                         (today, today + timedelta(days=30)))
+        self.assertEqual(BalanceService.extend_subscription(self.user.id, 7),
+                         (today, today + timedelta(days=37)))
+
+    def test_extend_subscription_restarts_expired(self):
+        today = timezone.now().date()
+        UserProfile.objects.filter(id=self.user.id).update(
+            subscription_start=today - timedelta(days=40), subscription_end=today - timedelta(days=10))
+
+        self.assertEqual(BalanceService.extend_subscription(self.user.id, 30),
+                         (today, today + timedelta(days=30)))
+
+
+class ConcurrentDebitTest(TransactionTestCase):
+    """Одновременные списания из разных потоков не уводят баланс в минус"""
+
+    def test_concurrent_debits_never_overdraw(self):
+        project = Project.objects.create(name='Test Bot', telegram_token='test-token')
+        user = UserProfile.objects.create(project=project, telegram_user_id=1, balance=5)
+        start = threading.Barrier(10)
+        results = []
+
+        def debit():
+            try:
+                start.wait()
+                while True:
+                    try:
+                        results.append(BalanceService.debit(user.id))
+                        return
+                    except OperationalError:
+                        # Общий кэш SQLite в тестах блокирует таблицу целиком; повторяем
+                        continue
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=debit) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        successful = [balance for balance in results if balance is not None]
+        self.assertEqual(len(results), 10)
+        self.assertEqual(sorted(successful), [0, 1, 2, 3, 4])
+        self.assertEqual(UserProfile.objects.get(id=user.id).balance, 0)
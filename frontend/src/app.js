@@ -442,7 +442,7 @@ export class TarotApp {
                     </div>
                 </div>
                 <div class="action-buttons-row">
-                    <button class="button primary" onclick="app.getInterpretation(${spreadId}, ${cardsData.interpretation_id})">
+                    <button class="button primary" onclick="app.getInterpretation(${spreadId})">
                         🔮 Получить интерпретацию
                     </button>
                 </div>
@@ -452,16 +452,18 @@ export class TarotApp {
         this.currentCardsData = cardsData;
     }
 
-    async getInterpretation(spreadId, interpretationId) {
+    async getInterpretation(spreadId) {
         try {
             this.showInterpretationLoading();
-            // Получаем интерпретацию, передаем user_context
-            const interpretation = await this.api.createInterpretation({
+            // Получаем интерпретацию потоком и показываем текст по мере генерации;
+            // карты берутся из черновика get_cards (или из уже созданной интерпретации)
+            const interpretation = await this.api.streamInterpretation({
                 user: this.currentUser.id,
                 spread: spreadId,
-                interpretation_id: interpretationId,
+                draft_token: this.currentCardsData.draft_token,
+                interpretation_id: this.currentCardsData.interpretation_id,
                 user_context: this.currentUserQuestion || ''
-            });
+            }, (text) => this.addInterpretationToPage({ ai_response: text }));
             this.addInterpretationToPage(interpretation);
         } catch (error) {
             console.error('Ошибка получения интерпретации:', error);
@@ -602,35 +604,17 @@ export class TarotApp {
         try {
             this.ui.showLoading('Загрузка истории...');
             
-            const interpretations = await this.api.getInterpretations(this.currentUser.id);
+            const page = await this.api.getInterpretationsPage(this.currentUser.id);
+            const interpretations = page.results;
             
             if (interpretations.length === 0) {
                 this.ui.showError('История раскладов пуста');
                 return;
             }
 
-            // Сохраняем интерпретации для использования в других методах
+            // Сохраняем интерпретации и курсор следующей страницы для подгрузки
             this.currentHistory = interpretations;
-
-            const historyHtml = interpretations.map((interpretation, index) => {
-                const date = new Date(interpretation.created_at);
-                const formattedDate = date.toLocaleDateString('ru-RU');
-                const formattedTime = date.toLocaleTimeString('ru-RU', { 
-                    hour: '2-digit', 
-                    minute: '2-digit' 
-                });
-                
-                return `
-                    <div class="history-tile" onclick="app.openHistoryItem(${index})">
-                        <div class="history-tile-content">
-                            <span class="history-tile-icon">🔮</span>
-                            <div class="history-tile-title">${interpretation.spread_name || 'Неизвестный расклад'}</div>
-                            <div class="history-tile-date">${formattedDate}</div>
-                            <div class="history-tile-time">${formattedTime}</div>
-                        </div>
-                    </div>
-                `;
-            }).join('');
+            this.historyNext = page.next;
 
             const content = `
                 <div class="balance-header">
@@ -644,9 +628,13 @@ export class TarotApp {
                 
                 <div class="card">
                     <h2>📚 История раскладов</h2>
-                    <div class="history-grid">
-                        ${historyHtml}
+                    <div class="history-grid" id="history-grid">
+                        ${this.renderHistoryTiles(interpretations, 0)}
                     </div>
+                    <button class="button secondary" id="history-more" onclick="app.loadMoreHistory()"
+                        style="${this.historyNext ? '' : 'display: none;'}">
+                        Показать еще
+                    </button>
                 </div>
             `;
             
@@ -658,6 +646,51 @@ export class TarotApp {
         }
     }
 
+    async loadMoreHistory() {
+        if (!this.historyNext) {
+            return;
+        }
+        const button = document.getElementById('history-more');
+        try {
+            button.disabled = true;
+            const page = await this.api.getInterpretationsPage(this.currentUser.id, this.historyNext);
+            const offset = this.currentHistory.length;
+            this.currentHistory = this.currentHistory.concat(page.results);
+            this.historyNext = page.next;
+
+            document.getElementById('history-grid')
+                .insertAdjacentHTML('beforeend', this.renderHistoryTiles(page.results, offset));
+            button.style.display = this.historyNext ? '' : 'none';
+        } catch (error) {
+            console.error('Ошибка загрузки истории:', error);
+            this.ui.showError('Ошибка загрузки истории');
+        } finally {
+            button.disabled = false;
+        }
+    }
+
+    renderHistoryTiles(interpretations, offset) {
+        return interpretations.map((interpretation, index) => {
+            const date = new Date(interpretation.created_at);
+            const formattedDate = date.toLocaleDateString('ru-RU');
+            const formattedTime = date.toLocaleTimeString('ru-RU', { 
+                hour: '2-digit', 
+                minute: '2-digit' 
+            });
+            
+            return `
+                <div class="history-tile" onclick="app.openHistoryItem(${offset + index})">
+                    <div class="history-tile-content">
+                        <span class="history-tile-icon">🔮</span>
+                        <div class="history-tile-title">${interpretation.spread_name || 'Неизвестный расклад'}</div>
+                        <div class="history-tile-date">${formattedDate}</div>
+                        <div class="history-tile-time">${formattedTime}</div>
+                    </div>
+                </div>
+            `;
+        }).join('');
+    }
+
     openHistoryItem(index) {
         const interpretation = this.currentHistory[index];
         if (!interpretation) {
@@ -675,7 +708,10 @@ export class TarotApp {
         // Формируем HTML для карт
         const cardsHtml = (interpretation.cards_names || []).map((cardName, idx) => {
             const imgUrl = interpretation.cards_images && interpretation.cards_images[idx];
-            const isReversed = interpretation.cards_used && interpretation.cards_used[idx] && interpretation.cards_used[idx].is_reversed;
+            // В истории ориентация приходит массивом cards_reversed, в свежем раскладе — в cards_used
+            const isReversed = interpretation.cards_reversed
+                ? interpretation.cards_reversed[idx]
+                : interpretation.cards_used && interpretation.cards_used[idx] && interpretation.cards_used[idx].is_reversed;
             return `
                 <div class="card-item${isReversed ? ' reversed' : ''}">
                     ${imgUrl ? `<img src="${imgUrl}" alt="${cardName}" class="card-image"/>` : ''}
@@ -874,6 +910,7 @@ export class TarotApp {
             const interpretation = await this.api.createInterpretation({
                 user: this.currentUser.id,
                 spread: cardOfDaySpread.id,
+                draft_token: this.currentCardOfDayData.draft_token,
                 interpretation_id: this.currentCardOfDayData.interpretation_id,
                 user_context: 'Карта дня - ежедневное предсказание'
             });
@@ -4,7 +4,8 @@ export class ApiService {
     }
 
     async request(endpoint, options = {}) {
-        const url = `${this.baseUrl}${endpoint}`;
+        // Ссылки пагинации (next/previous) приходят абсолютными URL
+        const url = endpoint.startsWith('http') ? endpoint : `${this.baseUrl}${endpoint}`;
         const config = {
             headers: {
                 'Content-Type': 'application/json',
@@ -94,16 +95,99 @@ export class ApiService {
 
     // Создание интерпретации
     async createInterpretation(data) {
-        return this.request('/tarot/interpretations/create_interpretation/', {
+        const interpretation = await this.request('/tarot/interpretations/create_interpretation/', {
             method: 'POST',
             body: JSON.stringify(data)
         });
+
+        // В асинхронном режиме бэкенд отвечает сразу, а AI-ответ дожидаемся отдельно
+        if (interpretation && interpretation.status === 'pending') {
+            const result = await this.waitForInterpretation(interpretation.id);
+            return { ...interpretation, ...result };
+        }
+        return interpretation;
+    }
+
+    // Создание интерпретации с потоковой выдачей AI-ответа (Server-Sent Events).
+    // onChunk вызывается с накопленным текстом после каждого фрагмента.
+    async streamInterpretation(data, onChunk) {
+        const response = await fetch(`${this.baseUrl}/tarot/interpretations/create_interpretation/`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ...data, stream: true })
+        });
+
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        let interpretation = {};
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // События разделены пустой строкой
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                const event = rawEvent.match(/^event: (.*)$/m)?.[1];
+                const payload = JSON.parse(rawEvent.match(/^data: (.*)$/m)?.[1] || '{}');
+
+                if (event === 'start') {
+                    interpretation = { ...payload, id: payload.interpretation_id };
+                } else if (event === 'chunk') {
+                    text += payload.text;
+                    onChunk?.(text);
+                } else if (event === 'done') {
+                    interpretation = { ...interpretation, ...payload };
+                }
+            }
+        }
+
+        return { ...interpretation, ai_response: interpretation.ai_response ?? text };
+    }
+
+    // Получение статуса и результата интерпретации (long-poll до wait секунд)
+    async getInterpretationResult(interpretationId, wait = 0) {
+        return this.request(`/tarot/interpretations/${interpretationId}/result/?wait=${wait}`);
+    }
+
+    // Ожидание готовности интерпретации
+    async waitForInterpretation(interpretationId, maxAttempts = 10) {
+        for (let attempt = 0; attempt < maxAttempts; attempt++) {
+            const result = await this.getInterpretationResult(interpretationId, 25);
+            if (result.ready) {
+                if (result.status === 'failed') {
+                    throw new Error('Не удалось получить интерпретацию');
+                }
+                return result;
+            }
+        }
+        throw new Error('Превышено время ожидания интерпретации');
     }
 
     // Получение интерпретаций пользователя
     async getInterpretations(userId) {
-        const data = await this.request(`/tarot/interpretations/?user=${userId}`);
-        return this.extractResults(data);
+        const page = await this.getInterpretationsPage(userId);
+        return page.results;
+    }
+
+    // Страница истории по курсору: nextUrl берется из предыдущей страницы
+    async getInterpretationsPage(userId, nextUrl = null) {
+        const data = await this.request(nextUrl || `/tarot/interpretations/?user=${userId}`);
+        return {
+            results: this.extractResults(data),
+            next: data && data.next ? data.next : null
+        };
     }
 
     // Получение пакетов
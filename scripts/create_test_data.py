@@ -129,9 +129,9 @@ def create_test_data():
         interpretation = Interpretation.objects.create(
             user=user,
             spread=spread,
+            card_ids=[card.id for card in cards],
             ai_response="Это тестовая интерпретация. Карты показывают, что в вашей жизни наступает период изменений. Будьте открыты новым возможностям и доверяйте своей интуиции."
         )
-        interpretation.cards.set(cards)
         print(f"Тестовая интерпретация создана")
     
     print("\n✅ Тестовые данные успешно созданы!")